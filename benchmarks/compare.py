@@ -0,0 +1,53 @@
+"""Compare two ``benchmarks/run.py`` result files case by case.
+
+    python benchmarks/compare.py before.json after.json --threshold 1.1
+
+Prints the median time of every case found in both files and the ratio
+after/before, and exits with status 1 if any case got slower than
+``--threshold`` times its old median.
+"""
+
+import argparse
+import json
+import sys
+
+
+def load(path):
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return {
+        (result["name"], json.dumps(result["params"], sort_keys=True)): result
+        for result in data["results"]
+    }, data.get("machine", {})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=1.1,
+                        help="Flag cases slower than this ratio (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    before, old = load(args.before)
+    after, new = load(args.after)
+    print(f"before: {old.get('commit')}  after: {new.get('commit')}")
+    regressions = 0
+    for key in sorted(before.keys() & after.keys()):
+        name, params = key
+        ratio = after[key]["median"] / before[key]["median"] if before[key]["median"] else float("inf")
+        flag = ""
+        if ratio > args.threshold:
+            flag = "  SLOWER"
+            regressions += 1
+        elif ratio < 1 / args.threshold:
+            flag = "  faster"
+        print(f"{name:28} {params:70} {before[key]['median'] * 1000:10.2f} ms"
+              f" -> {after[key]['median'] * 1000:10.2f} ms  x{ratio:.2f}{flag}")
+    for key in sorted(before.keys() ^ after.keys()):
+        print(f"{key[0]:28} {key[1]:70} only in {'before' if key in before else 'after'}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Resident memory of ``AISim`` against grid size, per grid storage.
+
+Every case runs in a fresh interpreter, so each starts from the same
+baseline: it builds a headless ``AISim`` on a square grid, starts a game and
+steps it ``--ticks`` times, then reports the resident set size at that point
+and at its peak. The results are JSON in the layout of ``benchmarks/run.py``::
+
+    python benchmarks/memory.py --output memory.json
+    python benchmarks/memory.py --sizes 1000 4000 --storages memmap --ticks 20
+
+Combinations an engine does not support, e.g. memmap storage on the python
+engine, are skipped.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from run import SEED, machine_info
+from ColorWarGame import AISim
+from colorwar.chunks import STORAGES, check_storage
+
+SIZES = (500, 1000, 2000, 4000)
+FACTIONS = 50
+
+
+def resident_bytes():
+    """The current resident set size, or the peak where the platform has no ``/proc``."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return peak_bytes()
+
+
+def peak_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # kilobytes elsewhere
+
+
+def measure(engine, storage, size, factions, ticks):
+    """Play one case in this process and return its measurements."""
+    with tempfile.TemporaryDirectory() as run_dir:
+        sim = AISim(engine=engine, headless=True, grid_size=(size, size), seed=SEED, storage=storage,
+                    run_dir=run_dir if storage == "memmap" else None)
+        # The simulator narrates events on stdout; keep it for the results
+        with contextlib.redirect_stdout(io.StringIO()):
+            sim.new_game(factions=factions)
+            started = time.perf_counter()
+            for _ in range(ticks):
+                sim.step(sim.count_faction_power())
+            elapsed = time.perf_counter() - started
+        files = sum(os.path.getsize(os.path.join(run_dir, name)) for name in os.listdir(run_dir))
+        return {
+            "rss": resident_bytes(),
+            "peak_rss": peak_bytes(),
+            "file_bytes": files,
+            "ms_per_tick": elapsed / max(1, ticks) * 1000,
+        }
+
+
+def run_case(engine, storage, size, factions, ticks):
+    """Measure one case in a child interpreter."""
+    command = [sys.executable, os.path.abspath(__file__), "--case", engine, storage, str(size),
+               "--factions", str(factions), "--ticks", str(ticks)]
+    output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Measure AISim's resident memory against grid size")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, metavar="N",
+                        help="Square grid sizes to measure (default: %(default)s)")
+    parser.add_argument("--engines", nargs="+", choices=["python", "numpy"], default=["numpy"],
+                        help="Grid engines to measure (default: numpy)")
+    parser.add_argument("--storages", nargs="+", choices=STORAGES, default=["lists", "memmap"],
+                        help="Grid storages to measure (default: lists memmap)")
+    parser.add_argument("--factions", type=int, default=FACTIONS, metavar="N",
+                        help="Factions per game (default: %(default)s)")
+    parser.add_argument("--ticks", type=int, default=10, metavar="N",
+                        help="Steps before measuring (default: %(default)s)")
+    parser.add_argument("--output", default=None, metavar="FILE",
+                        help="Write JSON results here (default: stdout)")
+    parser.add_argument("--case", nargs=3, default=None, metavar=("ENGINE", "STORAGE", "SIZE"),
+                        help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.case is not None:
+        engine, storage, size = args.case
+        print(json.dumps(measure(engine, storage, int(size), args.factions, args.ticks)))
+        return
+
+    results = []
+    for engine in args.engines:
+        for storage in args.storages:
+            try:
+                check_storage(storage, engine)
+            except ValueError:
+                continue
+            for size in args.sizes:
+                params = {"engine": engine, "storage": storage, "size": size, "factions": args.factions,
+                          "ticks": args.ticks}
+                result = {"name": "aisim.rss", "params": params,
+                          **run_case(engine, storage, size, args.factions, args.ticks)}
+                results.append(result)
+                print(f"{engine:6} {storage:7} {size:6}²  rss {result['rss'] / 2**20:9.1f} MB  "
+                      f"peak {result['peak_rss'] / 2**20:9.1f} MB  {result['ms_per_tick']:9.1f} ms/tick",
+                      file=sys.stderr)
+
+    report = json.dumps({"machine": machine_info(), "results": results}, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""Headless benchmark suite for the simulators.
+
+Times ``AISim.step``, ``ColorWarGame.step`` and ``draw``, every disaster
+type, ``auto_merge_random_factions`` and saving and loading the real files
+in ``saves/`` across grid sizes, faction counts and engines, and writes the
+results as JSON that ``benchmarks/compare.py`` diffs across commits::
+
+    python benchmarks/run.py --output before.json
+    python benchmarks/run.py --sizes 100 500 --factions 10 200 -k step
+
+pygame is stubbed the way the tests do it, so no display is needed. The
+``draw`` cases paint a real off-screen surface, under SDL's dummy video
+driver, and are skipped when pygame is not installed: a stub would time a
+renderer that draws nothing.
+"""
+
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import types
+
+# A real pygame, when installed, paints the draw cases off-screen
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+try:
+    import pygame
+except ImportError:
+    pygame = None
+
+pygame_stub = types.ModuleType('pygame')
+pygame_gui_stub = types.ModuleType('pygame_gui')
+pygame_gui_core_stub = types.ModuleType('pygame_gui.core')
+pygame_gui_elements_stub = types.ModuleType('pygame_gui.elements')
+
+pygame_gui_core_stub.ObjectID = object
+pygame_gui_stub.UIManager = object
+pygame_gui_stub.core = pygame_gui_core_stub
+pygame_gui_stub.elements = pygame_gui_elements_stub
+
+sys.modules.setdefault('pygame', pygame_stub)
+sys.modules.setdefault('pygame_gui', pygame_gui_stub)
+sys.modules.setdefault('pygame_gui.core', pygame_gui_core_stub)
+sys.modules.setdefault('pygame_gui.elements', pygame_gui_elements_stub)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+from ColorWarGame import DISASTERS, AISim
+from colorwar.faction import Faction
+from colorwar.game import ColorWarGame
+from colorwar.render import PygameRenderer
+from colorwar.savefile import import_text
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+SIZES = (100, 500, 1000)
+FACTIONS = (10, 200, 1000)
+SEED = 1234
+CELLS_PER_FACTION = 30  # AISim.populate places this many cells per faction
+# Whether draw cases can run; a stub installed before this module, as in the tests, cannot draw
+DRAWING = pygame is not None and hasattr(pygame, "Surface")
+
+
+def make_sim(engine, size, factions):
+    sim = AISim(engine=engine, headless=True, grid_size=(size, size), seed=SEED)
+    sim.new_game(factions=factions)
+    return sim
+
+
+def make_game(engine, size, factions):
+    game = ColorWarGame(grid_size=(size, size), engine=engine, headless=True, seed=SEED)
+    count = max(1, min(20, size * size // (4 * factions)))
+    for i in range(factions):
+        color = "#%06x" % game.rng.colors.randint(0, 0xFFFFFF)
+        game.add_faction(Faction(color=color, name=f"Faction {i + 1}", expansion_chance=0.25), count=count)
+    return game
+
+
+def make_drawn_game(engine, size, factions):
+    """A game whose renderer paints an off-screen surface the size of its window."""
+    game = make_game(engine, size, factions)
+    surface = pygame.Surface((size * game.cell_size, size * game.cell_size))
+    game.renderer = PygameRenderer(surface, game.cell_size, (size, size))
+    return game
+
+
+def save_size(path):
+    """The ``(width, height)`` stored in a text save."""
+    return import_text(path, 1, 1)[2]
+
+
+def grid_cases(engines, sizes, faction_counts):
+    """Yield ``(name, params, setup, run, shared)`` for the size x faction count matrix.
+
+    ``setup`` builds fresh state for each timed ``run``; cases that do not
+    spoil the state they time build it once with ``shared`` instead.
+    """
+    for engine in engines:
+        for size in sizes:
+            for factions in faction_counts:
+                params = {"engine": engine, "size": size, "factions": factions}
+                # populate() only ends once every faction found room
+                if factions * CELLS_PER_FACTION > size * size // 2:
+                    continue
+                yield ("aisim.step", params, None,
+                       lambda state: state.step(state.count_faction_power()),
+                       lambda p=params: make_sim(p["engine"], p["size"], p["factions"]))
+                yield ("game.step", params, None, lambda state: state.step(),
+                       lambda p=params: make_game(p["engine"], p["size"], p["factions"]))
+                if DRAWING:
+                    yield ("game.draw", params, None, lambda state: state.draw(),
+                           lambda p=params: make_drawn_game(p["engine"], p["size"], p["factions"]))
+                for event in DISASTERS:
+                    yield (f"aisim.disaster.{event}", params,
+                           lambda p=params: make_sim(p["engine"], p["size"], p["factions"]),
+                           lambda state, event=event: state.trigger_disaster(event), None)
+                yield ("aisim.auto_merge", params,
+                       lambda p=params: make_sim(p["engine"], p["size"], p["factions"]),
+                       lambda state: state.auto_merge_random_factions(), None)
+
+
+def save_cases(engines, saves, workdir):
+    """Yield cases that load each real save and write it back in both formats."""
+    for engine in engines:
+        if engine == "numpy" and np is None:
+            continue
+        for path in saves:
+            size = save_size(path)
+            params = {"engine": engine, "save": os.path.basename(path), "width": size[0], "height": size[1]}
+            binary = os.path.join(workdir, f"{engine}-{os.path.basename(path)}.cwgbin")
+            text = os.path.join(workdir, f"{engine}-{os.path.basename(path)}")
+
+            def loaded(engine=engine, size=size, path=path):
+                sim = AISim(engine=engine, headless=True, grid_size=size, seed=SEED)
+                sim.load_simulation(path)
+                return sim
+
+            def blank(engine=engine, size=size):
+                return AISim(engine=engine, headless=True, grid_size=size, seed=SEED)
+
+            yield ("load.text", params, blank, lambda state, path=path: state.load_simulation(path), None)
+            if np is not None:  # binary saves need NumPy
+                yield ("save.binary", params, None,
+                       lambda state, out=binary: state.save_simulation(out), loaded)
+                yield ("load.binary", params, blank,
+                       lambda state, out=binary: state.load_simulation(out), None)
+            yield ("save.text", params, None, lambda state, out=text: state.save_simulation(out), loaded)
+
+
+def measure(run, setup, shared, repeat):
+    """Seconds taken by ``repeat`` calls of ``run``, each on fresh or shared state."""
+    times = []
+    state = shared() if shared is not None else None
+    for _ in range(repeat):
+        if setup is not None:
+            state = setup()
+        started = time.perf_counter()
+        run(state)
+        times.append(time.perf_counter() - started)
+    return times
+
+
+def summarize(times):
+    return {
+        "repeat": len(times),
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.fmean(times),
+        "max": max(times),
+        "stdev": statistics.stdev(times) if len(times) > 1 else 0.0,
+    }
+
+
+def machine_info():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "numpy": np.__version__ if np is not None else None,
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Color War simulators headless")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, metavar="N",
+                        help="Square grid sizes to time (default: %(default)s)")
+    parser.add_argument("--factions", type=int, nargs="+", default=FACTIONS, metavar="N",
+                        help="Faction counts to time (default: %(default)s)")
+    parser.add_argument("--engines", nargs="+", choices=["python", "numpy"],
+                        default=["python", "numpy"] if np is not None else ["python"],
+                        help="Grid engines to time")
+    parser.add_argument("--repeat", type=int, default=5, metavar="N",
+                        help="Timed runs per case (default: %(default)s)")
+    parser.add_argument("--saves", default=os.path.join(ROOT, "saves", "*.cwgsave"), metavar="GLOB",
+                        help="Text saves to load and write back (default: saves/*.cwgsave)")
+    parser.add_argument("-k", "--filter", default="", metavar="TEXT",
+                        help="Only run cases whose name contains TEXT")
+    parser.add_argument("--output", default=None, metavar="FILE",
+                        help="Write JSON results here (default: stdout)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    saves = sorted(glob.glob(args.saves))
+    if not DRAWING and args.filter in "game.draw":
+        print("game.draw skipped: it needs pygame installed", file=sys.stderr)
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        cases = [
+            *grid_cases(args.engines, args.sizes, args.factions),
+            *save_cases(args.engines, saves, workdir),
+        ]
+        for name, params, setup, run, shared in cases:
+            if args.filter not in name:
+                continue
+            # The simulators narrate events on stdout; keep it for the results
+            with contextlib.redirect_stdout(io.StringIO()):
+                times = measure(run, setup, shared, args.repeat)
+            result = {"name": name, "params": params, **summarize(times)}
+            results.append(result)
+            print(f"{name:28} {json.dumps(params):70} median {result['median'] * 1000:10.2f} ms",
+                  file=sys.stderr)
+
+    report = json.dumps({"machine": machine_info(), "results": results}, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
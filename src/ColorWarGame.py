@@ -12,14 +12,127 @@ from tkinter import filedialog, Tk
 from pygame_gui.core import ObjectID
 import gc
 import json
+import argparse
+import atexit
+
+from colorwar.ages import ClaimAges
+from colorwar.chunks import STORAGES, ChunkedGrid, check_storage, copy_rows
+from colorwar.autosave import Autosaver, SaveSnapshot
+from colorwar.engine import DIRECTION_ORDERS, ArrayGrid, check_engine, tick_coefficients
+from colorwar.frames import FrameRing
+from colorwar.frontier import Frontier
+from colorwar.mapped import MappedGrid, read_checkpoint
+from colorwar.parallel import ParallelStepper
+from colorwar.profiler import PHASES, NullProfiler, TickProfiler
+from colorwar.registry import EMPTY, FactionRegistry
+from colorwar.replay import TickRecorder
+from colorwar.relations import DENSE_LIMIT
+from colorwar.render import NullRenderer, PygameRenderer
+from colorwar.rng import RandomStreams
+from colorwar.savefile import (
+    COMPRESSIONS, TEXT_EXTENSION, encode_factions, import_text, is_binary, read_binary, write_binary
+)
+from colorwar.terrain import Terrain
+from colorwar.territory import CellIndex, TerritoryCounter
 
 theme_path = "fallback_theme.json"
+DISASTERS = ("plague", "quake", "flare", "volcano", "storm", "wipeout")
+ARCHETYPES = {
+    "Swarm": {"expansionism": 2.0, "aggression": 1.0, "defense": 0.5, "risk": 1.5},
+    "Empire": {"expansionism": 0.7, "aggression": 0.8, "defense": 2.0, "risk": 0.6},
+    "Rogue": {"expansionism": 1.2, "aggression": 1.8, "defense": 0.5, "risk": 2.0},
+    "Cult": {"expansionism": 1.0, "aggression": 0.9, "defense": 1.2, "risk": 1.5},
+    "Neutral": {"expansionism": 1.0, "aggression": 1.0, "defense": 1.0, "risk": 1.0}
+}
+VICTORY_SHARE = 0.95  # share of the map check_victory announces
+COMPACT_EVERY = 64  # chunked storage: ticks between folding chunks that became uniform
 
 class AISim:
-    def __init__(self):
+    def __init__(self, engine="python", territory_check_every=0, headless=False, grid_size=None,
+                 save_compression="zlib", dense_relations=DENSE_LIMIT, workers=0, seed=None, profile=False,
+                 autosave=None, biome_regions=0, storage="lists", run_dir=None, checkpoint_every=0):
+        self.engine_name = check_engine(engine)
+        # Python engine grids as rows of lists, or in lazily allocated chunks for very large maps;
+        # NumPy grids in memory, or memory-mapped from files in run_dir for maps larger than RAM
+        self.storage = check_storage(storage, self.engine_name)
+        self.run_dir = run_dir  # memmap storage: None for a temporary directory
+        # memmap storage: checkpoint the run directory every N ticks and when simulate() returns
+        self.checkpoint_every = checkpoint_every
+        if checkpoint_every and storage != "memmap":
+            raise ValueError("checkpoint_every needs memmap storage; use autosave for the others")
+        if autosave is not None and storage == "memmap":
+            # A snapshot copies the whole grid into memory; checkpoints flush the files instead
+            raise ValueError("memmap storage cannot autosave; use checkpoint_every instead")
+        # One random stream per subsystem; the same seed replays the same game
+        self.rng = RandomStreams(seed)
+        self.engine = None
+        # Step the NumPy grid in stripes on a pool of this many processes (0: in this thread)
+        self.workers = workers
+        self.stepper = None
+        if workers:
+            if self.engine_name != "numpy":
+                raise ValueError("parallel stepping needs the numpy engine")
+            if self.storage == "memmap":
+                raise ValueError("memmap storage steps in bands on its own; it cannot use workers")
+        self.save_compression = save_compression  # for binary .cwgbin saves
+        self.autosave = autosave  # Autosaver snapshotting the game between ticks, or None
+        self.biome_regions = biome_regions  # Voronoi biome regions on new maps; 0 for plain terrain
+        # Debug: recount the grid every N ticks and fail if the incremental counts drifted
+        self.territory_check_every = territory_check_every
+        self.load_complete = False  # Used to gate simulation start until load finishes
+        # Time every phase of each tick; windowed runs show it in the UI strip (F3 toggles)
+        self.profiler = TickProfiler() if profile else NullProfiler()
+        self.show_profile = profile and not headless
+        self.profile_drawn = 0.0
+        self.replay = None  # TickRecorder while recording a replay file
+
+        # Headless: no window, no GUI, no frame throttle; the grid size must be given.
+        # Windowed: a given grid size is shown through a zoomable camera, otherwise
+        # the grid is sized to fit the monitor
+        self.headless = headless
+        # The simulation thread queues repaints here and publishes them once per
+        # tick; only the main thread's renderer touches pygame (None: headless)
+        self.frames = None
+        self.pending_cells = []
+        self.pending_colors = []
+        if headless:
+            if grid_size is None:
+                raise ValueError("headless mode needs an explicit grid_size")
+            self.grid_width, self.grid_height = grid_size
+            self.cell_size = 1
+            self.screen = None
+            self.renderer = NullRenderer()
+        else:
+            self.init_window(grid_size)
+            view_size = (self.canvas_width, self.canvas_height) if grid_size is not None else None
+            self.renderer = PygameRenderer(self.screen, self.cell_size, (self.grid_width, self.grid_height),
+                                           view_size)
+            self.frames = FrameRing()
+
+        self.behaviors = [
+            "aggressive", "defensive", "random", "chaotic", "teleporter", "sapper", "conqueror",
+            "hoarder", "hunter", "rogue", "mirror", "corruptor", "infiltrator", "leech", "hive"
+        ]
+
+        # Placeholders until a game is started
+        # Relations are a dense matrix up to this many faction IDs, sparse beyond
+        self.registry = FactionRegistry(dense_relations, self.rng.spawn)
+        self.territory = TerritoryCounter()
+        # A memmap run directory is only written once a game is started, loaded or resumed
+        self.reset_grid(placeholder=True)
+        self.experimental_zones = set()
+        self.last_world_event = 0
+        self.tick = 0  # ticks played since the game started; binary saves and autosaves record it
+        self.running = True
+
+    def init_window(self, grid_size=None):
+        """Open the fullscreen window and build the GUI.
+
+        Without a ``grid_size`` the grid is sized to the monitor; with one
+        the canvas takes the whole monitor and the camera fits the grid to it.
+        """
         pygame.init()
         pygame.font.init()
-        self.load_complete = False  # Used to gate simulation start until load finishes
 
         # Fullscreen mode — gets monitor's actual resolution
         self.screen = pygame.display.set_mode((0, 0), pygame.NOFRAME)
@@ -32,15 +145,21 @@ class AISim:
         # Reserve space for UI
         self.progress_height = 50
 
-        # Set target number of vertical grid cells
-        target_cells_y = 500
-        self.cell_size = max(2, (screen_height - self.progress_height) // target_cells_y)
-
-        # Compute grid size to match cell size
-        self.grid_height = (screen_height - self.progress_height) // self.cell_size
-        self.grid_width = screen_width // self.cell_size
-        self.canvas_width = self.grid_width * self.cell_size
-        self.canvas_height = self.grid_height * self.cell_size
+        if grid_size is not None:
+            self.grid_width, self.grid_height = grid_size
+            self.cell_size = 1
+            self.canvas_width = screen_width
+            self.canvas_height = screen_height - self.progress_height
+        else:
+            # Set target number of vertical grid cells
+            target_cells_y = 500
+            self.cell_size = max(2, (screen_height - self.progress_height) // target_cells_y)
+
+            # Compute grid size to match cell size
+            self.grid_height = (screen_height - self.progress_height) // self.cell_size
+            self.grid_width = screen_width // self.cell_size
+            self.canvas_width = self.grid_width * self.cell_size
+            self.canvas_height = self.grid_height * self.cell_size
 
         # Resize window to match computed dimensions
         self.screen = pygame.display.set_mode(
@@ -69,38 +188,160 @@ class AISim:
         self.quit_button = pygame_gui.elements.UIButton(
             pygame.Rect((360, self.canvas_height + 5), (100, 30)), "Quit", self.ui_manager
         )
-
-        self.behaviors = [
-            "aggressive", "defensive", "random", "chaotic", "teleporter", "sapper", "conqueror",
-            "hoarder", "hunter", "rogue", "mirror", "corruptor", "infiltrator", "leech", "hive"
-        ]
-
-        # Placeholders until a game is started
-        self.factions = {}
-        self.grid = [[None for _ in range(self.grid_width)] for _ in range(self.grid_height)]
-        self.claim_age = [[0 for _ in range(self.grid_width)] for _ in range(self.grid_height)]
-        self.last_owner = [[None for _ in range(self.grid_width)] for _ in range(self.grid_height)]
-        self.overwrite_cooldown = [[0 for _ in range(self.grid_width)] for _ in range(self.grid_height)]
-        self.biomes = {"forest": set(), "lava": set(), "oasis": set()}
-        self.experimental_zones = set()
-        self.last_world_event = 0
-        self.running = True
+        self.ui_rect = pygame.Rect(0, self.canvas_height, self.canvas_width, self.progress_height)
         pygame.time.set_timer(pygame.USEREVENT + 99, 100)
 
+    @property
+    def factions(self):
+        """Read-only {color: faction} view of the registry, kept for the UI and save code."""
+        return self.registry.factions
+
+    def reset_grid(self, resume=False, placeholder=False):
+        """Allocate an empty grid and per-cell state for the selected engine.
+
+        Grid cells hold faction IDs from ``self.registry``; ``EMPTY`` (0) is unclaimed.
+        With memmap storage, ``resume`` reopens the checkpointed files in
+        ``run_dir`` instead, and a ``placeholder`` grid goes to a temporary
+        directory, leaving ``run_dir`` alone.
+        """
+        if self.engine_name == "numpy":
+            if self.storage == "memmap":
+                self.engine = MappedGrid(self.grid_width, self.grid_height, None if placeholder else self.run_dir,
+                                         self.registry, rng=self.rng.array, resume=resume)
+            else:
+                self.engine = ArrayGrid(self.grid_width, self.grid_height, self.registry, rng=self.rng.array)
+            if self.workers:
+                # A fresh stepper per grid, so its seed and tick follow the new game
+                self.close()
+                self.stepper = ParallelStepper(self.workers)
+                self.stepper.share(self.engine)
+            self.grid = self.engine.grid
+            self.claim_age = self.engine.claim_age
+            self.last_owner = self.engine.last_owner
+            self.overwrite_cooldown = self.engine.overwrite_cooldown
+            self.frontier = self.engine.frontier
+            self.cell_index = None
+        elif self.storage == "chunked":
+            self.grid = ChunkedGrid(self.grid_width, self.grid_height, EMPTY)
+            self.claim_age = ClaimAges(self.grid_width, self.grid_height, chunked=True)
+            self.last_owner = ChunkedGrid(self.grid_width, self.grid_height, EMPTY)
+            self.overwrite_cooldown = ChunkedGrid(self.grid_width, self.grid_height, 0)
+        else:
+            self.grid = [[EMPTY for _ in range(self.grid_width)] for _ in range(self.grid_height)]
+            self.claim_age = ClaimAges(self.grid_width, self.grid_height)
+            self.last_owner = [[EMPTY for _ in range(self.grid_width)] for _ in range(self.grid_height)]
+            self.overwrite_cooldown = [[0 for _ in range(self.grid_width)] for _ in range(self.grid_height)]
+        if self.engine is None:
+            self.frontier = Frontier(self.grid_width, self.grid_height)
+            self.cell_index = CellIndex(self.rng.events, arrays=self.storage == "chunked")
+            self.cell_index.reset(self.grid)
+        self.written = []  # list engine: cells set_cell wrote since the last step
+        if self.replay is not None:
+            self.replay.touch()  # the whole grid is replaced
+        self.territory.reset([self.grid_width * self.grid_height])
+        # Memmap storage keeps the terrain in files beside the grid, like the rest of the per-cell state
+        self.terrain = Terrain(self.grid_width, self.grid_height,
+                               self.engine.directory if self.storage == "memmap" else None)
+
+    def set_cell(self, x, y, fid):
+        """Write one grid cell, keeping territory counts and the frontier current and repainting it.
+
+        Every grid write outside ``step`` must go through here.
+        """
+        old = self.grid[y][x]
+        if old != fid:
+            self.grid[y][x] = fid
+            self.territory.move(old, fid)
+            if self.cell_index is not None:
+                self.cell_index.move(y * self.grid_width + x, old, fid)
+                self.written.append(y * self.grid_width + x)
+            self.frontier.touch(self.grid, x, y)
+            self.draw_cell(x, y, self.registry.colors[fid])
+
+    def write_cells(self, cells, fid):
+        """Vectorized ``set_cell`` for the NumPy engine; ``cells`` are distinct flat indices."""
+        cells, previous = self.engine.write(cells, fid)
+        owners = self.engine.grid.reshape(-1)[cells]
+        self.territory.apply(previous, owners)
+        self.draw_cells(cells)
+        return cells
+
+    def draw_cells(self, cells):
+        """Queue repaints of the given flat indices of the NumPy grid, and note them for the replay."""
+        if self.replay is not None:
+            self.replay.touch(cells)
+        if self.frames is None:
+            return
+        colors = self.registry.colors
+        self.pending_cells.extend(cells.tolist())
+        self.pending_colors.extend([colors[fid] for fid in self.engine.grid.reshape(-1)[cells].tolist()])
+
+    def probe_cells(self, match, fid, probes, limit=None):
+        """Probe random cells; each one holding ``match`` becomes ``fid``.
+
+        ``match=None`` hits any claimed cell. Stops after ``limit`` hits and
+        returns how many cells changed.
+        """
+        if self.engine is not None:
+            return len(self.write_cells(self.engine.probe(match, probes, limit), fid))
+        if match is not None:
+            cells = self.cell_index.probe(match, probes, limit)
+            for index in cells:
+                y, x = divmod(index, self.grid_width)
+                self.set_cell(x, y, fid)
+            return len(cells)
+        hits = 0
+        for _ in range(probes):
+            x = self.rng.events.randint(0, self.grid_width - 1)
+            y = self.rng.events.randint(0, self.grid_height - 1)
+            cell = self.grid[y][x]
+            if cell:
+                self.set_cell(x, y, fid)
+                hits += 1
+                if limit is not None and hits >= limit:
+                    break
+        return hits
+
+    def relabel_factions(self, fids, new_id=EMPTY):
+        """Hand every cell held by the given IDs to ``new_id`` (default: clear them)."""
+        if self.engine is not None:
+            self.write_cells(self.engine.cells_of(list(fids)), new_id)
+            return
+        fids = set(fids)
+        for y in range(self.grid_height):
+            for x in range(self.grid_width):
+                if self.grid[y][x] in fids:
+                    self.set_cell(x, y, new_id)
+
+    def recount_territory(self):
+        """Count the cells held by each ID with a full grid scan."""
+        if self.engine is not None:
+            return self.engine.counts().tolist()
+        counts = [0] * self.registry.size
+        for row in self.grid:
+            for fid in row:
+                counts[fid] += 1
+        return counts
+
+    def count_faction_power(self):
+        """Return a {faction id: cell count} map for every living faction on the grid."""
+        return self.territory.power(self.registry.alive)
+
     def random_color(self):
-        return "#%06x" % random.randint(0, 0xFFFFFF)
+        return "#%06x" % self.rng.colors.randint(0, 0xFFFFFF)
 
     def spawn_rebellion(self, target_color):
         new_color = self.random_color()
         while new_color in self.factions:
             new_color = self.random_color()
 
+        target_id = self.registry.id_of(target_color)
         base = self.factions[target_color]
         rebel_name = f"Rebellion {len(self.factions) + 1}"
-        self.factions[new_color] = {
-            "behavior": random.choice(self.behaviors),
+        rebel = self.registry.add(new_color, {
+            "behavior": self.rng.spawn.choice(self.behaviors),
             "age": 0, "merges": 0, "offspring": 0,
-            "symbol": random.choice(["☢", "☠", "✪", "✘"]),
+            "symbol": self.rng.spawn.choice(["☢", "☠", "✪", "✘"]),
             "name": rebel_name,
             "tier": base["tier"],
             "personality": {
@@ -109,37 +350,50 @@ class AISim:
                 "expansionism": min(2.0, base["personality"]["expansionism"] + 0.3),
                 "risk": 2.0
             }
-        }
-        
-        self.factions[new_color]["relations"] = {
-            c: round(random.uniform(-0.3, 0.3), 2)
-            for c in self.factions if c != new_color
-        }
-        # Also update existing factions to include the new one
-        for c in self.factions:
-            if c != new_color and "relations" in self.factions[c]:
-                self.factions[c]["relations"][new_color] = round(random.uniform(-0.3, 0.3), 2)
-
-
-        placed = 0
-        attempts = 0
-        while placed < 300 and attempts < 5000:
-            x, y = random.randint(0, self.grid_width - 1), random.randint(0, self.grid_height - 1)
-            if self.grid[y][x] == target_color:
-                self.grid[y][x] = new_color
-                self.claim_age[y][x] = 0
-                self.overwrite_cooldown[y][x] = 8  # grace period
-                pygame.draw.rect(self.screen, pygame.Color(new_color),
-                                 pygame.Rect(x * self.cell_size, y * self.cell_size, self.cell_size, self.cell_size))
-                placed += 1
-            attempts += 1
+        })
+
+        # Random relations with everyone, both ways
+        self.registry.relations.randomize([rebel.id], self.registry.alive_ids())
+
+        if self.engine is not None:
+            cells = self.write_cells(self.engine.probe(target_id, 5000, 300), rebel.id)
+            self.claim_age.reshape(-1)[cells] = 0
+            self.overwrite_cooldown.reshape(-1)[cells] = 8  # grace period
+            return
+
+        for index in self.cell_index.probe(target_id, 5000, 300):
+            y, x = divmod(index, self.grid_width)
+            self.set_cell(x, y, rebel.id)
+            self.claim_age[y][x] = 0
+            self.overwrite_cooldown[y][x] = 8  # grace period
+            self.frontier.cool(x, y)
 
     def handle_events(self):
         for event in pygame.event.get():
             if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key in [pygame.K_ESCAPE, pygame.K_q]):
                 self.running = False
+                self.close()
                 pygame.quit()
                 sys.exit()
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3 and self.profiler.enabled:
+                self.show_profile = not self.show_profile
+                self.screen.fill((0, 0, 0), self.profile_rect())
+            elif event.type == pygame.MOUSEWHEEL:
+                # Zoom about the cell under the pointer
+                x, y = pygame.mouse.get_pos()
+                if y < self.canvas_height:
+                    self.renderer.camera.zoom(event.y, (x, y))
+            elif event.type == pygame.MOUSEMOTION and (event.buttons[1] or event.buttons[2]):
+                # Drag with the middle or right button to pan
+                self.renderer.camera.pan(-event.rel[0], -event.rel[1])
+            elif event.type == pygame.KEYDOWN and event.key in (pygame.K_LEFT, pygame.K_RIGHT, pygame.K_UP, pygame.K_DOWN):
+                # Arrow keys pan a quarter of the view
+                dx = (event.key == pygame.K_RIGHT) - (event.key == pygame.K_LEFT)
+                dy = (event.key == pygame.K_DOWN) - (event.key == pygame.K_UP)
+                camera = self.renderer.camera
+                camera.pan(dx * camera.view_width // 4, dy * camera.view_height // 4)
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_HOME:
+                self.renderer.camera.fit()
             elif event.type == pygame.USEREVENT and event.user_type == pygame_gui.UI_BUTTON_PRESSED:
                 if event.ui_element == self.save_button:
                     self.save_simulation()
@@ -155,12 +409,12 @@ class AISim:
             self.ui_manager.process_events(event)
 
     def populate(self):
-        for color in self.factions:
+        for fid in self.registry.alive_ids():
             count = 0
             while count < 30:
-                x, y = random.randint(0, self.grid_width - 1), random.randint(0, self.grid_height - 1)
-                if self.grid[y][x] is None:
-                    self.grid[y][x] = color
+                x, y = self.rng.spawn.randint(0, self.grid_width - 1), self.rng.spawn.randint(0, self.grid_height - 1)
+                if self.grid[y][x] == EMPTY:
+                    self.set_cell(x, y, fid)
                     count += 1
 
     def mutate_faction(self, color):
@@ -168,26 +422,37 @@ class AISim:
         if color not in self.factions:
             return
 
-        mutation = random.choice(self.behaviors)
+        mutation = self.rng.events.choice(self.behaviors)
         self.factions[color]["behavior"] = mutation
 
         for trait in self.factions[color]["personality"]:
-            self.factions[color]["personality"][trait] = round(random.uniform(0.4, 2.0), 2)
+            self.factions[color]["personality"][trait] = round(self.rng.events.uniform(0.4, 2.0), 2)
 
         self.factions[color]["name"] += " (Mutated)"
         print(f"🧬 {color} has mutated into a new personality: {mutation}")
 
-    def save_simulation(self):
-        Tk().withdraw()
-        file_path = filedialog.asksaveasfilename(defaultextension=".cwgsave", filetypes=[("Color War Save", "*.cwgsave")])
+    def save_simulation(self, file_path=None):
+        if file_path is None:
+            Tk().withdraw()
+            file_path = filedialog.asksaveasfilename(
+                defaultextension=".cwgbin",
+                filetypes=[("Color War Save", "*.cwgbin"), ("Color War Text Save", "*.cwgsave")]
+            )
         if not file_path:
             return
 
+        if not file_path.endswith(TEXT_EXTENSION):
+            # Chunked grids and ClaimAges turn into arrays as they are written
+            write_binary(file_path, self.registry, self.grid, self.claim_age, self.overwrite_cooldown,
+                         compression=self.save_compression, tick=self.tick)
+            return
+
         with open(file_path, "w", encoding="utf-8") as f:
             # Save grid (row by row)
             f.write("[GRID]\n")
+            colors = self.registry.colors
             for row in self.grid:
-                f.write(",".join(cell if cell else "None" for cell in row) + "\n")
+                f.write(",".join(colors[cell] if cell else "None" for cell in row) + "\n")
 
             # Save factions
             f.write("[FACTIONS]\n")
@@ -198,82 +463,124 @@ class AISim:
                         f"{data['personality']['defense']}|{data['personality']['expansionism']}|"
                         f"{data['personality']['risk']}\n")
 
-    def load_simulation(self):
-        Tk().withdraw()
-        file_path = filedialog.askopenfilename(filetypes=[("Color War Save", "*.cwgsave")])
+    def snapshot(self, tick=None):
+        """Copy the grid arrays and encode the faction table, for saving on another thread.
+
+        ``tick`` defaults to the current game tick.
+        """
+        if self.engine is not None:
+            grid, claim_age, cooldown = self.grid.copy(), self.claim_age.copy(), self.overwrite_cooldown.copy()
+        else:
+            grid = copy_rows(self.grid)
+            claim_age = self.claim_age.copy()
+            cooldown = copy_rows(self.overwrite_cooldown)
+        if tick is None:
+            tick = self.tick
+        return SaveSnapshot(tick, encode_factions(self.registry), grid, claim_age, cooldown)
+
+    def checkpoint(self):
+        """Flush a memmap-storage run to its directory, from where ``resume`` continues it; returns the file written.
+
+        The grid arrays are the files already, so this writes only dirty
+        pages and the faction table.
+        """
+        if self.storage != "memmap":
+            raise ValueError("checkpoints need memmap storage; use save_simulation or autosave")
+        return self.engine.checkpoint(encode_factions(self.registry))
+
+    def resume(self, run_dir):
+        """Continue the memmap-storage run checkpointed in ``run_dir``, which then becomes this run's directory."""
+        if self.storage != "memmap":
+            raise ValueError("resuming a run directory needs memmap storage")
+        checkpoint = read_checkpoint(run_dir)
+        if (checkpoint["width"], checkpoint["height"]) != (self.grid_width, self.grid_height):
+            raise ValueError(f"{run_dir} holds a {checkpoint['width']}x{checkpoint['height']} run, "
+                             f"not {self.grid_width}x{self.grid_height}")
+        factions = checkpoint["factions"]
+        self.registry.clear()
+        ids = {}
+        for saved_id in sorted(factions):
+            color, record = factions[saved_id]
+            ids[saved_id] = self.registry.add(color, record).id
+        self.run_dir = run_dir
+        self.reset_grid(resume=True)
+        self.tick = self.engine.tick
+        self.engine.relabel(ids)
+        self.territory.reset(self.recount_territory())
+        self.redraw()
+        # Checkpoints carry no relations, like saves; draw fresh ones
+        self.registry.relations.randomize(self.registry.alive_ids())
+        self.load_complete = True
+
+    def load_simulation(self, file_path=None):
+        if file_path is None:
+            Tk().withdraw()
+            file_path = filedialog.askopenfilename(filetypes=[("Color War Save", "*.cwgbin *.cwgsave")])
         if not file_path or not os.path.exists(file_path):
             return
 
-        with open(file_path, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-
-        section = None
-        grid = []
-        factions = {}
+        if is_binary(file_path):
+            self.load_binary(file_path)
+        else:
+            self.load_text(file_path)
+        self.territory.reset(self.recount_territory())
+        self.redraw()
 
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-            if line == "[GRID]":
-                section = "grid"
-                continue
-            elif line == "[FACTIONS]":
-                section = "factions"
-                continue
+        # Saves carry no relations; draw fresh ones
+        self.registry.relations.randomize(self.registry.alive_ids())
 
-            if section == "grid":
-                grid.append([cell if cell != "None" else None for cell in line.split(",")])
-            elif section == "factions":
-                parts = line.split("|")
-                if len(parts) < 11:
-                    continue
-                color = parts[0]
-                factions[color] = {
-                    "name": parts[1],
-                    "behavior": parts[2],
-                    "tier": int(parts[3]),
-                    "symbol": parts[4],
-                    "dna": parts[5],
-                    "capital": eval(parts[6]),
-                    "personality": {
-                        "aggression": float(parts[7]),
-                        "defense": float(parts[8]),
-                        "expansionism": float(parts[9]),
-                        "risk": float(parts[10])
-                    },
-                    "age": 0,
-                    "merges": 0,
-                    "offspring": 0,
-                    "memory": [],
-                    "lore": {
-                        "motto": "Unknown",
-                        "origin": "Unknown",
-                        "victory_quote": "Victory is ours."
-                    },
-                    "relations": {}
-                }
+        # 🟢 Confirm load completed
+        print("✅ Save loaded and validated.")
+        self.load_complete = True  # Flag for main loop
 
-        self.grid = grid
-        self.factions = factions
+    def load_binary(self, file_path):
+        """Restore the grid, claim ages, cooldowns and factions from a binary save."""
+        data = read_binary(file_path)
+        self.registry.clear()
+        ids = {}
+        for saved_id in sorted(data.factions):
+            color, record = data.factions[saved_id]
+            ids[saved_id] = self.registry.add(color, record).id
 
-        # Resize grid if needed
-        saved_height = len(self.grid)
-        saved_width = len(self.grid[0]) if saved_height > 0 else 0
-        if saved_height != self.grid_height or saved_width != self.grid_width:
+        if data.width != self.grid_width or data.height != self.grid_height:
             print("⚠️ Save grid size doesn't match current screen — resizing...")
-            new_grid = [[None for _ in range(self.grid_width)] for _ in range(self.grid_height)]
-            for y in range(min(saved_height, self.grid_height)):
-                for x in range(min(saved_width, self.grid_width)):
-                    new_grid[y][x] = self.grid[y][x]
-            self.grid = new_grid
+        grid, claim_age, cooldown = data.fitted(self.grid_width, self.grid_height, ids)
+
+        self.reset_grid()
+        self.tick = data.tick
+        if self.engine is not None:
+            self.engine.load_arrays(grid, claim_age, cooldown)
+        else:
+            if self.storage == "chunked":
+                # Uniform chunks of the save stay single values
+                self.grid.load(grid)
+                self.claim_age.load(claim_age)
+                self.overwrite_cooldown.load(cooldown)
+            else:
+                self.grid = grid.tolist()
+                self.claim_age.load(claim_age.tolist())
+                self.overwrite_cooldown = cooldown.tolist()
+            self.last_owner = copy_rows(self.grid)
+            self.frontier.rebuild(self.grid, self.overwrite_cooldown)
+            self.cell_index.reset(self.grid)
+
+    def load_text(self, file_path):
+        """Import a legacy text save; claim ages and cooldowns start from zero."""
+        # Rows are cropped or padded to the current grid while streaming in
+        grid, factions, saved_size = import_text(file_path, self.grid_width, self.grid_height)
+        if saved_size != (self.grid_width, self.grid_height):
+            print("⚠️ Save grid size doesn't match current screen — resizing...")
+
+        self.registry.clear()
+        for color, data in factions.items():
+            self.registry.add(color, data)
 
         # Add missing factions from grid
-        grid_colors = {cell for row in self.grid for cell in row if cell}
+        grid_colors = sorted(set().union(*grid) - {None})  # sorted: set order varies between runs
         for color in grid_colors:
             if color not in self.factions:
                 print(f"⚠️ Recreating missing faction: {color}")
-                self.factions[color] = {
+                self.registry.add(color, {
                     "behavior": "random",
                     "age": 0,
                     "merges": 0,
@@ -288,43 +595,44 @@ class AISim:
                         "risk": 1.0
                     },
                     "relations": {}
-                }
-
-        # Rebuild relations
-        for c1 in self.factions:
-            self.factions[c1].setdefault("relations", {})
-            for c2 in self.factions:
-                if c1 != c2 and c2 not in self.factions[c1]["relations"]:
-                    self.factions[c1]["relations"][c2] = round(random.uniform(-0.3, 0.3), 2)
-
-        # 🟢 Confirm load completed
-        print("✅ Save loaded and validated.")
-        self.load_complete = True  # Flag for main loop
+                })
+
+        self.reset_grid()
+        self.tick = 0  # text saves keep no tick
+        if self.engine is not None:
+            self.engine.load_lists(grid)
+        else:
+            ids = self.registry.ids
+            for y, row in enumerate(grid):
+                self.grid[y] = [ids[cell] if cell else EMPTY for cell in row]
+            self.last_owner = copy_rows(self.grid)
+            self.frontier.rebuild(self.grid)
+            self.cell_index.reset(self.grid)
 
     def trigger_world_event(self):
-        event = random.choice(["Time Warp", "Forgotten Return", "Singularity", "DNA Corruption"])
+        event = self.rng.events.choice(["Time Warp", "Forgotten Return", "Singularity", "DNA Corruption"])
         if event == "Time Warp":
-            for y in range(self.grid_height):
-                for x in range(self.grid_width):
-                    if random.random() < 0.05:
-                        self.grid[y][x] = None
+            if self.engine is not None:
+                self.write_cells(self.engine.scatter(0.05), EMPTY)
+            else:
+                for y in range(self.grid_height):
+                    for x in range(self.grid_width):
+                        if self.rng.events.random() < 0.05:
+                            self.set_cell(x, y, EMPTY)
         elif event == "Forgotten Return":
             if len(self.factions) > 3:
-                ghost = random.choice(list(self.factions.keys()))
-                for _ in range(300):
-                    x, y = random.randint(0, self.grid_width - 1), random.randint(0, self.grid_height - 1)
-                    if self.grid[y][x] is None:
-                        self.grid[y][x] = ghost
+                ghost = self.rng.events.choice(self.registry.alive_ids())
+                self.probe_cells(EMPTY, ghost, 300)
         elif event == "Singularity":
             cx, cy = self.grid_width // 2, self.grid_height // 2
             for y in range(cy - 10, cy + 10):
                 for x in range(cx - 10, cx + 10):
                     if 0 <= x < self.grid_width and 0 <= y < self.grid_height:
-                        self.grid[y][x] = None
+                        self.set_cell(x, y, EMPTY)
         elif event == "DNA Corruption":
             for color in self.factions:
-                self.factions[color]["dna"] = f"X-{random.randint(1000,9999)}"
-                self.factions[color]["behavior"] = random.choice(self.behaviors)
+                self.factions[color]["dna"] = f"X-{self.rng.events.randint(1000,9999)}"
+                self.factions[color]["behavior"] = self.rng.events.choice(self.behaviors)
 
     def ensure_faction_schema(self, color, faction):
         """Ensure all expected keys exist in a faction dict"""
@@ -346,7 +654,7 @@ class AISim:
             },
             "memory": [],
             "relations": {},
-            "dna": f"R-{random.randint(1000,9999)}",
+            "dna": f"R-{self.rng.spawn.randint(1000,9999)}",
             "lore": {
                 "motto": "Unknown origins.",
                 "origin": "unknown",
@@ -363,127 +671,131 @@ class AISim:
 
         return faction
 
-    def new_game(self):
-        self.num_factions = 200
-        self.factions = {}
-
-        archetypes = {
-            "Swarm": {"expansionism": 2.0, "aggression": 1.0, "defense": 0.5, "risk": 1.5},
-            "Empire": {"expansionism": 0.7, "aggression": 0.8, "defense": 2.0, "risk": 0.6},
-            "Rogue": {"expansionism": 1.2, "aggression": 1.8, "defense": 0.5, "risk": 2.0},
-            "Cult": {"expansionism": 1.0, "aggression": 0.9, "defense": 1.2, "risk": 1.5},
-            "Neutral": {"expansionism": 1.0, "aggression": 1.0, "defense": 1.0, "risk": 1.0}
-        }
+    def new_game(self, factions=200, archetypes=None):
+        """Start over with ``factions`` new factions.
+
+        Archetypes are drawn uniformly from ``ARCHETYPES`` or from a list of
+        archetype names, or by weight from a ``{name: weight}`` dict.
+        """
+        self.num_factions = factions
+        self.registry.clear()
+        if isinstance(archetypes, str):
+            archetypes = [archetypes]
+        if isinstance(archetypes, dict):
+            names, weights = list(archetypes), list(archetypes.values())
+        else:
+            names, weights = list(archetypes or ARCHETYPES), None
+        unknown = set(names) - set(ARCHETYPES)
+        if unknown:
+            raise ValueError(f"unknown archetypes: {', '.join(sorted(unknown))}")
 
         for i in range(self.num_factions):
             color = self.random_color()
             while color in self.factions:
                 color = self.random_color()
-            archetype = random.choice(list(archetypes.keys()))
-            personality = archetypes[archetype]
-            self.factions[color] = {
-                "behavior": random.choice(self.behaviors),
+            if weights is None:
+                archetype = self.rng.spawn.choice(names)
+            else:
+                archetype = self.rng.spawn.choices(names, weights)[0]
+            personality = ARCHETYPES[archetype]
+            self.registry.add(color, {
+                "behavior": self.rng.spawn.choice(self.behaviors),
                 "age": 0, "merges": 0, "offspring": 0,
-                "symbol": random.choice(["■", "●", "▲", "◆", "✦", "✶"]),
+                "symbol": self.rng.spawn.choice(["■", "●", "▲", "◆", "✦", "✶"]),
                 "name": f"Faction {i+1}",
                 "tier": 1,
-                "capital": (random.randint(0, self.grid_width - 1), random.randint(0, self.grid_height - 1)),
+                "capital": (self.rng.spawn.randint(0, self.grid_width - 1), self.rng.spawn.randint(0, self.grid_height - 1)),
                 "archetype": archetype,
                 "personality": personality.copy(),
                 "memory": [],
                 "relations": {},
-                "dna": f"{archetype[0]}-{random.randint(1000,9999)}",
+                "dna": f"{archetype[0]}-{self.rng.spawn.randint(1000,9999)}",
                 "lore": {
-                    "motto": random.choice(["No mercy.", "Evolve or die.", "Unity is strength.", "From ash we rise."]),
-                    "origin": random.choice(["volcanic ruin", "frozen tower", "desert tomb", "digital void"]),
-                    "victory_quote": random.choice(["We. Are. Eternal.", "Nothing can stop us.", "The world belongs to us now."])
+                    "motto": self.rng.spawn.choice(["No mercy.", "Evolve or die.", "Unity is strength.", "From ash we rise."]),
+                    "origin": self.rng.spawn.choice(["volcanic ruin", "frozen tower", "desert tomb", "digital void"]),
+                    "victory_quote": self.rng.spawn.choice(["We. Are. Eternal.", "Nothing can stop us.", "The world belongs to us now."])
                 }
-            }
+            })
 
-        for c1 in self.factions:
-            for c2 in self.factions:
-                if c1 != c2:
-                    self.factions[c1]["relations"][c2] = round(random.uniform(-0.3, 0.3), 2)
+        self.registry.relations.randomize(self.registry.alive_ids())
 
         self.experimental_zones = set()
         for _ in range(3):
-            x = random.randint(0, self.grid_width - 1)
-            y = random.randint(0, self.grid_height - 1)
+            x = self.rng.spawn.randint(0, self.grid_width - 1)
+            y = self.rng.spawn.randint(0, self.grid_height - 1)
             self.experimental_zones.add((x, y))
 
-        self.grid = [[None for _ in range(self.grid_width)] for _ in range(self.grid_height)]
-        self.claim_age = [[0 for _ in range(self.grid_width)] for _ in range(self.grid_height)]
-        self.last_owner = [[None for _ in range(self.grid_width)] for _ in range(self.grid_height)]
-        self.overwrite_cooldown = [[0 for _ in range(self.grid_width)] for _ in range(self.grid_height)]
+        self.reset_grid()
+        self.tick = 0
+        self.terrain.mark("experimental", self.experimental_zones)
+        self.terrain.fill_voronoi(self.rng.spawn, self.biome_regions)
         self.populate()
-        threading.Thread(target=self.simulate, daemon=True).start()
+        self.redraw()
+        if not self.headless:
+            threading.Thread(target=self.simulate, daemon=True).start()
 
-    def simulate(self):
+    def simulate(self, ticks=None, observe=None):
+        """Run simulation cycles until stopped, or for ``ticks`` cycles if given.
+
+        ``observe(cycle, faction_power)``, if given, is called at the end of
+        every cycle with the power counted at its start. Returns the number
+        of cycles run.
+        """
         total_cells = self.grid_width * self.grid_height
         cycle_count = 0
+        profiler = self.profiler
+
+        while self.running:
+            if ticks is not None and cycle_count >= ticks:
+                break
+            profiler.start()
+            # IDs of factions that died last cycle become reusable
+            self.registry.recycle()
 
-        while self.running and pygame.display.get_init():
             # Count faction power
-            faction_power = {}
-            for row in self.grid:
-                for color in row:
-                    if color in self.factions:
-                        faction_power[color] = faction_power.get(color, 0) + 1
+            faction_power = self.count_faction_power()
+            profiler.mark("power")
 
-            self.step(faction_power)
+            changed = self.step(faction_power)
+            profiler.mark("step")
             self.check_victory(faction_power)
+            profiler.mark("victory")
 
             # Auto merge chance scales with time
-            if random.random() < min(0.002 + cycle_count / 200000, 0.08) and len(self.factions) >= 2:
+            if self.rng.events.random() < min(0.002 + cycle_count / 200000, 0.08) and len(self.factions) >= 2:
                 self.auto_merge_random_factions()
+            profiler.mark("merge")
 
             # Random biome disaster
-            if cycle_count % 100 == 0 and random.random() < 0.8:
+            if cycle_count % 100 == 0 and self.rng.events.random() < 0.8:
                 self.trigger_disaster()
+            profiler.mark("disasters")
 
             # GC to prevent leaks
             if cycle_count % 100 == 0:
                 gc.collect()
+            profiler.mark("gc")
 
             # Decay dominant faction if too strong
             if cycle_count % 50 == 0 and faction_power:
-                dominant_color, dominant_count = max(faction_power.items(), key=lambda item: item[1])
+                dominant_id, dominant_count = max(faction_power.items(), key=lambda item: item[1])
                 if dominant_count / total_cells >= 0.6:
-                    removed = 0
-                    for _ in range(1000):
-                        x = random.randint(0, self.grid_width - 1)
-                        y = random.randint(0, self.grid_height - 1)
-                        if self.grid[y][x] == dominant_color:
-                            self.grid[y][x] = None
-                            pygame.draw.rect(self.screen, pygame.Color("black"),
-                                             pygame.Rect(x * self.cell_size, y * self.cell_size, self.cell_size, self.cell_size))
-                            removed += 1
-                        if removed >= 100:
-                            break
+                    self.probe_cells(dominant_id, EMPTY, 1000, 100)
 
             # Enhanced progressive decay
             if cycle_count % 100 == 0 and faction_power:
-                dominant_color, dominant_count = max(faction_power.items(), key=lambda item: item[1])
+                dominant_id, dominant_count = max(faction_power.items(), key=lambda item: item[1])
+                dominant_color = self.registry.colors[dominant_id]
                 dominant_ratio = dominant_count / total_cells
 
                 if dominant_ratio >= 0.5:
                     decay_strength = int(dominant_ratio * 200)  # scales up to 200 tiles
-                    removed = 0
-                    for _ in range(2000):
-                        x = random.randint(0, self.grid_width - 1)
-                        y = random.randint(0, self.grid_height - 1)
-                        if self.grid[y][x] == dominant_color:
-                            self.grid[y][x] = None
-                            pygame.draw.rect(self.screen, pygame.Color("black"),
-                                            pygame.Rect(x * self.cell_size, y * self.cell_size, self.cell_size, self.cell_size))
-                            removed += 1
-                            if removed >= decay_strength:
-                                break
+                    self.probe_cells(dominant_id, EMPTY, 2000, decay_strength)
 
                     # Mutation or rebellion
                     if dominant_color in self.factions:
-                        if random.random() < 0.2:
-                            if random.random() < 0.5:
+                        if self.rng.events.random() < 0.2:
+                            if self.rng.events.random() < 0.5:
                                 self.mutate_faction(dominant_color)
                             else:
                                 self.spawn_rebellion(dominant_color)
@@ -491,33 +803,23 @@ class AISim:
 
             if dominant_color in self.factions and 0.35 <= dominant_ratio <= 0.65:
                 if 0.35 <= dominant_ratio <= 0.65:
-                    if random.random() < 0.6:
+                    if self.rng.events.random() < 0.6:
                         self.spawn_rebellion(dominant_color)
-                    if random.random() < 0.4:
+                    if self.rng.events.random() < 0.4:
                         self.mutate_faction(dominant_color)
-                    if random.random() < 0.3:
-                        removed = 0
-                        for _ in range(2000):
-                            x = random.randint(0, self.grid_width - 1)
-                            y = random.randint(0, self.grid_height - 1)
-                            if self.grid[y][x] == dominant_color:
-                                self.grid[y][x] = None
-                                pygame.draw.rect(self.screen, pygame.Color("black"),
-                                                pygame.Rect(x * self.cell_size, y * self.cell_size, self.cell_size, self.cell_size))
-                                removed += 1
-                            if removed >= 150:
-                                break
+                    if self.rng.events.random() < 0.3:
+                        self.probe_cells(dominant_id, EMPTY, 2000, 150)
+
+            profiler.mark("decay")
 
             # Cull weakest every 1000 cycles
             if cycle_count % 1000 == 0 and len(self.factions) > 10:
                 if faction_power:
                     weakest = min(faction_power.items(), key=lambda item: item[1])[0]
-                    if weakest in self.factions:
-                        del self.factions[weakest]
-                        for y in range(self.grid_height):
-                            for x in range(self.grid_width):
-                                if self.grid[y][x] == weakest:
-                                    self.grid[y][x] = None
+                    if self.registry.alive[weakest]:
+                        self.registry.remove(weakest)
+                        self.relabel_factions([weakest])
+            profiler.mark("cull")
 
             # 💀 Respawn system: if factions fall below 5, generate more
             if len(self.factions) < 5:
@@ -526,106 +828,216 @@ class AISim:
                     while new_color in self.factions:
                         new_color = self.random_color()
 
-                    self.factions[new_color] = {
-                        "behavior": random.choice(self.behaviors),
+                    regen = self.registry.add(new_color, {
+                        "behavior": self.rng.spawn.choice(self.behaviors),
                         "age": 0,
                         "merges": 0,
                         "offspring": 0,
-                        "symbol": random.choice(["⬢", "⬡", "⬣", "✴"]),
+                        "symbol": self.rng.spawn.choice(["⬢", "⬡", "⬣", "✴"]),
                         "name": f"Regen {len(self.factions) + 1}",
                         "tier": 1,
                         "personality": {
-                            "aggression": round(random.uniform(0.5, 1.5), 2),
-                            "defense": round(random.uniform(0.5, 1.5), 2),
-                            "expansionism": round(random.uniform(0.5, 1.5), 2),
-                            "risk": round(random.uniform(0.5, 1.5), 2)
+                            "aggression": round(self.rng.spawn.uniform(0.5, 1.5), 2),
+                            "defense": round(self.rng.spawn.uniform(0.5, 1.5), 2),
+                            "expansionism": round(self.rng.spawn.uniform(0.5, 1.5), 2),
+                            "risk": round(self.rng.spawn.uniform(0.5, 1.5), 2)
                         },
                         "relations": {}
-                    }
+                    })
 
                     # Place on the map
+                    if self.engine is not None:
+                        self.write_cells(self.engine.choose(EMPTY, 30), regen.id)
+                        continue
                     placed = 0
                     while placed < 30:
-                        x = random.randint(0, self.grid_width - 1)
-                        y = random.randint(0, self.grid_height - 1)
-                        if self.grid[y][x] is None:
-                            self.grid[y][x] = new_color
-                            pygame.draw.rect(self.screen, pygame.Color(new_color),
-                                            pygame.Rect(x * self.cell_size, y * self.cell_size, self.cell_size, self.cell_size))
+                        x = self.rng.spawn.randint(0, self.grid_width - 1)
+                        y = self.rng.spawn.randint(0, self.grid_height - 1)
+                        if self.grid[y][x] == EMPTY:
+                            self.set_cell(x, y, regen.id)
                             placed += 1
 
                 # 💬 Log regeneration
                 print(f"🧬 Factions regenerated: {len(self.factions)} alive")
+            profiler.mark("respawn")
 
             # Tie breaker — decay both if only 2 factions left
             if len(self.factions) == 2 and cycle_count % 100 == 0:
-                for color in list(self.factions):
-                    removed = 0
-                    for _ in range(100):
-                        x = random.randint(0, self.grid_width - 1)
-                        y = random.randint(0, self.grid_height - 1)
-                        if self.grid[y][x] == color:
-                            self.grid[y][x] = None
-                            removed += 1
+                for fid in self.registry.alive_ids():
+                    self.probe_cells(fid, EMPTY, 100)
+            profiler.mark("decay")
 
             # Inject noise
-            if random.random() < 0.0005:
-                x, y = random.randint(0, self.grid_width - 1), random.randint(0, self.grid_height - 1)
-                self.grid[y][x] = random.choice(list(self.factions.keys()))
-                
+            if self.rng.events.random() < 0.0005:
+                x, y = self.rng.events.randint(0, self.grid_width - 1), self.rng.events.randint(0, self.grid_height - 1)
+                self.set_cell(x, y, self.rng.events.choice(self.registry.alive_ids()))
+
             # Trigger rare world events every 500 ticks
             if cycle_count - self.last_world_event >= 500:
                 self.last_world_event = cycle_count
                 self.trigger_world_event()
-
+            profiler.mark("events")
+
+            if self.territory_check_every and cycle_count % self.territory_check_every == 0:
+                self.territory.verify(self.recount_territory())
+
+            self.tick += 1
+            self.publish_frame()
+            if self.replay is not None:
+                self.replay.record(self.grid, self.registry)
+            if self.autosave is not None and self.autosave.due():
+                self.autosave.save(self.snapshot())
+            if self.checkpoint_every and self.engine.tick % self.checkpoint_every == 0:
+                self.checkpoint()
+            profiler.end(changed)
+            if observe is not None:
+                observe(cycle_count, faction_power)
             cycle_count += 1
-            time.sleep(0.01)
+            if not self.headless:
+                time.sleep(0.01)
+        if self.checkpoint_every and self.engine.changed:
+            self.checkpoint()
+        return cycle_count
+
+    def start_replay(self, file_path, keyframe_every=1000, compression="zlib"):
+        """Record every following tick to a replay file, starting from the current grid."""
+        self.stop_replay()
+        self.replay = TickRecorder(file_path, self.grid, self.registry, keyframe_every, compression=compression)
+
+    def stop_replay(self):
+        if self.replay is not None:
+            self.replay.close()
+            self.replay = None
+
+    def close(self):
+        """Stop the parallel stepper's workers and unlink its shared memory."""
+        if self.stepper is not None:
+            self.stepper.close()
+            self.stepper = None
+
+    def fuse_factions(self, source_id, target_id):
+        """Return the ID of the blend of two factions, founding the fusion faction if it is new."""
+        color, target = self.registry.colors[source_id], self.registry.colors[target_id]
+        new_color = self.blend_colors(color, target)
+        if new_color not in self.factions:
+            fusion = self.registry.add(new_color, {
+                "behavior": self.rng.spawn.choice([self.factions[color]["behavior"], self.factions[target]["behavior"]]),
+                "age": 0, "merges": 0, "offspring": 0,
+                "symbol": self.rng.spawn.choice(["❖", "✶", "⬟", "★"]),
+                "name": f"Fusion of {self.factions[color]['name']} + {self.factions[target]['name']}",
+                "tier": max(self.factions[color]["tier"], self.factions[target]["tier"]) + 1,
+                "personality": {
+                    k: (self.factions[color]["personality"][k] + self.factions[target]["personality"][k]) / 2
+                    for k in ["aggression", "defense", "expansionism", "risk"]
+                }
+            })
+            if self.replay is not None:
+                self.replay.event("merge", parents=[source_id, target_id], child=fusion.id, via="fusion")
+        return self.registry.id_of(new_color)
+
+    def drift_personalities(self):
+        aggression = self.registry.traits["aggression"]
+        expansionism = self.registry.traits["expansionism"]
+        rng = self.rng.step
+        for fid in self.registry.alive_ids():
+            aggression[fid] = min(max(aggression[fid] + rng.uniform(-0.01, 0.01), 0.3), 2.0)
+            expansionism[fid] = min(max(expansionism[fid] + rng.uniform(-0.01, 0.01), 0.3), 2.0)
+
+    def draw_cell(self, x, y, color):
+        """Queue a repaint of one cell for the next published frame, and note it for the replay."""
+        if self.replay is not None:
+            self.replay.touch_cell(y * self.grid_width + x)
+        if self.frames is not None:
+            self.pending_cells.append(y * self.grid_width + x)
+            self.pending_colors.append(color)
+
+    def publish_frame(self):
+        """Hand this tick's queued repaints to the renderer, or the whole grid if it asked."""
+        frames = self.frames
+        if frames is None:
+            return
+        if frames.wants_snapshot:
+            self.redraw()
+        elif self.pending_cells:
+            frames.publish(self.pending_cells, self.pending_colors)
+            self.pending_cells, self.pending_colors = [], []
+
+    def redraw(self):
+        """Repaint the whole grid, e.g. after it was replaced by a load or new game."""
+        if self.frames is None:
+            return
+        if self.engine is not None:
+            owners = self.grid.ravel().copy()
+        else:
+            owners = [fid for row in self.grid for fid in row]
+        self.frames.publish_snapshot(self.grid_width, owners, self.registry.colors, self.registry.version)
+        self.pending_cells, self.pending_colors = [], []
+
+    def step_array(self, faction_power):
+        """Vectorized ``step`` for the NumPy engine; returns the number of cells changed."""
+        if self.stepper is not None:
+            changed, previous = self.stepper.step(
+                self.engine, self.registry, faction_power, self.terrain.multiplier_array(), self.fuse_factions
+            )
+        else:
+            changed, previous = self.engine.step_factions(
+                self.registry, faction_power, self.terrain.multiplier_array(), self.fuse_factions
+            )
+        self.territory.apply(previous, self.engine.grid.ravel()[changed])
+        self.drift_personalities()
+        self.draw_cells(changed)
+        return changed.size
 
     def step(self, faction_power):
+        """Advance the grid one tick; returns the number of cells that changed owner."""
+        if self.engine is not None:
+            return self.step_array(faction_power)
+
         MAX_FACTIONS = 150
         total_cells = max(1, self.grid_width * self.grid_height)
-        new_grid = [row[:] for row in self.grid]
-
-        for y in range(self.grid_height):
-            for x in range(self.grid_width):
-                if self.overwrite_cooldown[y][x] > 0:
-                    self.overwrite_cooldown[y][x] -= 1
-
-        coords = [(x, y) for y in range(self.grid_height) for x in range(self.grid_width)]
-        random.shuffle(coords)
-
-        for x, y in coords:
-            color = self.grid[y][x]
-            if not color or color not in self.factions or color not in faction_power:
+        frontier = self.frontier
+
+        for index in list(frontier.cooling):
+            y, x = divmod(index, self.grid_width)
+            self.overwrite_cooldown[y][x] -= 1
+            if self.overwrite_cooldown[y][x] <= 0:
+                frontier.cooling.discard(index)
+
+        # Interior cells have no empty or enemy neighbour and cannot act.
+        rng = self.rng.step
+        coords = list(frontier.border)
+        rng.shuffle(coords)
+        # Owners written this tick by flat index; the loop reads the grid as it stood at the
+        # start of the tick, and only these cells are written back to it afterwards
+        claims = {}
+
+        registry = self.registry
+        territory = self.territory
+        alive = registry.alive
+        relations = registry.relations
+        # Per-faction odds for the whole tick; the loop below only indexes them
+        counts, powers, spread_base, attack_base, jitter = tick_coefficients(registry, faction_power, total_cells)
+        random = rng.random
+        tick = self.claim_age.tick
+        claimed = self.claim_age.claimed
+        terrain = self.terrain.multiplier_list()  # None: plain terrain everywhere
+
+        for index in coords:
+            y, x = divmod(index, self.grid_width)
+            fid = self.grid[y][x]
+            # Only living factions with cells act
+            if not counts[fid]:
                 continue
 
-            dominant_color = max(faction_power.items(), key=lambda item: item[1])[0]
-            dominant_ratio = faction_power[dominant_color] / total_cells
-            power = faction_power[color] / total_cells
-
-            if color == dominant_color and dominant_ratio >= 0.65:
-                power *= 0.8
-            elif color != dominant_color and dominant_ratio >= 0.65:
-                power *= 1.2
-
-            behavior = self.factions[color]["behavior"]
-            personality = self.factions[color]["personality"]
-
-            spread_chance = 0.1 + random.random() * 0.1 * personality["risk"] + power * 0.3 * personality["expansionism"]
-            attack_chance = 0.05 + random.random() * 0.1 * personality["risk"] + power * 0.4 * personality["aggression"]
+            power = powers[fid]
+            spread_chance = spread_base[fid] + random() * jitter[fid]
+            attack_chance = attack_base[fid] + random() * jitter[fid]
 
-            biome = 1.0
-            if (x, y) in self.biomes["forest"]: biome = 0.5
-            elif (x, y) in self.biomes["lava"]: biome = 0.1
-            elif (x, y) in self.biomes["oasis"]: biome = 2.0
+            if terrain is not None:
+                spread_chance *= terrain[index]
+                attack_chance *= terrain[index]
 
-            spread_chance *= biome
-            attack_chance *= biome
-
-            directions = [(0, 1), (1, 0), (-1, 0), (0, -1)]
-            random.shuffle(directions)
-
-            for dx, dy in directions:
+            for dx, dy in DIRECTION_ORDERS[int(random() * len(DIRECTION_ORDERS))]:
                 nx, ny = x + dx, y + dy
                 if not (0 <= nx < self.grid_width and 0 <= ny < self.grid_height):
                     continue
@@ -634,108 +1046,99 @@ class AISim:
 
                 # Fusion
                 if (
-                    target and target != color and target in self.factions and
-                    len(self.factions) < MAX_FACTIONS and random.random() < 0.01
+                    target and target != fid and alive[target] and
+                    len(registry) < MAX_FACTIONS and random() < 0.01
                 ):
-                    new_color = self.blend_colors(color, target)
-                    if new_color not in self.factions:
-                        self.factions[new_color] = {
-                            "behavior": random.choice([self.factions[color]["behavior"], self.factions[target]["behavior"]]),
-                            "age": 0, "merges": 0, "offspring": 0,
-                            "symbol": random.choice(["❖", "✶", "⬟", "★"]),
-                            "name": f"Fusion of {self.factions[color]['name']} + {self.factions[target]['name']}",
-                            "tier": max(self.factions[color]["tier"], self.factions[target]["tier"]) + 1,
-                            "personality": {
-                                k: (self.factions[color]["personality"][k] + self.factions[target]["personality"][k]) / 2
-                                for k in ["aggression", "defense", "expansionism", "risk"]
-                            }
-                        }
-                    new_grid[ny][nx] = new_color
-                    if self.running and pygame.display.get_init():
-                        pygame.draw.rect(self.screen, pygame.Color(new_color),
-                                         pygame.Rect(nx * self.cell_size, ny * self.cell_size, self.cell_size, self.cell_size))
+                    new_id = self.fuse_factions(fid, target)
+                    cell = ny * self.grid_width + nx
+                    territory.move(claims.get(cell, target), new_id)
+                    claims[cell] = new_id
+                    self.draw_cell(nx, ny, registry.colors[new_id])
                     continue
 
-                if target is None and random.random() < spread_chance:
-                    new_grid[ny][nx] = color
-                    if self.running and pygame.display.get_init():
-                        pygame.draw.rect(self.screen, pygame.Color(color),
-                                         pygame.Rect(nx * self.cell_size, ny * self.cell_size, self.cell_size, self.cell_size))
+                if target == EMPTY and random() < spread_chance:
+                    cell = ny * self.grid_width + nx
+                    territory.move(claims.get(cell, target), fid)
+                    claims[cell] = fid
+                    self.draw_cell(nx, ny, registry.colors[fid])
                     continue
 
-                elif target != color and target in self.factions:
-                    if self.overwrite_cooldown[ny][nx] == 0 and self.claim_age[ny][nx] >= 6:
-                        if "relations" in self.factions[color] and target in self.factions[color]["relations"]:
-                            relation = self.factions[color]["relations"][target]
-                        else:
-                            relation = 0
+                elif target != fid and alive[target]:
+                    if self.overwrite_cooldown[ny][nx] == 0 and tick - claimed[ny][nx] >= 6:
+                        relation = relations.get(fid, target)
                         diplomatic_modifier = 1.0 - max(0, relation)  # reduces attack chance if they're friendly
-                        if power > faction_power.get(target, 0) or random.random() < attack_chance * diplomatic_modifier:
-                            new_grid[ny][nx] = color
+                        if power > counts[target] or random() < attack_chance * diplomatic_modifier:
+                            cell = ny * self.grid_width + nx
+                            territory.move(claims.get(cell, target), fid)
+                            claims[cell] = fid
                             self.overwrite_cooldown[ny][nx] = 4
-                            if self.running and pygame.display.get_init():
-                                pygame.draw.rect(self.screen, pygame.Color(color),
-                                                 pygame.Rect(nx * self.cell_size, ny * self.cell_size, self.cell_size, self.cell_size))
-
-        for faction in self.factions.values():
-            faction["personality"]["aggression"] += random.uniform(-0.01, 0.01)
-            faction["personality"]["aggression"] = min(max(faction["personality"]["aggression"], 0.3), 2.0)
-            faction["personality"]["expansionism"] += random.uniform(-0.01, 0.01)
-            faction["personality"]["expansionism"] = min(max(faction["personality"]["expansionism"], 0.3), 2.0)
-
-        self.grid = new_grid
-        for y in range(self.grid_height):
-            for x in range(self.grid_width):
-                self.claim_age[y][x] = (
-                    self.claim_age[y][x] + 1 if new_grid[y][x] == self.grid[y][x] else 0
-                )
-                self.last_owner[y][x] = self.grid[y][x]
+                            frontier.cool(nx, ny)
+                            self.draw_cell(nx, ny, registry.colors[fid])
+
+        self.drift_personalities()
+
+        # Every cell ages by one; cells that changed owner restart at zero.
+        self.claim_age.tick += 1
+        grid, last_owner, cell_index = self.grid, self.last_owner, self.cell_index
+        changed = 0
+        for cell, fid in claims.items():
+            y, x = divmod(cell, self.grid_width)
+            old = grid[y][x]
+            if fid != old:
+                changed += 1
+                grid[y][x] = last_owner[y][x] = fid
+                claimed[y][x] = self.claim_age.tick
+                frontier.touch(grid, x, y)
+                cell_index.move(cell, old, fid)
+        # last_owner is the grid as of the end of the tick, also where set_cell wrote since the last one
+        for cell in self.written:
+            y, x = divmod(cell, self.grid_width)
+            last_owner[y][x] = grid[y][x]
+        self.written = []
+        if self.storage == "chunked" and self.claim_age.tick % COMPACT_EVERY == 0:
+            grid.compact()
+            self.overwrite_cooldown.compact()
+        return changed
 
     def check_victory(self, power_map=None):
+        """Announce and return the ID of a faction holding ``VICTORY_SHARE`` of the map, or None."""
         if power_map is None:
-            power_map = {}
-            for row in self.grid:
-                for color in row:
-                    if color:
-                        power_map[color] = power_map.get(color, 0) + 1
+            power_map = self.count_faction_power()
 
         total = self.grid_width * self.grid_height
-        for color, count in power_map.items():
-            if count / total >= 0.95:
-                print(f"{self.factions.get(color, {'name': color})['name']} controls 95% of the map!")
+        for fid, count in power_map.items():
+            if count / total >= VICTORY_SHARE:
+                print(f"{self.registry.names[fid]} controls {VICTORY_SHARE:.0%} of the map!")
+                return fid
+        return None
 
     def auto_merge_random_factions(self):
-        color1, color2 = random.sample(list(self.factions.keys()), 2)
+        color1, color2 = self.rng.events.sample(list(self.factions.keys()), 2)
         new_color = self.blend_colors(color1, color2)
         if new_color in self.factions:
             return
 
         new_name = f"Merged {self.factions[color1]['name'].split()[1]}-{self.factions[color2]['name'].split()[1]}"
-        self.factions[new_color] = {
-            "behavior": random.choice([self.factions[color1]["behavior"], self.factions[color2]["behavior"]]),
+        merged = self.registry.add(new_color, {
+            "behavior": self.rng.spawn.choice([self.factions[color1]["behavior"], self.factions[color2]["behavior"]]),
             "age": 0, "merges": 0, "offspring": 0,
-            "symbol": random.choice([self.factions[color1]["symbol"], self.factions[color2]["symbol"]]),
+            "symbol": self.rng.spawn.choice([self.factions[color1]["symbol"], self.factions[color2]["symbol"]]),
             "name": new_name,
             "tier": max(self.factions[color1]["tier"], self.factions[color2]["tier"]) + 1,
             "personality": {
                 k: (self.factions[color1]["personality"][k] + self.factions[color2]["personality"][k]) / 2
                 for k in ["aggression", "defense", "expansionism", "risk"]
             }
-        }
-        self.factions[new_color]["relations"] = {}
-        for c in self.factions:
-            if c != new_color:
-                self.factions[new_color]["relations"][c] = round(random.uniform(-0.3, 0.3), 2)
-                if "relations" in self.factions[c]:
-                    self.factions[c]["relations"][new_color] = round(random.uniform(-0.3, 0.3), 2)
+        })
+        self.registry.relations.randomize([merged.id], self.registry.alive_ids())
 
+        id1, id2 = self.registry.id_of(color1), self.registry.id_of(color2)
+        self.relabel_factions([id1, id2], merged.id)
+        if self.replay is not None:
+            self.replay.event("merge", parents=[id1, id2], child=merged.id, via="auto")
 
-        for y in range(self.grid_height):
-            for x in range(self.grid_width):
-                if self.grid[y][x] in (color1, color2):
-                    self.grid[y][x] = new_color
-
-        del self.factions[color1], self.factions[color2]
+        self.registry.remove(id1)
+        self.registry.remove(id2)
 
     def blend_colors(self, c1, c2):
         to_rgb = lambda h: tuple(int(h.lstrip('#')[i:i+2], 16) for i in (0, 2, 4))
@@ -744,81 +1147,79 @@ class AISim:
         r2, g2, b2 = to_rgb(c2)
         return to_hex((r1 + r2) // 2, (g1 + g2) // 2, (b1 + b2) // 2)
 
-    def trigger_disaster(self):
-        event = random.choice(["plague", "quake", "flare", "volcano", "storm", "wipeout"])
+    def trigger_disaster(self, event=None):
+        """Strike the map with ``event`` (one of ``DISASTERS``), or a random one."""
+        if event is None:
+            event = self.rng.events.choice(DISASTERS)
 
         if event == "plague":
-            for _ in range(200):
-                x, y = random.randint(0, self.grid_width - 1), random.randint(0, self.grid_height - 1)
-                if self.grid[y][x]:
-                    self.grid[y][x] = None
+            self.probe_cells(None, EMPTY, 200)
+
+        elif event == "quake" and self.engine is not None:
+            # Swaps move cells between owners without changing any totals
+            self.draw_cells(self.engine.quake(200))
 
         elif event == "quake":
             for _ in range(200):
-                x, y = random.randint(0, self.grid_width - 1), random.randint(0, self.grid_height - 1)
-                dx, dy = random.choice([(1, 0), (-1, 0), (0, 1), (0, -1)])
+                x, y = self.rng.events.randint(0, self.grid_width - 1), self.rng.events.randint(0, self.grid_height - 1)
+                dx, dy = self.rng.events.choice([(1, 0), (-1, 0), (0, 1), (0, -1)])
                 nx, ny = x + dx, y + dy
                 if 0 <= nx < self.grid_width and 0 <= ny < self.grid_height:
-                    self.grid[y][x], self.grid[ny][nx] = self.grid[ny][nx], self.grid[y][x]
+                    a, b = self.grid[y][x], self.grid[ny][nx]
+                    self.set_cell(x, y, b)
+                    self.set_cell(nx, ny, a)
 
         elif event == "flare":
-            for color in list(self.factions):
-                if self.factions[color]["behavior"] == "teleporter":
-                    del self.factions[color]
-                    for y in range(self.grid_height):
-                        for x in range(self.grid_width):
-                            if self.grid[y][x] == color:
-                                self.grid[y][x] = None
+            teleporters = [fid for fid in self.registry.alive_ids() if self.registry.behaviors[fid] == "teleporter"]
+            for fid in teleporters:
+                self.registry.remove(fid)
+            self.relabel_factions(teleporters)
 
         elif event == "volcano":
             # Hit large chunks from dominant faction
-            power_map = {color: 0 for color in self.factions}
-            for row in self.grid:
-                for cell in row:
-                    if cell in power_map:
-                        power_map[cell] += 1
+            power_map = self.count_faction_power()
             if power_map:
                 target = max(power_map.items(), key=lambda x: x[1])[0]
-                for _ in range(1000):
-                    x, y = random.randint(0, self.grid_width - 1), random.randint(0, self.grid_height - 1)
-                    if self.grid[y][x] == target:
-                        self.grid[y][x] = None
-                        pygame.draw.rect(self.screen, pygame.Color("black"),
-                                        pygame.Rect(x * self.cell_size, y * self.cell_size, self.cell_size, self.cell_size))
+                self.probe_cells(target, EMPTY, 1000)
 
         elif event == "storm":
-            for color in list(self.factions):
-                eroded = 0
-                for _ in range(300):
-                    x, y = random.randint(0, self.grid_width - 1), random.randint(0, self.grid_height - 1)
-                    if self.grid[y][x] == color:
-                        self.grid[y][x] = None
-                        eroded += 1
-                        if eroded >= 80:
-                            break
+            for fid in self.registry.alive_ids():
+                self.probe_cells(fid, EMPTY, 300, 80)
 
         elif event == "wipeout" and len(self.factions) > 3:
             # Extremely rare total faction wipe
-            target = random.choice(list(self.factions.keys()))
-            del self.factions[target]
-            for y in range(self.grid_height):
-                for x in range(self.grid_width):
-                    if self.grid[y][x] == target:
-                        self.grid[y][x] = None
+            target = self.rng.events.choice(self.registry.alive_ids())
+            self.registry.remove(target)
+            self.relabel_factions([target])
 
         print(f"🌪 Disaster triggered: {event}")
 
+    def profile_rect(self):
+        """The part of the UI strip right of the buttons that the profile overlay uses."""
+        return pygame.Rect(470, self.canvas_height + 5, max(0, self.canvas_width - 480), 30)
+
+    def draw_profile(self):
+        """Overlay rolling tick timings in the UI strip, refreshed twice a second."""
+        now = time.perf_counter()
+        if not self.show_profile or now - self.profile_drawn < 0.5:
+            return
+        self.profile_drawn = now
+        summary = self.profiler.summary()
+        total = summary["total"]
+        slowest = max(PHASES, key=lambda phase: summary[phase]["mean"])
+        text = (f"tick p50 {total['p50'] * 1000:.1f} ms  p90 {total['p90'] * 1000:.1f}  "
+                f"p99 {total['p99'] * 1000:.1f}  |  {slowest} {summary[slowest]['mean'] * 1000:.1f} ms  |  "
+                f"{summary['changed']['mean']:.0f} cells/tick")
+        rect = self.profile_rect()
+        self.screen.fill((0, 0, 0), rect)
+        label = self.font.render(text, True, (200, 200, 200))
+        self.screen.blit(label, (rect.x, rect.y + (rect.height - label.get_height()) // 2))
+
     def run(self):
         self.clock = pygame.time.Clock()
-        for y in range(self.grid_height):
-            for x in range(self.grid_width):
-                color = self.grid[y][x]
-                if color:
-                    pygame.draw.rect(
-                        self.screen,
-                        pygame.Color(color),
-                        pygame.Rect(x * self.cell_size, y * self.cell_size, self.cell_size, self.cell_size)
-                    )
+        self.redraw()
+        self.renderer.show(self.frames)
+        self.renderer.present()
         pygame.display.flip()
 
         simulation_started = False
@@ -828,10 +1229,12 @@ class AISim:
             time_delta = self.clock.tick(60) / 1000.0
             self.ui_manager.update(time_delta)
             self.ui_manager.draw_ui(self.screen)
-            pygame.display.flip()
+            self.draw_profile()
+            self.renderer.show(self.frames)
+            self.renderer.present([self.ui_rect])
 
             # Only start simulation after load is complete or if it's a fresh game
-            if not simulation_started and (self.load_complete or not self.grid):
+            if not simulation_started and (self.load_complete or self.grid_width * self.grid_height == 0):
                 threading.Thread(target=self.simulate, daemon=True).start()
                 simulation_started = True
 
@@ -841,12 +1244,109 @@ class AISim:
             time_delta = self.clock.tick(60) / 1000.0
             self.ui_manager.update(time_delta)
             self.ui_manager.draw_ui(self.screen)
-            pygame.display.flip()
+            self.draw_profile()
+            self.renderer.show(self.frames)
+            self.renderer.present([self.ui_rect])
 
+        self.close()
         pygame.quit()
         sys.exit()
 
 # Start the simulation
 if __name__ == "__main__":
-    sim = AISim()
-    sim.run()
+    parser = argparse.ArgumentParser(description="Eternal AI Faction Simulator")
+    parser.add_argument("--engine", choices=["python", "numpy"], default="python",
+                        help="Grid engine: per-cell Python lists or NumPy arrays")
+    parser.add_argument("--check-territory", type=int, default=0, metavar="N",
+                        help="Debug: verify incremental territory counts against a full recount every N ticks")
+    parser.add_argument("--headless", action="store_true",
+                        help="Run without a window or frame throttle, e.g. on servers or for benchmarks")
+    parser.add_argument("--ticks", type=int, default=None, metavar="N",
+                        help="Headless: stop after N cycles (default: run until interrupted)")
+    parser.add_argument("--grid-size", type=int, nargs=2, metavar=("W", "H"), default=None,
+                        help="Grid width and height (headless default: 200 100); windowed runs fit the "
+                             "monitor unless given, and larger grids can be zoomed and panned")
+    parser.add_argument("--save-compression", choices=COMPRESSIONS, default="zlib",
+                        help="Compression for binary .cwgbin saves")
+    parser.add_argument("--dense-relations", type=int, default=DENSE_LIMIT, metavar="N",
+                        help="Keep faction relations in a dense matrix up to N faction IDs, sparse beyond")
+    parser.add_argument("--storage", choices=STORAGES, default="lists",
+                        help="Grid storage: rows of lists, or with the python engine lazily allocated 64x64 "
+                             "chunks for very large, mostly empty maps, or with the numpy engine files "
+                             "memory-mapped from --run-dir for maps larger than RAM")
+    parser.add_argument("--run-dir", default=None, metavar="DIR",
+                        help="With --storage memmap: keep the grid files in DIR (default: a temporary directory)")
+    parser.add_argument("--checkpoint-every", type=int, default=0, metavar="N",
+                        help="With --storage memmap: checkpoint --run-dir every N ticks and on exit")
+    parser.add_argument("--resume", action="store_true",
+                        help="Headless, with --storage memmap: continue the run checkpointed in --run-dir")
+    parser.add_argument("--workers", type=int, default=0, metavar="N",
+                        help="With --engine numpy: step the grid in stripes on N worker processes")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="Seed the random streams; the same seed and engine replay the same game")
+    parser.add_argument("--biome-regions", type=int, default=0, metavar="N",
+                        help="Cover new maps with N contiguous biome regions (default: plain terrain)")
+    parser.add_argument("--replay", default=None, metavar="FILE",
+                        help="Record every tick to a .cwgreplay file (needs NumPy); inspect with python -m colorwar.replay")
+    parser.add_argument("--keyframe-every", type=int, default=1000, metavar="K",
+                        help="With --replay: store the whole grid every K ticks (default: %(default)s)")
+    parser.add_argument("--autosave", default=None, metavar="DIR",
+                        help="Save to DIR in the background, keeping the newest --autosave-keep saves (needs NumPy)")
+    parser.add_argument("--autosave-ticks", type=int, default=500, metavar="N",
+                        help="With --autosave: save every N ticks; 0 to save by wall-clock time only")
+    parser.add_argument("--autosave-seconds", type=float, default=None, metavar="S",
+                        help="With --autosave: also save every S seconds")
+    parser.add_argument("--autosave-keep", type=int, default=5, metavar="N",
+                        help="With --autosave: number of autosaves to keep (default: %(default)s)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Time each phase of every tick; windowed runs show it in the UI strip (F3 toggles)")
+    parser.add_argument("--profile-out", default=None, metavar="FILE",
+                        help="With --profile: write the last 1000 ticks on exit, as CSV for .csv, JSON otherwise")
+    args = parser.parse_args()
+    if args.resume and not args.run_dir:
+        parser.error("--resume needs --run-dir")
+    if args.autosave and args.storage == "memmap":
+        parser.error("--autosave copies the whole grid into memory; use --checkpoint-every with memmap storage")
+    autosave = None
+    if args.autosave:
+        autosave = Autosaver(args.autosave, args.autosave_ticks, args.autosave_seconds,
+                             args.autosave_keep, args.save_compression)
+        atexit.register(autosave.close)
+    if args.headless:
+        sim = AISim(engine=args.engine, territory_check_every=args.check_territory,
+                    headless=True, grid_size=tuple(args.grid_size or (200, 100)), save_compression=args.save_compression,
+                    dense_relations=args.dense_relations, workers=args.workers, seed=args.seed,
+                    profile=args.profile, autosave=autosave, biome_regions=args.biome_regions,
+                    storage=args.storage, run_dir=args.run_dir, checkpoint_every=args.checkpoint_every)
+        if args.profile and args.profile_out:
+            atexit.register(sim.profiler.export, args.profile_out)
+        if args.resume:
+            sim.resume(args.run_dir)
+        else:
+            sim.new_game()
+        if args.replay:
+            sim.start_replay(args.replay, args.keyframe_every)
+        started = time.perf_counter()
+        ticks = sim.simulate(ticks=args.ticks)
+        elapsed = time.perf_counter() - started
+        sim.stop_replay()
+        sim.close()
+        print(f"Simulated {ticks} ticks in {elapsed:.2f}s; {len(sim.factions)} factions alive (seed {sim.rng.seed})")
+        if args.profile:
+            for phase, stats in sim.profiler.summary().items():
+                scale, unit = (1, "cells") if phase == "changed" else (1000, "ms")
+                print(f"  {phase:>9}: mean {stats['mean'] * scale:9.2f}  p50 {stats['p50'] * scale:9.2f}  "
+                      f"p90 {stats['p90'] * scale:9.2f}  p99 {stats['p99'] * scale:9.2f} {unit}")
+    else:
+        sim = AISim(engine=args.engine, territory_check_every=args.check_territory,
+                    grid_size=tuple(args.grid_size) if args.grid_size else None,
+                    save_compression=args.save_compression, dense_relations=args.dense_relations,
+                    workers=args.workers, seed=args.seed, profile=args.profile, autosave=autosave,
+                    biome_regions=args.biome_regions, storage=args.storage, run_dir=args.run_dir,
+                    checkpoint_every=args.checkpoint_every)
+        if args.profile and args.profile_out:
+            atexit.register(sim.profiler.export, args.profile_out)
+        if args.replay:
+            sim.start_replay(args.replay, args.keyframe_every)
+            atexit.register(sim.stop_replay)
+        sim.run()
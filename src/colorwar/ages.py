@@ -0,0 +1,81 @@
+"""Claim ages for list-of-lists grids.
+
+Ageing every cell by one at the end of each tick is an O(cells) Python loop.
+:class:`ClaimAges` stores the tick on which each cell was last claimed
+instead, so a tick only touches the cells that changed owner and a cell's age
+is ``tick - claimed``.
+
+The claim ticks are rows of lists by default, or a
+:class:`~colorwar.chunks.ChunkedGrid` for chunked storage.
+"""
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised only without numpy
+    np = None
+
+from .chunks import ChunkedGrid, copy_rows
+
+
+class _AgeRow:
+    __slots__ = ("_ages", "_claimed")
+
+    def __init__(self, ages: "ClaimAges", y: int):
+        self._ages = ages
+        self._claimed = ages.claimed[y]
+
+    def __len__(self) -> int:
+        return len(self._claimed)
+
+    def __getitem__(self, x: int) -> int:
+        return self._ages.tick - self._claimed[x]
+
+    def __setitem__(self, x: int, age: int) -> None:
+        self._claimed[x] = self._ages.tick - age
+
+    def __iter__(self):
+        tick = self._ages.tick
+        return (tick - claimed for claimed in self._claimed)
+
+
+class ClaimAges:
+    """``ages[y][x]`` access to claim ages backed by per-cell claim ticks."""
+
+    def __init__(self, width: int, height: int, chunked: bool = False):
+        self.tick = 0
+        if chunked:
+            self.claimed = ChunkedGrid(width, height, 0)
+        else:
+            self.claimed = [[0 for _ in range(width)] for _ in range(height)]
+
+    def __len__(self) -> int:
+        return len(self.claimed)
+
+    def load(self, ages) -> None:
+        """Set every cell's age from rows of ages; chunked claim ticks take a 2-D array instead."""
+        tick = self.tick
+        if isinstance(self.claimed, ChunkedGrid):
+            self.claimed.load(tick - np.asarray(ages, dtype=np.int64))
+        else:
+            self.claimed = [[tick - age for age in row] for row in ages]
+
+    def copy(self) -> "ClaimAges":
+        """An independent copy; copies claim ticks rather than computing ages."""
+        ages = ClaimAges(0, 0)
+        ages.tick = self.tick
+        ages.claimed = copy_rows(self.claimed)
+        return ages
+
+    def to_lists(self):
+        tick = self.tick
+        return [[tick - claimed for claimed in row] for row in self.claimed]
+
+    def __array__(self, dtype=None, copy=None):
+        ages = self.tick - np.asarray(self.claimed, dtype=np.int64)
+        return ages if dtype is None else ages.astype(dtype)
+
+    def __getitem__(self, y: int) -> _AgeRow:
+        return _AgeRow(self, y)
+
+    def __iter__(self):
+        return (_AgeRow(self, y) for y in range(len(self.claimed)))
@@ -0,0 +1,150 @@
+"""Background autosaves.
+
+Saving from the UI thread stalls the window while the whole grid is
+formatted, and the simulation keeps changing the grid mid-write. An
+:class:`Autosaver` instead takes a :class:`SaveSnapshot` at a tick boundary,
+on the simulation thread: private copies of the grid arrays and the faction
+table already encoded, which costs a few array copies. A worker thread then
+compresses and writes it as a binary save under a temporary name and
+renames it into place, so a crash never leaves a half-written autosave.
+File names carry the tick of the game that was saved, and only the ``keep``
+autosaves of the latest ticks are kept, so a restarted or reloaded game
+never rotates away saves of a later tick in favour of earlier ones.
+
+If the previous autosave is still being written when the next one is due,
+the new one waits for it rather than queueing copies; the simulation never
+waits for the disk.
+"""
+
+import glob
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from .engine import require_numpy
+from .savefile import BINARY_EXTENSION, COMPRESSIONS, write_encoded
+
+
+@dataclass
+class SaveSnapshot:
+    """Everything a binary save holds, copied at one tick boundary.
+
+    The arrays may be NumPy arrays, lists of rows or chunked grids
+    (``claim_age`` also a :class:`~colorwar.ages.ClaimAges`); nothing else
+    may refer to them.
+    """
+
+    tick: int
+    factions: bytes
+    grid: object
+    claim_age: object
+    overwrite_cooldown: object
+
+
+def write_atomic(path: str, snapshot: SaveSnapshot, compression: str = "zlib") -> None:
+    """Write ``snapshot`` as a binary save to ``path``, which holds either the old or the new file throughout."""
+    temp = f"{path}.tmp"
+    try:
+        write_encoded(temp, snapshot.factions, snapshot.grid, snapshot.claim_age, snapshot.overwrite_cooldown,
+                      compression, snapshot.tick)
+        fd = os.open(temp, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        os.replace(temp, path)
+    except BaseException:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
+
+
+class Autosaver:
+    """Writes a rotating set of autosaves to ``directory`` in the background.
+
+    Saves are due every ``every_ticks`` ticks, every ``every_seconds``
+    seconds of wall-clock time, or whichever comes first if both are given.
+    The simulation calls :meth:`due` once per tick and, when it returns
+    true, hands a snapshot to :meth:`save`.
+    """
+
+    def __init__(self, directory: str, every_ticks: Optional[int] = 500, every_seconds: Optional[float] = None,
+                 keep: int = 5, compression: str = "zlib", prefix: str = "autosave"):
+        require_numpy()
+        if not every_ticks and not every_seconds:
+            raise ValueError("autosave needs a tick or wall-clock interval")
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"unknown compression {compression!r}; expected one of {', '.join(COMPRESSIONS)}")
+        self.directory = directory
+        self.every_ticks = every_ticks
+        self.every_seconds = every_seconds
+        self.keep = keep
+        self.compression = compression
+        self.prefix = prefix
+        self.tick = 0
+        self.saved = 0
+        self.last_path = None
+        self.last_error = None
+        self._last_tick = 0
+        self._last_time = time.monotonic()
+        self._thread = None
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def busy(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def due(self) -> bool:
+        """Count one tick; true if a save is due and the previous one has finished."""
+        self.tick += 1
+        if self.busy:
+            return False
+        if self.every_ticks and self.tick - self._last_tick >= self.every_ticks:
+            return True
+        return bool(self.every_seconds) and time.monotonic() - self._last_time >= self.every_seconds
+
+    def save(self, snapshot: SaveSnapshot) -> None:
+        """Start writing ``snapshot`` on a worker thread and return at once."""
+        self._last_tick = self.tick
+        self._last_time = time.monotonic()
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(self.directory, f"{self.prefix}-{snapshot.tick:08d}-{stamp}{BINARY_EXTENSION}")
+        self._thread = threading.Thread(target=self._write, args=(path, snapshot), daemon=True)
+        self._thread.start()
+
+    def _write(self, path: str, snapshot: SaveSnapshot) -> None:
+        try:
+            write_atomic(path, snapshot, self.compression)
+        except OSError as exc:
+            self.last_error = exc
+            print(f"⚠️ Autosave to {path} failed: {exc}")
+            return
+        self.saved += 1
+        self.last_path = path
+        self.rotate()
+
+    def saves(self):
+        """Paths of the autosaves in ``directory``, by the tick saved and then by age, oldest first."""
+        name = re.compile(rf"{re.escape(self.prefix)}-(\d+)-\d{{8}}-\d{{6}}{re.escape(BINARY_EXTENSION)}")
+        found = []
+        for path in glob.glob(os.path.join(glob.escape(self.directory), f"{self.prefix}-*{BINARY_EXTENSION}")):
+            match = name.fullmatch(os.path.basename(path))
+            if match is not None:
+                found.append((int(match.group(1)), os.path.getmtime(path), path))
+        return [path for _, _, path in sorted(found)]
+
+    def rotate(self) -> None:
+        """Delete all but the ``keep`` autosaves of the latest ticks."""
+        for path in self.saves()[:-self.keep or None]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def close(self) -> None:
+        """Wait for the save in progress, if any."""
+        if self._thread is not None:
+            self._thread.join()
@@ -0,0 +1,288 @@
+"""Headless parameter sweeps over a process pool.
+
+A sweep spec (JSON, or TOML on Python 3.11+) fixes some run parameters and
+lists values for others under ``sweep``; every combination is run
+``repeats`` times with its own seed::
+
+    ticks = 2000
+    repeats = 5
+    seed = 42
+    engine = "numpy"
+
+    [sweep]
+    factions = [10, 50, 200]
+    grid_size = [[200, 100], [400, 200]]
+    archetypes = ["Swarm", ["Swarm", "Empire"], {Swarm = 3, Neutral = 1}]
+
+Each ``archetypes`` value is a mix for ``AISim.new_game``: one archetype
+name, a list of names drawn uniformly or a ``{name: weight}`` table.
+``biome_regions`` lays out that many biome regions on each map.
+``expansion_chance`` applies to the simplified game (``simulator =
+"game"``) instead. Run it with::
+
+    python -m colorwar.batch sweep.toml --output results.jsonl
+
+Each finished run is appended to the output as one JSON line: its
+parameters and seed, the winner, the tick a faction first held 95% of the
+map and the number of factions alive every ``sample_every`` ticks. Running
+the same command again skips the runs already in the output, so an
+interrupted sweep resumes where it stopped. At most two runs per worker
+are in flight, so memory stays flat however long the sweep is.
+"""
+
+import argparse
+import contextlib
+import hashlib
+import itertools
+import json
+import os
+import random
+import sys
+import time
+import traceback
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, Iterator, Optional, Set
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    tomllib = None
+
+DEFAULTS = {
+    "simulator": "aisim",
+    "engine": "python",
+    "grid_size": [200, 100],
+    "factions": 200,
+    "ticks": 1000,
+    "sample_every": 10,
+    "archetypes": None,
+    "biome_regions": 0,
+    "expansion_chance": None,
+}
+SIMULATORS = ("aisim", "game")
+
+
+def load_spec(path: str) -> dict:
+    """Read a sweep spec: TOML for ``.toml`` files, JSON otherwise."""
+    if path.endswith(".toml"):
+        if tomllib is None:
+            raise RuntimeError("TOML sweep specs need Python 3.11 or later; use JSON")
+        with open(path, "rb") as f:
+            return tomllib.load(f)
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def run_id(params: dict, repeat: int) -> str:
+    """A stable name for one run, unchanged when other runs are added to the spec."""
+    key = json.dumps([params, repeat], sort_keys=True)
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+
+
+def expand(spec: dict) -> Iterator[dict]:
+    """Yield every run of ``spec`` as ``{"id", "repeat", "seed", "params"}``, lazily.
+
+    Seeds derive from the spec's ``seed`` and the run's ID, so the same
+    spec always gives a run the same seed, however the sweep is ordered.
+    """
+    spec = dict(spec)
+    sweep = spec.pop("sweep", {})
+    repeats = spec.pop("repeats", 1)
+    seed = spec.pop("seed", 0)
+    unknown = (set(spec) | set(sweep)) - set(DEFAULTS)
+    if unknown:
+        raise ValueError(f"unknown sweep parameters: {', '.join(sorted(unknown))}")
+    base = {**DEFAULTS, **spec}
+    names = sorted(sweep)
+    for values in itertools.product(*(sweep[name] for name in names)):
+        params = {**base, **dict(zip(names, values))}
+        check_params(params)
+        for repeat in range(repeats):
+            rid = run_id(params, repeat)
+            yield {
+                "id": rid,
+                "repeat": repeat,
+                "seed": random.Random(f"{seed}/{rid}").getrandbits(63),
+                "params": params,
+            }
+
+
+def check_params(params: dict) -> None:
+    if params["simulator"] not in SIMULATORS:
+        raise ValueError(f"unknown simulator {params['simulator']!r}; expected one of {', '.join(SIMULATORS)}")
+    if params["simulator"] == "aisim" and params["expansion_chance"] is not None:
+        raise ValueError("expansion_chance applies to the game simulator; AISim factions have archetypes")
+    if params["simulator"] == "game" and (params["archetypes"] is not None or params["biome_regions"]):
+        raise ValueError("archetypes and biome_regions apply to the aisim simulator")
+
+
+def _aisim_class():
+    # AISim lives in the ColorWarGame script beside this package
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if root not in sys.path:
+        sys.path.insert(0, root)
+    from ColorWarGame import VICTORY_SHARE, AISim
+    return AISim, VICTORY_SHARE
+
+
+def run_aisim(params: dict, seed: int) -> dict:
+    AISim, victory_share = _aisim_class()
+    sim = AISim(engine=params["engine"], headless=True, grid_size=tuple(params["grid_size"]), seed=seed,
+                biome_regions=params["biome_regions"])
+    sim.new_game(factions=params["factions"], archetypes=params["archetypes"])
+    total = sim.grid_width * sim.grid_height
+    victory = {}
+    samples = []
+
+    def observe(cycle, faction_power):
+        if "tick" not in victory and faction_power:
+            fid, count = max(faction_power.items(), key=lambda item: item[1])
+            if count / total >= victory_share:
+                victory.update(tick=cycle, name=sim.registry.names[fid])
+        if cycle % params["sample_every"] == 0:
+            samples.append([cycle, len(sim.factions)])
+
+    ticks = sim.simulate(ticks=params["ticks"], observe=observe)
+    power = sim.count_faction_power()
+    winner = None
+    if power:
+        fid, count = max(power.items(), key=lambda item: item[1])
+        record = sim.factions[sim.registry.colors[fid]]
+        winner = {
+            "name": record["name"],
+            "color": sim.registry.colors[fid],
+            "archetype": record.get("archetype"),
+            "share": count / total,
+        }
+    return {
+        "ticks": ticks,
+        "winner": winner,
+        "victory_tick": victory.get("tick"),
+        "victory_name": victory.get("name"),
+        "factions": samples,
+    }
+
+
+def run_game(params: dict, seed: int) -> dict:
+    from .faction import Faction
+    from .game import ColorWarGame
+
+    game = ColorWarGame(grid_size=tuple(params["grid_size"]), engine=params["engine"], headless=True, seed=seed)
+    chance = 0.25 if params["expansion_chance"] is None else params["expansion_chance"]
+    for i in range(params["factions"]):
+        color = "#%06x" % game.rng.colors.randint(0, 0xFFFFFF)
+        game.add_faction(Faction(color=color, name=f"Faction {i + 1}", expansion_chance=chance))
+    total = game.grid_width * game.grid_height
+    victory_tick = None
+    samples = []
+    power = Counter()
+    # The simplified game keeps no territory counts: count at sample ticks only
+    for tick in range(params["ticks"] + 1):
+        if tick % params["sample_every"] == 0 or tick == params["ticks"]:
+            power = Counter(color for row in game.grid for color in row if color)
+            samples.append([tick, len(power)])
+            if victory_tick is None and power and power.most_common(1)[0][1] / total >= 0.95:
+                victory_tick = tick
+        if tick < params["ticks"]:
+            game.step()
+    winner = None
+    if power:
+        color, count = power.most_common(1)[0]
+        winner = {"name": game.factions[color].name, "color": color, "share": count / total}
+    return {"ticks": params["ticks"], "winner": winner, "victory_tick": victory_tick, "factions": samples}
+
+
+def run_one(run: dict) -> dict:
+    """Play one run of a sweep in this process and summarize it; never raises."""
+    started = time.perf_counter()
+    params = run["params"]
+    result = {"id": run["id"], "repeat": run["repeat"], "seed": run["seed"], "params": params}
+    try:
+        simulate = run_aisim if params["simulator"] == "aisim" else run_game
+        # Both simulators narrate events on stdout
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            result.update(simulate(params, run["seed"]))
+    except Exception:
+        result["error"] = traceback.format_exc()
+    result["elapsed"] = time.perf_counter() - started
+    return result
+
+
+def finished_runs(path: str) -> Set[str]:
+    """IDs of the runs that completed in an earlier pass over ``path``.
+
+    A line cut short by an interrupted write is dropped from the file.
+    """
+    if not os.path.exists(path):
+        return set()
+    with open(path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end != len(data):
+            f.truncate(end)
+    done = set()
+    for line in data[:end].splitlines():
+        record = json.loads(line)
+        if "error" not in record:
+            done.add(record["id"])
+    return done
+
+
+def run_sweep(spec: dict, output: str, workers: Optional[int] = None, progress=None) -> Dict[str, int]:
+    """Run every unfinished run of ``spec``, appending results to ``output`` as they finish.
+
+    Returns counts of runs ``done`` now, ``skipped`` as already done and ``failed``.
+    """
+    workers = workers or os.cpu_count() or 1
+    done = finished_runs(output)
+    pending = (run for run in expand(spec) if run["id"] not in done)
+    counts = {"done": 0, "skipped": len(done), "failed": 0}
+    with open(output, "a", encoding="utf-8") as out, ProcessPoolExecutor(workers) as pool:
+        in_flight = set()
+        while True:
+            # Keep every worker busy without materializing the whole sweep
+            for run in itertools.islice(pending, 2 * workers - len(in_flight)):
+                in_flight.add(pool.submit(run_one, run))
+            if not in_flight:
+                break
+            finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                result = future.result()
+                out.write(json.dumps(result) + "\n")
+                out.flush()
+                counts["failed" if "error" in result else "done"] += 1
+                if progress is not None:
+                    progress(result)
+    return counts
+
+
+def _report(result: dict) -> None:
+    if "error" in result:
+        last = result["error"].strip().splitlines()[-1]
+        print(f"{result['id']} failed: {last}", file=sys.stderr)
+        return
+    winner = result["winner"]["name"] if result["winner"] else "nobody"
+    print(f"{result['id']} won by {winner} in {result['elapsed']:.1f}s", file=sys.stderr)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run a headless Color War parameter sweep")
+    parser.add_argument("spec", help="Sweep spec, JSON or TOML")
+    parser.add_argument("--output", required=True, metavar="FILE",
+                        help="JSONL results; runs already in it are skipped")
+    parser.add_argument("--workers", type=int, default=None, metavar="N",
+                        help="Worker processes (default: one per CPU)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    started = time.perf_counter()
+    counts = run_sweep(load_spec(args.spec), args.output, args.workers, progress=_report)
+    print(f"{counts['done']} runs done, {counts['skipped']} already done, {counts['failed']} failed "
+          f"in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""Chunked storage for list-engine grids.
+
+A :class:`ChunkedGrid` splits a ``width`` x ``height`` grid into square
+chunks of ``chunk`` x ``chunk`` cells. A chunk whose cells all hold the same
+value is stored as that one value and only gets a list of its cells when one
+of them is written, so a map that is mostly empty costs memory in proportion
+to the claimed area rather than the whole map. :meth:`ChunkedGrid.compact`
+folds chunks that became uniform again, e.g. once a faction fills them.
+
+:meth:`ChunkedGrid.copy` shares chunks between the copies and copies a chunk
+only when either side first writes to it, so a save snapshot, or the
+per-tick grid copy of ``ColorWarGame``, costs O(chunks) plus the chunks
+written afterwards; chunks with no activity are never visited.
+
+Cells are read and written as ``grid[y][x]``, as with rows of lists, and
+``numpy.asarray(grid)`` assembles an array chunk by chunk, which is how saves
+and replays take the grid. :meth:`ChunkedGrid.load` reads rows or an array
+back the same way.
+"""
+
+from itertools import repeat
+from typing import Iterator, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised only without numpy
+    np = None
+
+CHUNK = 64
+STORAGES = ("lists", "chunked", "memmap")
+
+
+def check_storage(storage: str, engine: str = "python") -> str:
+    """Validate a grid storage name; chunked storage is for the list engine, memmap storage for NumPy."""
+    if storage not in STORAGES:
+        raise ValueError(f"unknown storage {storage!r}; expected one of {', '.join(STORAGES)}")
+    if storage == "chunked" and engine != "python":
+        raise ValueError("chunked storage needs the python engine")
+    if storage == "memmap" and engine != "numpy":
+        raise ValueError("memmap storage needs the numpy engine")
+    return storage
+
+
+def copy_rows(grid):
+    """Copy a grid of rows: lists row by row, a :class:`ChunkedGrid` sharing its chunks until written."""
+    if isinstance(grid, ChunkedGrid):
+        return grid.copy()
+    return [row[:] for row in grid]
+
+
+class _Row:
+    __slots__ = ("_grid", "_cells", "_values", "_base", "_offset", "_shift", "_mask", "_width")
+
+    def __init__(self, grid: "ChunkedGrid", y: int):
+        self._grid = grid
+        self._cells = grid.cells
+        self._values = grid.values
+        self._base = (y >> grid.shift) * grid.chunks_x
+        self._offset = (y & grid.mask) << grid.shift
+        self._shift = grid.shift
+        self._mask = grid.mask
+        self._width = grid.width
+
+    def __len__(self) -> int:
+        return self._width
+
+    def __getitem__(self, x):
+        try:
+            i = self._base + (x >> self._shift)
+        except TypeError:  # a slice
+            return list(self)[x]
+        if x < 0 or x >= self._width:
+            raise IndexError("grid column out of range")
+        cells = self._cells[i]
+        if cells is None:
+            return self._values[i]
+        return cells[self._offset | (x & self._mask)]
+
+    def __setitem__(self, x: int, value) -> None:
+        if not 0 <= x < self._width:
+            raise IndexError("grid column out of range")
+        i = self._base + (x >> self._shift)
+        cells = self._cells[i]
+        if cells is None or self._grid.shared[i]:
+            cells = self._grid._own(i, value)
+            if cells is None:
+                return
+        cells[self._offset | (x & self._mask)] = value
+
+    def __iter__(self) -> Iterator:
+        grid = self._grid
+        size = grid.chunk
+        for cx in range(grid.chunks_x):
+            i = self._base + cx
+            count = min(size, grid.width - cx * size)
+            cells = self._cells[i]
+            if cells is None:
+                yield from repeat(self._values[i], count)
+            else:
+                yield from cells[self._offset:self._offset + count]
+
+    def __eq__(self, other) -> bool:
+        return list(self) == list(other)
+
+
+class ChunkedGrid(list):
+    """A ``width`` x ``height`` grid of values in ``chunk`` x ``chunk`` chunks, read as ``grid[y][x]``.
+
+    ``chunk`` must be a power of two. :attr:`values` holds the value of
+    every uniform chunk and :attr:`cells` the cell list of every other one,
+    row-major within the chunk; chunks on the right and bottom edges are
+    padded to full size. The grid itself is the list of its row objects, so
+    ``grid[y]`` costs a plain list lookup in the step's inner loop.
+    """
+
+    def __init__(self, width: int, height: int, fill=0, chunk: int = CHUNK):
+        if chunk < 1 or chunk & (chunk - 1):
+            raise ValueError(f"chunk size must be a power of two, got {chunk}")
+        self.width = width
+        self.height = height
+        self.fill = fill
+        self.chunk = chunk
+        self.shift = chunk.bit_length() - 1
+        self.mask = chunk - 1
+        self.chunks_x = -(-width // chunk)
+        self.chunks_y = -(-height // chunk)
+        count = self.chunks_x * self.chunks_y
+        self.values = [fill] * count
+        self.cells: List[Optional[list]] = [None] * count
+        self.shared = bytearray(count)  # 1 where a copy may share the chunk's cell list
+        super().__init__(_Row(self, y) for y in range(height))
+
+    def __setitem__(self, y: int, row) -> None:
+        target = list.__getitem__(self, y)
+        for x, value in enumerate(row):
+            target[x] = value
+
+    def _own(self, i: int, value) -> Optional[list]:
+        """A cell list for chunk ``i`` that is safe to write, or None if writing ``value`` changes nothing."""
+        cells = self.cells[i]
+        if cells is None:
+            if self.values[i] == value:
+                return None
+            cells = [self.values[i]] * (self.chunk * self.chunk)
+        else:
+            cells = cells[:]
+        self.cells[i] = cells
+        self.shared[i] = 0
+        return cells
+
+    def get(self, x: int, y: int):
+        return self[y][x]
+
+    def set(self, x: int, y: int, value) -> None:
+        self[y][x] = value
+
+    def allocated(self) -> int:
+        """The number of chunks holding a list of cells."""
+        return len(self.cells) - self.cells.count(None)
+
+    def copy(self) -> "ChunkedGrid":
+        """A copy sharing every chunk with this grid until either side writes to it."""
+        other = ChunkedGrid(self.width, self.height, self.fill, self.chunk)
+        other.values[:] = self.values
+        other.cells[:] = self.cells
+        self.shared[:] = other.shared[:] = b"\x01" * len(self.shared)
+        return other
+
+    def blocks(self) -> Iterator[Tuple[int, int, int, int, int]]:
+        """Yield ``(chunk index, x0, y0, w, h)`` for every chunk, clipped to the grid."""
+        size = self.chunk
+        for cy in range(self.chunks_y):
+            y0 = cy * size
+            h = min(size, self.height - y0)
+            for cx in range(self.chunks_x):
+                x0 = cx * size
+                yield cy * self.chunks_x + cx, x0, y0, min(size, self.width - x0), h
+
+    def _uniform(self, cells: list, w: int, h: int) -> bool:
+        first, size = cells[0], self.chunk
+        if w == h == size:
+            return cells.count(first) == len(cells)
+        return all(cells[dy * size:dy * size + w].count(first) == w for dy in range(h))
+
+    def compact(self) -> int:
+        """Store every chunk whose cells became equal as a single value; returns how many were freed."""
+        freed = 0
+        for i, x0, y0, w, h in self.blocks():
+            cells = self.cells[i]
+            if cells is not None and self._uniform(cells, w, h):
+                self.values[i] = cells[0]
+                self.cells[i] = None
+                self.shared[i] = 0
+                freed += 1
+        return freed
+
+    def load(self, rows) -> None:
+        """Replace every cell from ``rows``, rows of values or a 2-D array, one chunk at a time.
+
+        Uniform chunks are stored as their value without building a cell list.
+        """
+        size = self.chunk
+        array = np is not None and isinstance(rows, np.ndarray)
+        for i, x0, y0, w, h in self.blocks():
+            if array:
+                block = rows[y0:y0 + h, x0:x0 + w]
+                first = block[0, 0].item()
+                if (block == first).all():
+                    self.values[i], self.cells[i] = first, None
+                    continue
+                padded = np.full((size, size), block[0, 0], dtype=block.dtype)
+                padded[:h, :w] = block
+                cells = padded.ravel().tolist()
+            else:
+                first = rows[y0][x0]
+                cells = [first] * (size * size)
+                for dy in range(h):
+                    cells[dy * size:dy * size + w] = rows[y0 + dy][x0:x0 + w]
+                if self._uniform(cells, w, h):
+                    self.values[i], self.cells[i] = first, None
+                    continue
+            self.cells[i] = cells
+        self.shared[:] = bytes(len(self.shared))
+
+    def to_lists(self) -> list:
+        return [list(row) for row in self]
+
+    def __array__(self, dtype=None, copy=None):
+        if dtype is None:
+            dtype = np.asarray(self.fill).dtype
+        out = np.empty((self.height, self.width), dtype=dtype)
+        size = self.chunk
+        for i, x0, y0, w, h in self.blocks():
+            cells = self.cells[i]
+            if cells is None:
+                out[y0:y0 + h, x0:x0 + w] = self.values[i]
+            else:
+                out[y0:y0 + h, x0:x0 + w] = np.asarray(cells, dtype=dtype).reshape(size, size)[:h, :w]
+        return out
@@ -0,0 +1,463 @@
+"""Array-backed grid engine for the Color War simulations.
+
+The default engines walk Python lists of hex strings one cell at a time.
+:class:`ArrayGrid` instead keeps the grid, claim ages, overwrite cooldowns and
+last owners as NumPy arrays of small integer faction IDs and advances a whole
+tick with array operations. ID ``0`` is the empty cell. IDs come from a
+:class:`~colorwar.registry.Palette`, either a private one that interns colors
+the first time they are written or the simulation's
+:class:`~colorwar.registry.FactionRegistry`.
+
+NumPy is optional. Selecting the ``"numpy"`` engine without it installed
+raises :class:`RuntimeError`.
+"""
+
+from itertools import permutations
+from typing import Callable, Dict, List, Mapping, NamedTuple, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised only without numpy
+    np = None
+
+from .frontier import FrontierMask
+from .registry import EMPTY, FactionRegistry, Palette
+
+ENGINES = ("python", "numpy")
+DIRECTIONS = ((0, 1), (1, 0), (-1, 0), (0, -1))
+# Every order of DIRECTIONS: one random index stands in for a shuffle
+DIRECTION_ORDERS = tuple(permutations(DIRECTIONS))
+
+
+def require_numpy() -> None:
+    if np is None:
+        raise RuntimeError("the 'numpy' engine requires NumPy (pip install numpy)")
+
+
+def check_engine(name: str) -> str:
+    """Validate an engine name, returning it unchanged."""
+    if name not in ENGINES:
+        raise ValueError(f"unknown engine {name!r}; expected one of {', '.join(ENGINES)}")
+    if name == "numpy":
+        require_numpy()
+    return name
+
+
+class TickCoefficients(NamedTuple):
+    """Per-faction odds for one tick of the ``AISim`` rules, as lists indexed by faction ID.
+
+    A cell of faction ``f`` spreads with chance ``spread[f] + u * jitter[f]``
+    and attacks with ``attack[f] + u * jitter[f]``, for a fresh uniform
+    ``u`` each, before terrain and diplomacy. Factions that hold no cells,
+    or are dead, have a count of 0.
+    """
+
+    counts: List[int]
+    power: List[float]
+    spread: List[float]
+    attack: List[float]
+    jitter: List[float]
+
+
+def tick_coefficients(registry: FactionRegistry, faction_power: Mapping[int, int], total: int) -> TickCoefficients:
+    """Build the per-faction tables of a tick once, instead of per cell.
+
+    ``power`` is each faction's share of the ``total`` cells; while one
+    faction holds 65% of the map its power is cut by a fifth and everyone
+    else's raised by a fifth.
+    """
+    size = registry.size
+    alive = registry.alive
+    counts = [0] * size
+    for fid, count in faction_power.items():
+        if alive[fid]:
+            counts[fid] = count
+    total = max(1, total)
+    power = [count / total for count in counts]
+    if faction_power:
+        dominant, dominant_count = max(faction_power.items(), key=lambda item: item[1])
+        if dominant_count / total >= 0.65:
+            power = [share * 1.2 for share in power]
+            power[dominant] = dominant_count / total * 0.8
+    traits = registry.traits
+    return TickCoefficients(
+        counts,
+        power,
+        [0.1 + share * 0.3 * trait for share, trait in zip(power, traits["expansionism"])],
+        [0.05 + share * 0.4 * trait for share, trait in zip(power, traits["aggression"])],
+        [0.1 * trait for trait in traits["risk"][:size]],
+    )
+
+
+class ColorRow:
+    """One row of a :class:`ColorGridView`."""
+
+    __slots__ = ("_world", "_y")
+
+    def __init__(self, world: "ArrayGrid", y: int):
+        self._world = world
+        self._y = y
+
+    def __len__(self) -> int:
+        return self._world.width
+
+    def __getitem__(self, x):
+        palette = self._world.palette.colors
+        if isinstance(x, slice):
+            return [palette[i] for i in self._world.grid[self._y, x].tolist()]
+        return palette[self._world.grid[self._y, x]]
+
+    def __setitem__(self, x: int, color: Optional[str]) -> None:
+        world = self._world
+        world.grid[self._y, x] = world.palette.intern(color)
+        world.frontier.touch(world.grid, x % world.width, self._y)
+
+    def __iter__(self):
+        palette = self._world.palette.colors
+        return (palette[i] for i in self._world.grid[self._y].tolist())
+
+
+class ColorGridView:
+    """``grid[y][x]`` access to an :class:`ArrayGrid` in terms of colors.
+
+    Lets code written against the list-of-lists grid keep reading and writing
+    hex strings (``None`` for empty cells) while the storage stays an array.
+    """
+
+    __slots__ = ("_world",)
+
+    def __init__(self, world: "ArrayGrid"):
+        self._world = world
+
+    def __len__(self) -> int:
+        return self._world.height
+
+    def __getitem__(self, y: int) -> ColorRow:
+        if not -self._world.height <= y < self._world.height:
+            raise IndexError("grid row out of range")
+        return ColorRow(self._world, y % self._world.height)
+
+    def __iter__(self):
+        return (ColorRow(self._world, y) for y in range(self._world.height))
+
+
+class ArrayGrid:
+    """Grid state stored as NumPy arrays of integer faction IDs."""
+
+    def __init__(self, width: int, height: int, palette: Optional[Palette] = None, rng=None):
+        require_numpy()
+        self.width = width
+        self.height = height
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.palette = palette if palette is not None else Palette()
+        self.grid = np.zeros((height, width), dtype=np.uint16)
+        self.claim_age = np.zeros((height, width), dtype=np.int32)
+        self.overwrite_cooldown = np.zeros((height, width), dtype=np.uint8)
+        self.last_owner = np.zeros((height, width), dtype=np.uint16)
+        self.frontier = FrontierMask(width, height)
+        self.colors = ColorGridView(self)
+
+    def clear(self) -> None:
+        for array in (self.grid, self.claim_age, self.overwrite_cooldown, self.last_owner):
+            array.fill(0)
+        self.frontier.mask.fill(False)
+
+    def load_lists(self, grid: Sequence[Sequence[Optional[str]]]) -> None:
+        """Replace the grid with a list-of-lists of colors.
+
+        Rows and columns beyond the engine size are dropped and missing ones
+        are left empty. Claim ages and cooldowns restart from zero. Colors are
+        resolved through the palette, so with a registry every color must
+        already belong to a faction.
+        """
+        self.clear()
+        intern = self.palette.intern
+        for y, row in enumerate(grid[:self.height]):
+            ids = [intern(cell) for cell in row[:self.width]]
+            self.grid[y, :len(ids)] = ids
+        self.last_owner[:] = self.grid
+        self.frontier.rebuild(self.grid)
+
+    def load_arrays(self, grid, claim_age, overwrite_cooldown) -> None:
+        """Replace the grid, claim ages and cooldowns with arrays of the engine's shape."""
+        self.grid[:] = grid
+        self.claim_age[:] = claim_age
+        self.overwrite_cooldown[:] = overwrite_cooldown
+        self.last_owner[:] = self.grid
+        self.frontier.rebuild(self.grid)
+
+    def write(self, cells, ids):
+        """Set the distinct flat indices ``cells`` to ``ids`` (one ID or one per cell).
+
+        Returns the cells whose owner changed and the IDs that owned them.
+        """
+        g = self.grid.reshape(-1)
+        cells = np.asarray(cells, dtype=np.int64)
+        ids = np.broadcast_to(np.asarray(ids, dtype=g.dtype), cells.shape)
+        previous = g[cells]
+        moved = previous != ids
+        cells, previous = cells[moved], previous[moved]
+        g[cells] = ids[moved]
+        self.frontier.touch_many(self.grid, cells)
+        return cells, previous
+
+    def cells_of(self, ids: Sequence[int]):
+        """Flat indices of every cell owned by one of ``ids``."""
+        return np.flatnonzero(np.isin(self.grid.reshape(-1), ids))
+
+    def probe(self, match: Optional[int], probes: int, limit: Optional[int] = None):
+        """Flat indices found by ``probes`` uniform random probes for cells holding ``match``.
+
+        Matches the list engine's loops, which probe one cell at a time and
+        rewrite every hit so it no longer matches: a cell probed twice counts
+        once, and probing stops after ``limit`` hits. ``match=None`` looks
+        for any claimed cell. Costs O(probes), whatever the grid size.
+        """
+        g = self.grid.reshape(-1)
+        idx = self.rng.integers(0, g.size, size=probes)
+        hit = g[idx] != EMPTY if match is None else g[idx] == match
+        _, first = np.unique(idx, return_index=True)
+        once = np.zeros(probes, dtype=bool)
+        once[first] = True
+        hit &= once
+        if limit is not None:
+            hit &= np.cumsum(hit) <= limit
+        return idx[hit]
+
+    def choose(self, match: int, count: int):
+        """Up to ``count`` distinct cells holding ``match``, drawn uniformly."""
+        cells = np.flatnonzero(self.grid.reshape(-1) == match)
+        return self.rng.choice(cells, size=min(count, cells.size), replace=False)
+
+    def scatter(self, chance: float):
+        """Flat indices of cells picked independently with probability ``chance``."""
+        return np.flatnonzero(self.rng.random(self.grid.size) < chance)
+
+    def quake(self, count: int):
+        """Swap ``count`` random cells with a random in-bounds neighbour, in draw order.
+
+        Returns the flat indices of the cells involved.
+        """
+        g = self.grid.reshape(-1)
+        x = self.rng.integers(0, self.width, size=count)
+        y = self.rng.integers(0, self.height, size=count)
+        step = np.array(((1, 0), (-1, 0), (0, 1), (0, -1)))[self.rng.integers(0, 4, size=count)]
+        nx, ny = x + step[:, 0], y + step[:, 1]
+        inside = (nx >= 0) & (nx < self.width) & (ny >= 0) & (ny < self.height)
+        a = (y * self.width + x)[inside]
+        b = (ny * self.width + nx)[inside]
+        touched = np.concatenate((a, b))
+        if np.unique(touched).size == touched.size:
+            g[a], g[b] = g[b], g[a]
+        else:
+            # Overlapping swaps depend on their order.
+            for i, j in zip(a.tolist(), b.tolist()):
+                g[i], g[j] = g[j], g[i]
+        touched = np.unique(touched)
+        self.frontier.touch_many(self.grid, touched)
+        return touched
+
+    def to_lists(self) -> List[List[Optional[str]]]:
+        palette = self.palette.colors
+        return [[palette[i] for i in row] for row in self.grid.tolist()]
+
+    def counts(self):
+        """Return the number of cells held by each ID, indexed by ID."""
+        return np.bincount(self.grid.ravel(), minlength=self.palette.size)
+
+    def color_counts(self) -> Dict[str, int]:
+        """Return a {color: cell count} map of every color on the grid."""
+        totals = self.counts()
+        colors = self.palette.colors
+        return {colors[fid]: int(totals[fid]) for fid in np.flatnonzero(totals[1:]) + 1}
+
+    def _neighbours(self, src, dx: int, dy: int):
+        """Return positions in ``src`` that have an in-bounds neighbour and its flat index."""
+        x = src % self.width
+        y = src // self.width
+        valid = (x + dx >= 0) & (x + dx < self.width) & (y + dy >= 0) & (y + dy < self.height)
+        sel = np.flatnonzero(valid)
+        return sel, src[sel] + dy * self.width + dx
+
+    def _pick_one(self, targets):
+        """Pick one random proposal per distinct target; returns proposal positions."""
+        order = self.rng.permutation(targets.size)
+        _, first = np.unique(targets[order], return_index=True)
+        return order[first]
+
+    def step_factions(
+        self,
+        registry: FactionRegistry,
+        faction_power: Mapping[int, int],
+        terrain: Optional["np.ndarray"],
+        fuse: Callable[[int, int], int],
+        max_factions: int = 150,
+    ):
+        """Advance one tick of the ``AISim`` rules.
+
+        Every claimed border cell rolls spread, attack and fusion against its
+        four neighbours, all evaluated against the grid as it stood at the start of
+        the tick. Where several claims land on one cell a uniformly random one
+        wins, which is what the shuffled cell order of the list engine amounts
+        to. ``terrain`` is the flat per-cell odds multiplier from
+        :meth:`Terrain.multiplier_array <colorwar.terrain.Terrain.multiplier_array>`,
+        or None for plain terrain. ``fuse`` is called once per fusing pair of
+        faction IDs and returns the ID of the blended faction, creating it if
+        needed.
+
+        Returns the flat indices of cells whose owner changed and the IDs
+        that owned them before the tick.
+        """
+        g = self.grid.reshape(-1)
+        cooldown = self.overwrite_cooldown.reshape(-1)
+        age = self.claim_age.reshape(-1)
+        np.subtract(cooldown, 1, out=cooldown, where=cooldown > 0)
+
+        alive = np.frombuffer(bytes(registry.alive), dtype=np.uint8).astype(bool)
+        # Tables copied from the registry, whose arrays may grow when a fusion founds a faction
+        coefficients = tick_coefficients(registry, faction_power, g.size)
+        counts = np.array(coefficients.counts, dtype=np.int64)
+        src = np.flatnonzero((counts > 0)[g] & self.frontier.mask)
+        if src.size == 0:
+            age += 1
+            self.last_owner[:] = self.grid
+            return src, g[src]
+        power, spread_base, attack_base, jitter = (
+            np.array(table, dtype=np.float64) for table in coefficients[1:]
+        )
+
+        # Every uniform the tick needs, in one draw: two per cell, then a
+        # fusion roll and a claim roll per cell and direction
+        draws = self.rng.random((2 + 2 * len(DIRECTIONS), src.size))
+        s = g[src]
+        spread = spread_base[s] + draws[0] * jitter[s]
+        attack = attack_base[s] + draws[1] * jitter[s]
+        if terrain is not None:
+            spread *= terrain[src]
+            attack *= terrain[src]
+
+        fusion_open = len(registry) < max_factions
+        claims_t, claims_c = [], []
+        attacks_t, attacks_c = [], []
+        fusions_t, fusions_s, fusions_o = [], [], []
+        for d, (dx, dy) in enumerate(DIRECTIONS):
+            sel, t_idx = self._neighbours(src, dx, dy)
+            sv = s[sel]
+            t = g[t_idx]
+            enemy = (t != EMPTY) & (t != sv) & alive[t]
+            if fusion_open:
+                fused = enemy & (draws[2 + 2 * d][sel] < 0.01)
+                fusions_t.append(t_idx[fused])
+                fusions_s.append(sv[fused])
+                fusions_o.append(t[fused])
+                enemy &= ~fused
+            roll = draws[3 + 2 * d][sel]
+            spread_hit = (t == EMPTY) & (roll < spread[sel])
+            claims_t.append(t_idx[spread_hit])
+            claims_c.append(sv[spread_hit])
+
+            cand = np.flatnonzero(enemy & (cooldown[t_idx] == 0) & (age[t_idx] >= 6))
+            if cand.size:
+                cs, ct = sv[cand], t[cand]
+                modifier = 1.0 - np.maximum(0.0, registry.relations.lookup(cs, ct))
+                won = (power[cs] > counts[ct]) | (roll[cand] < attack[sel[cand]] * modifier)
+                attacks_t.append(t_idx[cand[won]])
+                attacks_c.append(cs[won])
+
+        if attacks_t:
+            at = np.concatenate(attacks_t)
+            ac = np.concatenate(attacks_c)
+            # The first successful attack puts the cell on cooldown, which
+            # blocks any later attack on it within the same tick.
+            keep = self._pick_one(at)
+            at, ac = at[keep], ac[keep]
+            cooldown[at] = 4
+            claims_t.append(at)
+            claims_c.append(ac)
+
+        if fusions_t:
+            ft = np.concatenate(fusions_t)
+            if ft.size:
+                fc = self._fuse_ids(
+                    np.concatenate(fusions_s), np.concatenate(fusions_o), registry, fuse, max_factions
+                )
+                merged = fc != EMPTY
+                claims_t.append(ft[merged])
+                claims_c.append(fc[merged])
+
+        targets = np.concatenate(claims_t)
+        owners = np.concatenate(claims_c).astype(g.dtype)
+        winners = self._pick_one(targets)
+        targets, owners = targets[winners], owners[winners]
+        moved = owners != g[targets]
+        changed = targets[moved]
+        previous = g[changed]
+
+        g[changed] = owners[moved]
+        age += 1
+        age[changed] = 0
+        self.last_owner[:] = self.grid
+        self.frontier.touch_many(self.grid, changed)
+        return changed, previous
+
+    def _fuse_ids(self, sources, others, registry, fuse, max_factions):
+        """Resolve fusing pairs to the ID of their blended faction (``0`` if capped)."""
+        size = registry.size
+        lo = np.minimum(sources, others).astype(np.int64)
+        hi = np.maximum(sources, others).astype(np.int64)
+        pairs, inverse = np.unique(lo * size + hi, return_inverse=True)
+        result = np.zeros(pairs.size, dtype=np.int64)
+        for i in self.rng.permutation(pairs.size):
+            if len(registry) >= max_factions:
+                continue
+            a, b = divmod(int(pairs[i]), size)
+            result[i] = fuse(a, b)
+        return result[inverse]
+
+    def step_expansion(self, chances: Mapping[str, float]):
+        """Advance one tick of the ``colorwar.ColorWarGame`` rules.
+
+        Each claimed border cell tries its four neighbours in a random order and
+        claims the first empty one whose expansion roll succeeds. When two
+        cells reach for the same empty cell the one earlier in row-major order
+        wins and the other moves on to its next direction, as in the list
+        engine's scan.
+
+        Returns the flat indices of newly claimed cells.
+        """
+        g = self.grid.reshape(-1)
+        chance = np.zeros(self.palette.size, dtype=np.float64)
+        for color, value in chances.items():
+            fid = self.palette.ids.get(color)
+            if fid is not None:
+                chance[fid] = value
+        src = np.flatnonzero((chance[g] > 0) & self.frontier.mask)
+        new = g.copy()
+        claimed = []
+        if src.size:
+            s = g[src]
+            order = self.rng.permuted(np.tile(np.arange(4), (src.size, 1)), axis=1)
+            offsets = np.array(DIRECTIONS)
+            pending = np.ones(src.size, dtype=bool)
+            xs, ys = src % self.width, src // self.width
+            for j in range(4):
+                idx = np.flatnonzero(pending)
+                step = offsets[order[idx, j]]
+                nx, ny = xs[idx] + step[:, 0], ys[idx] + step[:, 1]
+                inside = (nx >= 0) & (nx < self.width) & (ny >= 0) & (ny < self.height)
+                idx, t = idx[inside], (ny * self.width + nx)[inside]
+                hit = (new[t] == EMPTY) & (self.rng.random(idx.size) < chance[s[idx]])
+                idx, t = idx[hit], t[hit]
+                # ``idx`` is ascending, so the first occurrence is the earliest cell.
+                t, first = np.unique(t, return_index=True)
+                winners = idx[first]
+                new[t] = s[winners]
+                pending[winners] = False
+                claimed.append(t)
+        g[:] = new
+        changed = np.concatenate(claimed) if claimed else np.empty(0, dtype=np.int64)
+        self.claim_age += 1
+        self.claim_age.reshape(-1)[changed] = 0
+        self.last_owner[:] = self.grid
+        self.frontier.touch_many(self.grid, changed)
+        return changed
@@ -0,0 +1,91 @@
+"""Hand-off of grid changes from the simulation thread to the renderer.
+
+The simulation thread never touches pygame. At the end of each tick it
+publishes the cells that tick repainted to a :class:`FrameRing`; the main
+thread takes whatever arrived since its last frame and paints it at its own
+frame rate. Entries are immutable, so the renderer never sees a tick half
+written, and the ring is bounded: a renderer that falls more than
+``capacity`` ticks behind skips the lost changes and asks for a
+:class:`Snapshot` of the whole grid instead. Neither side ever waits for
+the other beyond a list copy under a lock.
+"""
+
+import threading
+from collections import deque
+from typing import List, NamedTuple, Optional, Sequence, Tuple, Union
+
+
+class TickChanges(NamedTuple):
+    """Cells repainted by one tick: flat indices and the color each now shows."""
+
+    seq: int
+    cells: Tuple[int, ...]
+    colors: Tuple[Optional[str], ...]
+
+
+class Snapshot(NamedTuple):
+    """A private copy of the whole grid: faction IDs row by row and the color of each ID.
+
+    ``version`` is the palette's :attr:`~colorwar.registry.Palette.version`
+    when known; equal versions mean equal palettes.
+    """
+
+    seq: int
+    width: int
+    owners: Sequence[int]
+    palette: Tuple[Optional[str], ...]
+    version: Optional[int] = None
+
+
+Entry = Union[TickChanges, Snapshot]
+
+
+class FrameRing:
+    """Bounded single-producer, single-consumer queue of published ticks.
+
+    The simulation calls :meth:`publish` or :meth:`publish_snapshot`; the
+    renderer calls :meth:`take`. When :attr:`wants_snapshot` is set the
+    producer should publish a snapshot next instead of changes.
+    """
+
+    def __init__(self, capacity: int = 128):
+        self.capacity = capacity
+        self._entries = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._taken = 0
+        self.wants_snapshot = False
+        self.overruns = 0
+
+    def publish(self, cells: Sequence[int], colors: Sequence[Optional[str]]) -> None:
+        """Queue one tick's changes; the oldest entry drops out when the ring is full."""
+        with self._lock:
+            self._seq += 1
+            self._entries.append(TickChanges(self._seq, tuple(cells), tuple(colors)))
+
+    def publish_snapshot(self, width: int, owners: Sequence[int], palette: Sequence[Optional[str]],
+                         version: Optional[int] = None) -> None:
+        """Replace everything queued with a full grid; ``owners`` must not be modified afterwards."""
+        with self._lock:
+            self._seq += 1
+            self._entries.clear()
+            self._entries.append(Snapshot(self._seq, width, owners, tuple(palette), version))
+            self.wants_snapshot = False
+
+    def take(self) -> List[Entry]:
+        """Entries published since the last call, oldest first.
+
+        Returns nothing if changes were dropped before they were taken; a
+        snapshot is requested and arrives with a later call.
+        """
+        with self._lock:
+            entries = [entry for entry in self._entries if entry.seq > self._taken]
+        if not entries:
+            return []
+        if entries[0].seq != self._taken + 1 and not isinstance(entries[0], Snapshot):
+            if not self.wants_snapshot:
+                self.overruns += 1
+                self.wants_snapshot = True
+            return []
+        self._taken = entries[-1].seq
+        return entries
@@ -0,0 +1,116 @@
+"""Tracking of the cells that can change on the next tick.
+
+Once the map fills up most claimed cells are interior cells surrounded by
+their own faction; they cannot spread, attack or fuse. A frontier holds the
+*border* cells instead: claimed cells with at least one in-bounds neighbour
+that is empty or owned by someone else. Steps iterate only the border and
+refresh it around the cells they write, so late-game ticks cost O(border)
+rather than O(cells).
+
+:class:`Frontier` is a set of flat indices (``y * width + x``) for
+list-of-lists grids and also tracks the cells still on overwrite cooldown.
+:class:`FrontierMask` is the boolean bitmap used by the NumPy engine.
+"""
+
+from typing import Iterable, Set
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised only without numpy
+    np = None
+
+NEIGHBOURS = ((0, 1), (1, 0), (-1, 0), (0, -1))
+
+
+class Frontier:
+    """Border and cooling cells of a list-of-lists grid."""
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.border: Set[int] = set()
+        self.cooling: Set[int] = set()
+
+    def _evaluate(self, grid, x: int, y: int) -> None:
+        own = grid[y][x]
+        index = y * self.width + x
+        if own:
+            for dx, dy in NEIGHBOURS:
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < self.width and 0 <= ny < self.height and grid[ny][nx] != own:
+                    self.border.add(index)
+                    return
+        self.border.discard(index)
+
+    def rebuild(self, grid, cooldown=None) -> None:
+        """Recompute the border from scratch, and the cooling cells from ``cooldown`` rows if given."""
+        self.border = set()
+        self.cooling = set()
+        for y in range(self.height):
+            for x in range(self.width):
+                self._evaluate(grid, x, y)
+                if cooldown is not None and cooldown[y][x] > 0:
+                    self.cooling.add(y * self.width + x)
+
+    def touch(self, grid, x: int, y: int) -> None:
+        """Refresh ``(x, y)`` and its neighbours after the cell was written."""
+        self._evaluate(grid, x, y)
+        for dx, dy in NEIGHBOURS:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < self.width and 0 <= ny < self.height:
+                self._evaluate(grid, nx, ny)
+
+    def cool(self, x: int, y: int) -> None:
+        """Note that ``(x, y)`` was given an overwrite cooldown."""
+        self.cooling.add(y * self.width + x)
+
+
+class FrontierMask:
+    """Border cells of a NumPy grid as a flat boolean mask.
+
+    Cooldowns are decremented with one array operation by the engine, so
+    unlike :class:`Frontier` the mask does not track them.
+    """
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.mask = np.zeros(width * height, dtype=bool)
+
+    def rebuild(self, grid) -> None:
+        border = np.zeros(grid.shape, dtype=bool)
+        border[:, :-1] |= grid[:, :-1] != grid[:, 1:]
+        border[:, 1:] |= grid[:, 1:] != grid[:, :-1]
+        border[:-1] |= grid[:-1] != grid[1:]
+        border[1:] |= grid[1:] != grid[:-1]
+        border &= grid != 0
+        self.mask = border.reshape(-1)
+
+    def touch_many(self, grid, cells: Iterable[int]) -> None:
+        """Refresh the given flat indices and their neighbours."""
+        cells = np.asarray(cells, dtype=np.int64)
+        if cells.size == 0:
+            return
+        x, y = cells % self.width, cells // self.width
+        around = [cells]
+        for dx, dy in NEIGHBOURS:
+            inside = (x + dx >= 0) & (x + dx < self.width) & (y + dy >= 0) & (y + dy < self.height)
+            around.append(cells[inside] + dy * self.width + dx)
+        # Repeats are harmless (each write stores the same flag) and cheaper than np.unique.
+        cells = np.concatenate(around)
+
+        g = grid.reshape(-1)
+        own = g[cells]
+        x, y = cells % self.width, cells // self.width
+        border = np.zeros(cells.size, dtype=bool)
+        for dx, dy in NEIGHBOURS:
+            inside = (x + dx >= 0) & (x + dx < self.width) & (y + dy >= 0) & (y + dy < self.height)
+            neighbour = np.where(inside, cells + dy * self.width + dx, cells)
+            border |= g[neighbour] != own
+        self.mask[cells] = border & (own != 0)
+
+    def touch(self, grid, x: int, y: int) -> None:
+        self.touch_many(grid, [y * self.width + x])
+
+    def cool(self, x: int, y: int) -> None:
+        """Cooldowns need no tracking here; see the class docstring."""
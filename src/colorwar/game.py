@@ -1,87 +1,159 @@
-import random
-from typing import Dict, Tuple
+from typing import Dict, Optional, Tuple
 
 import pygame
 
+from .chunks import ChunkedGrid, check_storage
+from .engine import ArrayGrid, check_engine
 from .faction import Faction
+from .frontier import Frontier
+from .render import NullRenderer, PygameRenderer
+from .rng import RandomStreams
 
 
 class ColorWarGame:
-    """Simplified Color War simulation using pygame."""
+    """Simplified Color War simulation using pygame.
 
-    def __init__(self, grid_size: Tuple[int, int] = (100, 100), cell_size: int = 6):
-        pygame.init()
+    Random draws come from ``self.rng``, streams seeded from ``seed``; the
+    same seed and engine replay the same game. With the python engine,
+    ``storage="chunked"`` keeps the grid in lazily allocated chunks.
+    """
+
+    def __init__(
+        self,
+        grid_size: Tuple[int, int] = (100, 100),
+        cell_size: int = 6,
+        engine: str = "python",
+        headless: bool = False,
+        seed: Optional[int] = None,
+        storage: str = "lists",
+    ):
+        self.engine_name = check_engine(engine)
+        self.storage = check_storage(storage, self.engine_name)
+        if self.storage == "memmap":
+            raise ValueError("memmap storage steps the AISim rules only")
+        self.rng = RandomStreams(seed)
+        self.headless = headless
         self.cell_size = cell_size
         self.grid_width, self.grid_height = grid_size
-        self.screen = pygame.display.set_mode(
-            (self.grid_width * cell_size, self.grid_height * cell_size)
-        )
-        pygame.display.set_caption("Color War Game")
-        self.clock = pygame.time.Clock()
+        if headless:
+            self.screen = None
+            self.clock = None
+            self.renderer = NullRenderer()
+        else:
+            pygame.init()
+            self.screen = pygame.display.set_mode(
+                (self.grid_width * cell_size, self.grid_height * cell_size)
+            )
+            pygame.display.set_caption("Color War Game")
+            self.clock = pygame.time.Clock()
+            self.renderer = PygameRenderer(self.screen, cell_size, grid_size)
 
-        self.grid = [[None for _ in range(self.grid_width)] for _ in range(self.grid_height)]
+        self.engine = None
+        if self.engine_name == "numpy":
+            self.engine = ArrayGrid(self.grid_width, self.grid_height, rng=self.rng.array)
+            self.grid = self.engine.colors
+        elif self.storage == "chunked":
+            self.grid = ChunkedGrid(self.grid_width, self.grid_height, None)
+        else:
+            self.grid = [[None for _ in range(self.grid_width)] for _ in range(self.grid_height)]
+        # Cells with an empty or foreign neighbour; only these can expand.
+        self.frontier = self.engine.frontier if self.engine else Frontier(self.grid_width, self.grid_height)
         self.factions: Dict[str, Faction] = {}
         self.running = True
 
     def add_faction(self, faction: Faction, count: int = 20) -> None:
         """Place a new faction on the grid."""
         self.factions[faction.color] = faction
+        rng = self.rng.spawn
         placed = 0
         while placed < count:
-            x = random.randint(0, self.grid_width - 1)
-            y = random.randint(0, self.grid_height - 1)
+            x = rng.randint(0, self.grid_width - 1)
+            y = rng.randint(0, self.grid_height - 1)
             if self.grid[y][x] is None:
                 self.grid[y][x] = faction.color
+                if self.engine is None:
+                    self.frontier.touch(self.grid, x, y)
+                self.renderer.draw_cell(x, y, faction.color)
                 placed += 1
 
     def step(self) -> None:
-        new_grid = [row[:] for row in self.grid]
-        for y in range(self.grid_height):
-            for x in range(self.grid_width):
-                color = self.grid[y][x]
-                if color is None:
-                    continue
-                faction = self.factions.get(color)
-                if faction is None:
-                    continue
+        """Advance one tick, handing every newly claimed cell to the renderer."""
+        if self.engine is not None:
+            changed = self.engine.step_expansion(
+                {color: faction.expansion_chance for color, faction in self.factions.items()}
+            )
+            if not self.headless:
+                for index in changed.tolist():
+                    y, x = divmod(index, self.grid_width)
+                    self.renderer.draw_cell(x, y, self.grid[y][x])
+            return
 
-                directions = [(0, 1), (1, 0), (-1, 0), (0, -1)]
-                random.shuffle(directions)
-                for dx, dy in directions:
-                    nx, ny = x + dx, y + dy
-                    if 0 <= nx < self.grid_width and 0 <= ny < self.grid_height:
-                        if (
-                            new_grid[ny][nx] is None
-                            and random.random() < faction.expansion_chance
-                        ):
-                            new_grid[ny][nx] = color
-                            break
-        self.grid = new_grid
+        rng = self.rng.step
+        grid = self.grid
+        # Claims by cell, against the grid as it stood at the start of the tick; only
+        # these cells are written back, so a tick costs O(border) rather than O(cells).
+        claims = {}
+        # Row-major order, as in a full scan: earlier cells win contested claims.
+        for index in sorted(self.frontier.border):
+            y, x = divmod(index, self.grid_width)
+            color = grid[y][x]
+            faction = self.factions.get(color)
+            if faction is None:
+                continue
+
+            directions = [(0, 1), (1, 0), (-1, 0), (0, -1)]
+            rng.shuffle(directions)
+            for dx, dy in directions:
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < self.grid_width and 0 <= ny < self.grid_height:
+                    if (
+                        grid[ny][nx] is None
+                        and (nx, ny) not in claims
+                        and rng.random() < faction.expansion_chance
+                    ):
+                        claims[nx, ny] = color
+                        break
+        for (x, y), color in claims.items():
+            grid[y][x] = color
+        for (x, y), color in claims.items():
+            self.frontier.touch(grid, x, y)
+            self.renderer.draw_cell(x, y, color)
 
     def draw(self) -> None:
+        """Repaint every cell; ``step`` already repaints the cells it changes."""
+        if self.engine is not None:
+            palette = self.engine.palette
+            self.renderer.draw_grid(self.engine.grid, self.grid_width, palette.colors, palette.version)
+            return
+        self.renderer.clear()
         for y in range(self.grid_height):
             for x in range(self.grid_width):
                 color = self.grid[y][x]
                 if color:
-                    pygame.draw.rect(
-                        self.screen,
-                        pygame.Color(color),
-                        pygame.Rect(x * self.cell_size, y * self.cell_size, self.cell_size, self.cell_size),
-                    )
-                else:
-                    pygame.draw.rect(
-                        self.screen,
-                        pygame.Color("black"),
-                        pygame.Rect(x * self.cell_size, y * self.cell_size, self.cell_size, self.cell_size),
-                    )
+                    self.renderer.draw_cell(x, y, color)
+
+    def run(self, ticks: Optional[int] = None) -> int:
+        """Run until the window closes, or for ``ticks`` steps if given.
+
+        Headless games only step the simulation, as fast as possible.
+        Returns the number of steps taken.
+        """
+        if self.headless:
+            steps = 0
+            while self.running and (ticks is None or steps < ticks):
+                self.step()
+                steps += 1
+            return steps
 
-    def run(self) -> None:
-        while self.running:
+        steps = 0
+        self.draw()
+        while self.running and (ticks is None or steps < ticks):
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     self.running = False
             self.step()
-            self.draw()
-            pygame.display.flip()
+            steps += 1
+            self.renderer.present()
             self.clock.tick(30)
         pygame.quit()
+        return steps
@@ -1,8 +1,9 @@
 """Command line entry point for the simplified Color War Game."""
 
 import argparse
-import random
+import time
 
+from .chunks import STORAGES
 from .game import ColorWarGame
 from .faction import Faction
 
@@ -35,21 +36,63 @@ def parse_args() -> argparse.Namespace:
         default=0.25,
         help="Chance a faction will claim a neighbor each tick",
     )
+    parser.add_argument(
+        "--engine",
+        choices=["python", "numpy"],
+        default="python",
+        help="Grid engine: per-cell Python lists or NumPy arrays",
+    )
+    parser.add_argument(
+        "--storage",
+        choices=[storage for storage in STORAGES if storage != "memmap"],
+        default="lists",
+        help="Python engine grid storage: rows of lists, or lazily allocated chunks for very large maps",
+    )
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="Run without a window or frame limit, e.g. on servers or for benchmarks",
+    )
+    parser.add_argument(
+        "--ticks",
+        type=int,
+        default=None,
+        help="Stop after this many ticks (default: run until closed)",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="Seed the random streams; the same seed and engine replay the same game",
+    )
     return parser.parse_args()
 
 
 def main() -> None:
     args = parse_args()
-    game = ColorWarGame(grid_size=tuple(args.grid_size), cell_size=args.cell_size)
+    game = ColorWarGame(
+        grid_size=tuple(args.grid_size),
+        cell_size=args.cell_size,
+        engine=args.engine,
+        headless=args.headless,
+        seed=args.seed,
+        storage=args.storage,
+    )
     for i in range(args.factions):
-        color = "#%06x" % random.randint(0, 0xFFFFFF)
+        color = "#%06x" % game.rng.colors.randint(0, 0xFFFFFF)
         faction = Faction(
             color=color,
             name=f"Faction {i+1}",
             expansion_chance=args.expansion_chance,
         )
         game.add_faction(faction)
-    game.run()
+    if args.headless:
+        started = time.perf_counter()
+        ticks = game.run(ticks=args.ticks)
+        elapsed = time.perf_counter() - started
+        print(f"Simulated {ticks} ticks in {elapsed:.2f}s (seed {game.rng.seed})")
+    else:
+        game.run(ticks=args.ticks)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,339 @@
+"""Out-of-core storage for NumPy-engine grids larger than memory.
+
+:class:`MappedGrid` is an :class:`~colorwar.engine.ArrayGrid` whose grid,
+claim ages, overwrite cooldowns and last owners are ``numpy.memmap`` views
+of ``.npy`` files in a run directory. Its step works through the map in
+bands of rows with :func:`~colorwar.parallel.step_stripe`, the stripe step
+of the process pool, and hands each band's pages back to the operating
+system once the band is done. Only one band and its two-row halo are
+resident at a time, however large the map is.
+
+Rolls come from counter-based streams keyed on the run's seed, the tick and
+the cell, as in :mod:`colorwar.parallel`, so the band height does not change
+the result. Events and disasters find their cells band by band as well, so
+no tick builds a temporary as large as the map.
+
+Because the state already lives in the files, a checkpoint only flushes the
+dirty pages and writes the faction table beside them. The first step after
+a checkpoint marks the directory as changed, so a run that stopped mid-tick
+is never resumed from files that no longer match its checkpoint.
+"""
+
+import json
+import mmap
+import os
+import shutil
+import tempfile
+import weakref
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised only without numpy
+    np = None
+
+from .engine import ArrayGrid
+from .frontier import FrontierMask
+from .parallel import _tick_key, apply_fusions, split_rows, step_stripe, tick_params
+from .registry import FactionRegistry, Palette
+from .savefile import SaveFormatError
+
+BAND_CELLS = 1 << 20  # cells per band; a band of all four arrays is about 10 MB
+ARRAYS = {"grid": "u2", "claim_age": "i4", "overwrite_cooldown": "u1", "last_owner": "u2"}
+CHECKPOINT = "checkpoint.json"
+CHANGED = "changed"  # marker file: the arrays moved on since the last checkpoint
+
+
+def drop_pages(array, start: int = 0, stop: Optional[int] = None) -> None:
+    """Drop elements ``start`` to ``stop`` of a flat or C-ordered memmap from memory; the file keeps them.
+
+    Does nothing for arrays that are not mapped from a file, or where the
+    platform cannot drop pages on request; the operating system then
+    reclaims them under memory pressure.
+    """
+    pages = getattr(array, "_mmap", None)
+    if pages is None or not hasattr(pages, "madvise") or not hasattr(mmap, "MADV_DONTNEED"):
+        return
+    stop = array.size if stop is None else min(stop, array.size)
+    # numpy maps from the allocation boundary below the array's offset in the file
+    base = array.offset % mmap.ALLOCATIONGRANULARITY
+    first = (base + max(0, start) * array.itemsize) // mmap.PAGESIZE * mmap.PAGESIZE
+    last = min(len(pages), base + stop * array.itemsize)
+    if last > first:
+        pages.madvise(mmap.MADV_DONTNEED, first, last - first)
+
+
+def read_checkpoint(directory: str) -> dict:
+    """The checkpoint of the run in ``directory``: its size, seed, tick and ``{id: (color, record)}`` factions."""
+    if os.path.exists(os.path.join(directory, CHANGED)):
+        raise SaveFormatError(f"{directory}: the run changed after its last checkpoint")
+    try:
+        with open(os.path.join(directory, CHECKPOINT), encoding="utf-8") as f:
+            checkpoint = json.load(f)
+    except FileNotFoundError:
+        raise SaveFormatError(f"{directory}: no checkpoint to resume from") from None
+    factions = {}
+    for fid, color, record in checkpoint["factions"]:
+        if "capital" in record:
+            record["capital"] = tuple(record["capital"])
+        factions[fid] = (color, record)
+    checkpoint["factions"] = factions
+    return checkpoint
+
+
+class _SparseRelations:
+    """``relations[sources, targets]`` over a sparse relation store, the way :func:`step_stripe` indexes it."""
+
+    def __init__(self, relations):
+        self.relations = relations
+
+    def __getitem__(self, key):
+        return self.relations.lookup(*key)
+
+
+class _NoFrontier(FrontierMask):
+    """A frontier that tracks nothing: the banded step finds border cells itself, and a mask costs a byte per cell."""
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.mask = None
+
+    def rebuild(self, grid) -> None:
+        pass
+
+    def touch_many(self, grid, cells) -> None:
+        pass
+
+
+class MappedGrid(ArrayGrid):
+    """An :class:`ArrayGrid` whose per-cell arrays live in ``.npy`` files under ``directory``.
+
+    Without a ``directory`` the files go to a temporary one that is removed
+    with the grid. A new grid replaces any run already in ``directory``;
+    ``resume=True`` opens the files of its last checkpoint instead. The
+    step covers ``band_rows`` rows at a time, by default about
+    :data:`BAND_CELLS` cells.
+    """
+
+    def __init__(self, width: int, height: int, directory: Optional[str] = None,
+                 palette: Optional[Palette] = None, rng=None, band_rows: Optional[int] = None,
+                 resume: bool = False):
+        # The arrays are the mapped files opened below rather than in-memory ones
+        super().__init__(0, 0, palette, rng)
+        self.width = width
+        self.height = height
+        if directory is None:
+            directory = tempfile.mkdtemp(prefix="colorwar-run-")
+            weakref.finalize(self, shutil.rmtree, directory, True)
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.band_rows = band_rows or max(2, BAND_CELLS // max(1, width))
+        self.tick = 0
+        if resume:
+            checkpoint = read_checkpoint(directory)
+            if (checkpoint["width"], checkpoint["height"]) != (width, height):
+                raise ValueError(f"{directory} holds a {checkpoint['width']}x{checkpoint['height']} run, "
+                                 f"not {width}x{height}")
+            self.seed, self.tick = checkpoint["seed"], checkpoint["tick"]
+        else:
+            for name in (CHECKPOINT, CHANGED):
+                if os.path.exists(os.path.join(directory, name)):
+                    os.remove(os.path.join(directory, name))
+            self.seed = int(self.rng.integers(1 << 63))
+        self.maps: Dict[str, "np.memmap"] = {}
+        for role, dtype in ARRAYS.items():
+            path = os.path.join(directory, f"{role}.npy")
+            if resume:
+                array = np.lib.format.open_memmap(path, mode="r+")
+                if array.shape != (height, width) or array.dtype != np.dtype(dtype):
+                    raise SaveFormatError(f"{path}: expected {height}x{width} {dtype}, found "
+                                          f"{'x'.join(map(str, array.shape))} {array.dtype}")
+            else:
+                array = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=(height, width))
+            self.maps[role] = array
+            setattr(self, role, array)
+        self.frontier = _NoFrontier(width, height)
+        self.changed = False
+
+    def bands(self) -> List[Tuple[int, int]]:
+        """The ``(y0, y1)`` row ranges the step works through, each at least two rows high."""
+        return split_rows(self.height, -(-self.height // self.band_rows))
+
+    def release(self, y0: int = 0, y1: Optional[int] = None) -> None:
+        """Drop rows ``y0`` to ``y1`` of every array from memory; the files keep their contents.
+
+        Where the platform cannot drop pages on request this does nothing
+        and the operating system reclaims them under memory pressure.
+        """
+        y1 = self.height if y1 is None else y1
+        for array in self.maps.values():
+            drop_pages(array, max(0, y0) * self.width, min(self.height, y1) * self.width)
+
+    def _mark_changed(self) -> None:
+        if not self.changed:
+            self.changed = True
+            open(os.path.join(self.directory, CHANGED), "w").close()
+
+    def checkpoint(self, factions: bytes) -> str:
+        """Flush the arrays and write ``factions``, from :func:`~colorwar.savefile.encode_factions`, beside them.
+
+        Returns the path of the checkpoint file.
+        """
+        for array in self.maps.values():
+            array.flush()
+        path = os.path.join(self.directory, CHECKPOINT)
+        temp = f"{path}.tmp"
+        with open(temp, "w", encoding="utf-8") as f:
+            json.dump({"width": self.width, "height": self.height, "seed": self.seed, "tick": self.tick,
+                       "factions": json.loads(factions)}, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, path)
+        if self.changed:
+            os.remove(os.path.join(self.directory, CHANGED))
+            self.changed = False
+        return path
+
+    def relabel(self, ids: Mapping[int, int]) -> None:
+        """Translate every owner through ``ids`` (old ID -> new ID), band by band; other IDs become empty."""
+        if all(old == new for old, new in ids.items()):
+            return
+        lookup = np.zeros(max(ids, default=0) + 1, dtype=np.uint16)
+        for old, new in ids.items():
+            lookup[old] = new
+        for y0, y1 in self.bands():
+            for array in (self.grid, self.last_owner):
+                rows = array[y0:y1]
+                rows[:] = np.where(rows < lookup.size, lookup[np.minimum(rows, lookup.size - 1)], 0)
+            self.release(y0, y1)
+
+    def clear(self) -> None:
+        for y0, y1 in self.bands():
+            for array in self.maps.values():
+                array[y0:y1] = 0
+            self.release(y0, y1)
+
+    def load_arrays(self, grid, claim_age, overwrite_cooldown) -> None:
+        for y0, y1 in self.bands():
+            self.grid[y0:y1] = grid[y0:y1]
+            self.claim_age[y0:y1] = claim_age[y0:y1]
+            self.overwrite_cooldown[y0:y1] = overwrite_cooldown[y0:y1]
+            self.last_owner[y0:y1] = grid[y0:y1]
+            self.release(y0, y1)
+
+    def counts(self):
+        totals = np.zeros(self.palette.size, dtype=np.int64)
+        for y0, y1 in self.bands():
+            band = np.bincount(self.grid[y0:y1].ravel(), minlength=totals.size)
+            band[:totals.size] += totals
+            totals = band
+            self.release(y0, y1)
+        return totals
+
+    def _band_matches(self, match: int) -> List[int]:
+        """The number of cells holding ``match`` in each band."""
+        found = []
+        for y0, y1 in self.bands():
+            found.append(int(np.count_nonzero(self.grid[y0:y1] == match)))
+            self.release(y0, y1)
+        return found
+
+    def _pick(self, match: int, found: List[int], count: int):
+        """``count`` distinct cells holding ``match``, drawn uniformly given each band's ``found`` matches."""
+        picked = []
+        if count > 0:
+            per_band = self.rng.multivariate_hypergeometric(found, count)
+            for (y0, y1), hits in zip(self.bands(), per_band.tolist()):
+                if hits:
+                    cells = np.flatnonzero(self.grid[y0:y1] == match)
+                    picked.append(self.rng.choice(cells, size=hits, replace=False) + y0 * self.width)
+                    self.release(y0, y1)
+        return np.concatenate(picked) if picked else np.zeros(0, dtype=np.intp)
+
+    def cells_of(self, ids: Sequence[int]):
+        found = []
+        for y0, y1 in self.bands():
+            found.append(np.flatnonzero(np.isin(self.grid[y0:y1], ids)) + y0 * self.width)
+            self.release(y0, y1)
+        return np.concatenate(found)
+
+    def probe(self, match: Optional[int], probes: int, limit: Optional[int] = None):
+        """See :meth:`ArrayGrid.probe`; the hits are spread over the bands by their share of ``match``."""
+        if match is None:
+            # Only as large as the number of probes
+            hits = super().probe(match, probes, limit)
+            self.release()
+            return hits
+        found = self._band_matches(match)
+        total = sum(found)
+        hits = int(self.rng.binomial(probes, total / self.grid.size))
+        # Probes landing on one cell twice count it once, as in ArrayGrid.probe
+        count = np.unique(self.rng.integers(0, total, size=hits)).size if hits else 0
+        if limit is not None:
+            count = min(count, limit)
+        return self._pick(match, found, count)
+
+    def choose(self, match: int, count: int):
+        found = self._band_matches(match)
+        return self._pick(match, found, min(count, sum(found)))
+
+    def scatter(self, chance: float):
+        picked = []
+        for y0, y1 in self.bands():
+            cells = (y1 - y0) * self.width
+            hits = int(self.rng.binomial(cells, chance))
+            picked.append(self.rng.choice(cells, size=hits, replace=False) + y0 * self.width)
+        return np.concatenate(picked)
+
+    def quake(self, count: int):
+        touched = super().quake(count)
+        self.release()
+        return touched
+
+    def step_factions(
+        self,
+        registry: FactionRegistry,
+        faction_power: Mapping[int, int],
+        terrain: Optional["np.ndarray"],
+        fuse,
+        max_factions: int = 150,
+    ):
+        """Advance one tick of the ``AISim`` rules band by band; see :meth:`ArrayGrid.step_factions`.
+
+        Each band is stepped from the state at the start of the tick: the
+        two rows above it are copied out before the band above is written,
+        and the rows below are not written until the band below is stepped.
+        """
+        self._mark_changed()
+        # Pages read since the last tick, e.g. by a disaster, go first
+        self.release()
+        self.tick += 1
+        relations = registry.relations
+        arrays = {
+            **self.maps,
+            "relations": relations.matrix if relations.dense else _SparseRelations(relations),
+        }
+        if terrain is not None:
+            arrays["biome"] = terrain.reshape(self.grid.shape)
+        params = tick_params(_tick_key(self.seed, self.tick), registry, faction_power, self.grid.size,
+                             max_factions)
+        bounds = self.bands()
+        above = None
+        results = []
+        for k, (y0, y1) in enumerate(bounds):
+            # The bands around this one, and their edge rows as they stood at the start of the tick
+            local = bounds[max(0, k - 1):k + 2]
+            edges = np.zeros((len(local), 4, self.width), dtype=self.grid.dtype)
+            if k > 0:
+                edges[0, 2:] = above
+            if k + 1 < len(bounds):
+                edges[-1, :2] = self.grid[y1:y1 + 2]
+            above = np.array(self.grid[y1 - 2:y1])
+            arrays["edges"] = edges
+            results.append(step_stripe(arrays, local, min(k, 1), params))
+            self.release(y0 - 2, y1 + 2)
+            if terrain is not None:
+                # A terrain raster mapped from the run directory, see Terrain
+                drop_pages(terrain, (y0 - 2) * self.width, (y1 + 2) * self.width)
+        return apply_fusions(self, results, registry, fuse, max_factions)
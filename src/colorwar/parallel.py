@@ -0,0 +1,392 @@
+"""Tile-parallel ``step_factions`` for the NumPy engine.
+
+:meth:`ArrayGrid.step_factions` runs on one core. :class:`ParallelStepper`
+splits the grid into horizontal stripes and steps each one in a worker of a
+:class:`~concurrent.futures.ProcessPoolExecutor`. The grid, claim ages,
+cooldowns and last owners live in :mod:`multiprocessing.shared_memory`, so
+each worker writes its own rows in place and only the cells that changed
+travel back to the parent.
+
+A stripe is stepped from the state at the start of the tick. Besides its own
+rows a worker reads a halo from its neighbours: the two rows on each side
+that were copied out before the tick started. The row next to the stripe
+holds border cells whose claims can cross into it, and the second row tells
+whether those cells are on the border. Each worker works through every
+claim that lands in its own rows, including claims from the halo, and
+ignores claims that land in a neighbour's rows.
+
+Rolls come from counter-based random streams keyed on the seed, the tick and
+the cell, rather than from a shared generator. Two workers that both see a
+halo cell therefore agree on everything it does, and the result is the same
+for any number of stripes or workers. Where several claims land on one cell,
+the one with the highest random key wins, which is a uniformly random pick
+as in the serial step. Fusions need the registry to found the blended
+faction, so workers hand the winning fusion claims back and the parent
+applies them after the tick.
+"""
+
+import multiprocessing
+import os
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Mapping, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised only without numpy
+    np = None
+
+from .engine import DIRECTIONS, ArrayGrid, require_numpy, tick_coefficients
+from .registry import EMPTY, FactionRegistry
+
+# Salts separating the random streams drawn for one cell in one tick.
+_SPREAD, _ATTACK, _FUSE, _ROLL, _ATTACK_KEY, _CLAIM_KEY = range(6)
+_MASK = (1 << 64) - 1
+
+
+def _mix(x):
+    """SplitMix64 finalizer over a uint64 array."""
+    x = x ^ (x >> np.uint64(30))
+    x = x * np.uint64(0xBF58476D1CE4E5B9)
+    x = x ^ (x >> np.uint64(27))
+    x = x * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def _tick_key(seed: int, tick: int) -> int:
+    return int(_mix(np.array([(seed * 0x9E3779B97F4A7C15 + tick) & _MASK], dtype=np.uint64))[0])
+
+
+def uniform(key: int, index, stream: int):
+    """Floats in [0, 1) determined only by ``key``, the indices and ``stream``."""
+    x = np.asarray(index, dtype=np.uint64) * np.uint64(8) + np.uint64(stream)
+    x = _mix(x ^ np.uint64(key))
+    return (x >> np.uint64(11)).astype(np.float64) * (1.0 / (1 << 53))
+
+
+def _pick_max(targets, keys):
+    """Positions of the highest-keyed entry for each distinct target."""
+    order = np.lexsort((keys, targets))
+    ordered = targets[order]
+    last = np.ones(order.size, dtype=bool)
+    last[:-1] = ordered[1:] != ordered[:-1]
+    return order[last]
+
+
+def _border(rows):
+    """Claimed cells with a differing neighbour, as :meth:`FrontierMask.rebuild` computes them."""
+    border = np.zeros(rows.shape, dtype=bool)
+    border[:, :-1] |= rows[:, :-1] != rows[:, 1:]
+    border[:, 1:] |= rows[:, 1:] != rows[:, :-1]
+    border[:-1] |= rows[:-1] != rows[1:]
+    border[1:] |= rows[1:] != rows[:-1]
+    return border & (rows != 0)
+
+
+def split_rows(height: int, stripes: int) -> List[Tuple[int, int]]:
+    """Split ``height`` rows into at most ``stripes`` stripes of at least two rows each."""
+    stripes = max(1, min(stripes, height // 2))
+    edges = np.linspace(0, height, stripes + 1).astype(int).tolist()
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def step_stripe(arrays: Mapping[str, "np.ndarray"], bounds: List[Tuple[int, int]], k: int, params: Mapping):
+    """Step rows ``bounds[k]`` of the shared arrays in place.
+
+    Returns the flat indices of cells that changed owner, their previous
+    owners and the winning fusion claims as ``(targets, sources, others)``,
+    which are left for the parent to apply.
+    """
+    grid, age, cooldown = arrays["grid"], arrays["claim_age"], arrays["overwrite_cooldown"]
+    edges = arrays["edges"]
+    height, width = grid.shape
+    y0, y1 = bounds[k]
+    g = grid.reshape(-1)
+    key = params["key"]
+
+    own_cooldown = cooldown[y0:y1]
+    np.subtract(own_cooldown, 1, out=own_cooldown, where=own_cooldown > 0)
+
+    above = edges[k - 1, 2:] if k > 0 else edges[k, :0]
+    below = edges[k + 1, :2] if k + 1 < len(bounds) else edges[k, :0]
+    rows = np.concatenate((above, grid[y0:y1], below))
+    top = y0 - len(above)
+    first, last = max(0, y0 - 1) - top, min(height, y1 + 1) - top
+
+    alive, power, counts = params["alive"], params["power"], params["counts"]
+    local = np.flatnonzero((_border(rows) & (counts > 0)[rows])[first:last]) + first * width
+    src = local + top * width
+    s = rows.reshape(-1)[local]
+
+    empty = np.empty(0, dtype=np.int64)
+    changed, previous = empty, g[empty]
+    fusions = (empty, empty, empty)
+    if src.size:
+        jitter = params["jitter"][s]
+        spread = params["spread"][s] + uniform(key, src, _SPREAD) * jitter
+        attack = params["attack"][s] + uniform(key, src, _ATTACK) * jitter
+        biome = arrays.get("biome")
+        if biome is not None:
+            spread *= biome.reshape(-1)[src]
+            attack *= biome.reshape(-1)[src]
+
+        relations = arrays["relations"]
+        x, y = src % width, src // width
+        flat_cooldown, flat_age = cooldown.reshape(-1), age.reshape(-1)
+        claims = []
+        attacks = []
+        fused_t, fused_s, fused_o, fused_p = [], [], [], []
+        for d, (dx, dy) in enumerate(DIRECTIONS):
+            ny = y + dy
+            sel = np.flatnonzero((ny >= y0) & (ny < y1) & (x + dx >= 0) & (x + dx < width))
+            t_idx = src[sel] + dy * width + dx
+            pid = src[sel] * 4 + d
+            sv = s[sel]
+            t = g[t_idx]
+            enemy = (t != EMPTY) & (t != sv) & alive[t]
+            if params["fusion_open"]:
+                fused = enemy & (uniform(key, pid, _FUSE) < 0.01)
+                fused_t.append(t_idx[fused])
+                fused_s.append(sv[fused])
+                fused_o.append(t[fused])
+                fused_p.append(pid[fused])
+                enemy &= ~fused
+            roll = uniform(key, pid, _ROLL)
+            hit = (t == EMPTY) & (roll < spread[sel])
+            claims.append((t_idx[hit], sv[hit], pid[hit]))
+
+            cand = np.flatnonzero(enemy & (flat_cooldown[t_idx] == 0) & (flat_age[t_idx] >= 6))
+            if cand.size:
+                cs, ct = sv[cand], t[cand]
+                modifier = 1.0 - np.maximum(0.0, relations[cs, ct])
+                won = (power[cs] > counts[ct]) | (roll[cand] < attack[sel[cand]] * modifier)
+                attacks.append((t_idx[cand[won]], cs[won], pid[cand[won]]))
+
+        if attacks:
+            at, ac, ap = (np.concatenate(part) for part in zip(*attacks))
+            keep = _pick_max(at, uniform(key, ap, _ATTACK_KEY))
+            flat_cooldown[at[keep]] = 4
+            claims.append((at[keep], ac[keep], ap[keep]))
+
+        ft = np.concatenate(fused_t) if fused_t else empty
+        targets, owners, pids = (np.concatenate(part) for part in zip(*claims))
+        fusion = np.zeros(targets.size + ft.size, dtype=bool)
+        fusion[targets.size:] = True
+        if ft.size:
+            targets = np.concatenate((targets, ft))
+            owners = np.concatenate((owners, np.concatenate(fused_s)))
+            pids = np.concatenate((pids, np.concatenate(fused_p)))
+            others = np.concatenate(fused_o)
+        win = _pick_max(targets, uniform(key, pids, _CLAIM_KEY))
+        won_fusion = fusion[win]
+        if ft.size:
+            picked = win[won_fusion] - (fusion.size - ft.size)
+            fusions = (ft[picked], owners[win[won_fusion]], others[picked])
+        win = win[~won_fusion]
+        targets, owners = targets[win], owners[win].astype(g.dtype)
+        moved = owners != g[targets]
+        changed = targets[moved]
+        previous = g[changed]
+        g[changed] = owners[moved]
+
+    own_age = age[y0:y1]
+    own_age += 1
+    age.reshape(-1)[changed] = 0
+    arrays["last_owner"][y0:y1] = grid[y0:y1]
+    return changed, previous, fusions
+
+
+def tick_params(key: int, registry: FactionRegistry, faction_power: Mapping[int, int], total: int,
+                max_factions: int = 150) -> dict:
+    """The per-tick tables :func:`step_stripe` reads, for the rolls keyed on ``key``."""
+    coefficients = tick_coefficients(registry, faction_power, total)
+    return {
+        "key": key,
+        "alive": np.frombuffer(bytes(registry.alive), dtype=np.uint8).astype(bool),
+        "counts": np.array(coefficients.counts, dtype=np.int64),
+        **{name: np.array(getattr(coefficients, name), dtype=np.float64)
+           for name in ("power", "spread", "attack", "jitter")},
+        "fusion_open": len(registry) < max_factions,
+    }
+
+
+def apply_fusions(world: ArrayGrid, results, registry: FactionRegistry, fuse: Callable[[int, int], int],
+                  max_factions: int = 150):
+    """Apply the fusion claims of the :func:`step_stripe` ``results`` of one tick to ``world``.
+
+    Returns every cell that changed owner in the tick and its previous owner.
+    """
+    changed = [result[0] for result in results]
+    previous = [result[1] for result in results]
+    ft, fs, fo = (np.concatenate(part) for part in zip(*(result[2] for result in results)))
+    if ft.size:
+        fc = world._fuse_ids(fs, fo, registry, fuse, max_factions).astype(world.grid.dtype)
+        merged = fc != EMPTY
+        ft, fc = ft[merged], fc[merged]
+        g = world.grid.reshape(-1)
+        previous.append(g[ft])
+        changed.append(ft)
+        g[ft] = fc
+        world.claim_age.reshape(-1)[ft] = 0
+        world.last_owner.reshape(-1)[ft] = fc
+    return np.concatenate(changed), np.concatenate(previous)
+
+
+class _Block:
+    """A NumPy array in a shared memory block, unlinked when garbage collected."""
+
+    def __init__(self, shape, dtype):
+        dtype = np.dtype(dtype)
+        size = max(1, int(np.prod(shape)) * dtype.itemsize)
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.array = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf)
+        self.spec = (self.shm.name, tuple(shape), dtype.str)
+        self._finalizer = weakref.finalize(self, _release, self.shm)
+
+    def release(self) -> None:
+        self._finalizer()
+
+
+# Blocks unlinked while arrays still point into them; the mapping lives on until exit.
+_orphans: List[shared_memory.SharedMemory] = []
+
+
+def _release(shm) -> None:
+    shm.unlink()
+    try:
+        shm.close()
+    except BufferError:
+        _orphans.append(shm)
+
+
+def _shutdown(pool) -> None:
+    if pool is not None:
+        pool.shutdown()
+
+
+# Worker-side cache of attached blocks, by shared memory name.
+_attached: Dict[str, Tuple[shared_memory.SharedMemory, "np.ndarray"]] = {}
+
+
+def _attach(specs: Mapping[str, Tuple[str, tuple, str]]) -> Dict[str, "np.ndarray"]:
+    names = {name for name, _, _ in specs.values()}
+    for name in [name for name in _attached if name not in names]:
+        _attached.pop(name)[0].close()
+    arrays = {}
+    for role, (name, shape, dtype) in specs.items():
+        if name not in _attached:
+            # Workers share the parent's resource tracker, which unlinks the block once.
+            shm = shared_memory.SharedMemory(name=name)
+            _attached[name] = (shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf))
+        arrays[role] = _attached[name][1]
+    return arrays
+
+
+def _run_stripe(task):
+    specs, bounds, k, params = task
+    return step_stripe(_attach(specs), bounds, k, params)
+
+
+class ParallelStepper:
+    """Steps an :class:`ArrayGrid` in horizontal stripes across worker processes.
+
+    :meth:`share` moves a world's arrays into shared memory; call it before
+    taking references to them. ``workers=0`` steps the stripes one after
+    another in this process, with the same result. Relations must be dense;
+    with a sparse store :meth:`step` falls back to the serial step. The
+    world's frontier mask is not kept up to date between parallel ticks.
+    """
+
+    def __init__(self, workers: Optional[int] = None, stripes: Optional[int] = None,
+                 seed: Optional[int] = None, mp_context: str = "spawn"):
+        require_numpy()
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.stripes = stripes or max(1, self.workers)
+        self.seed = seed
+        self.tick = 0
+        self.pool = None
+        if self.workers > 0:
+            self.pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context(mp_context))
+        # Stop the workers even if the stepper is dropped without close(); blocks unlink themselves
+        self._finalizer = weakref.finalize(self, _shutdown, self.pool)
+        self.blocks: Dict[str, _Block] = {}
+        self._relations_version = None
+        self._terrain = None
+        self._stale_frontier = False
+
+    def _publish(self, role: str, shape, dtype) -> "np.ndarray":
+        block = self.blocks.get(role)
+        if block is None or block.array.shape != tuple(shape) or block.array.dtype != np.dtype(dtype):
+            if block is not None:
+                block.release()
+            block = self.blocks[role] = _Block(shape, dtype)
+        return block.array
+
+    def share(self, world: ArrayGrid) -> None:
+        """Move ``world``'s per-cell arrays into shared memory, in place of its own."""
+        for role in ("grid", "claim_age", "overwrite_cooldown", "last_owner"):
+            array = getattr(world, role)
+            if self.blocks.get(role) is not None and self.blocks[role].array is array:
+                continue
+            shared = self._publish(role, array.shape, array.dtype)
+            shared[:] = array
+            setattr(world, role, shared)
+        if self.seed is None:
+            self.seed = int(world.rng.integers(1 << 63))
+
+    def step(
+        self,
+        world: ArrayGrid,
+        registry: FactionRegistry,
+        faction_power: Mapping[int, int],
+        terrain: Optional["np.ndarray"],
+        fuse: Callable[[int, int], int],
+        max_factions: int = 150,
+    ):
+        """Advance one tick like :meth:`ArrayGrid.step_factions`; same arguments and return value."""
+        if not registry.relations.dense or self.blocks.get("grid") is None:
+            if self._stale_frontier:
+                world.frontier.rebuild(world.grid)
+                self._stale_frontier = False
+            return world.step_factions(registry, faction_power, terrain, fuse, max_factions)
+        self.tick += 1
+        bounds = split_rows(world.height, self.stripes)
+
+        edges = self._publish("edges", (len(bounds), 4, world.width), world.grid.dtype)
+        for k, (y0, y1) in enumerate(bounds):
+            edges[k] = world.grid[np.clip([y0, y0 + 1, y1 - 2, y1 - 1], y0, y1 - 1)]
+        size = registry.relations.size
+        if self._relations_version != registry.relations.version or "relations" not in self.blocks:
+            self._publish("relations", (size, size), np.float32)[:] = registry.relations.matrix[:size, :size]
+            self._relations_version = registry.relations.version
+        # The terrain raster is rebuilt, as a new array, only when the terrain changes
+        if terrain is None:
+            if "biome" in self.blocks:
+                self.blocks.pop("biome").release()
+            self._terrain = None
+        elif terrain is not self._terrain:
+            self._publish("biome", world.grid.shape, np.float32)[:] = terrain.reshape(world.grid.shape)
+            self._terrain = terrain
+
+        params = tick_params(_tick_key(self.seed, self.tick), registry, faction_power, world.grid.size,
+                             max_factions)
+        if self.pool is None:
+            arrays = {role: block.array for role, block in self.blocks.items()}
+            results = [step_stripe(arrays, bounds, k, params) for k in range(len(bounds))]
+        else:
+            specs = {role: block.spec for role, block in self.blocks.items()}
+            results = list(self.pool.map(_run_stripe, [(specs, bounds, k, params) for k in range(len(bounds))]))
+
+        changed, previous = apply_fusions(world, results, registry, fuse, max_factions)
+        # Workers find border cells themselves; the mask is only rebuilt for the serial step.
+        self._stale_frontier = True
+        return changed, previous
+
+    def close(self) -> None:
+        """Stop the workers and unlink the shared memory; arrays already handed out stay usable."""
+        self._finalizer()
+        self.pool = None
+        for block in self.blocks.values():
+            block.release()
+        self.blocks = {}
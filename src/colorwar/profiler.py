@@ -0,0 +1,133 @@
+"""Per-phase timing of simulation ticks.
+
+``AISim.simulate`` reports where each tick went to a profiler: it calls
+:meth:`TickProfiler.start` at the top of a tick, :meth:`TickProfiler.mark`
+after each phase and :meth:`TickProfiler.end` with the number of cells the
+step changed. :class:`TickProfiler` keeps the last ``window`` ticks for
+rolling percentiles and export; :class:`NullProfiler` ignores everything,
+so an unprofiled run pays for a few empty method calls per tick.
+"""
+
+import csv
+import json
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Sequence
+
+PHASES = ("power", "step", "victory", "merge", "disasters", "gc", "decay", "cull", "respawn", "events")
+PERCENTILES = (50, 90, 99)
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """The ``q``-th percentile of sorted ``values``, interpolating between ranks."""
+    if not values:
+        return 0.0
+    rank = (len(values) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+class NullProfiler:
+    """Profiler for unprofiled runs: records nothing."""
+
+    enabled = False
+
+    def start(self) -> None:
+        pass
+
+    def mark(self, phase: str) -> None:
+        pass
+
+    def end(self, changed: int = 0) -> None:
+        pass
+
+
+class TickProfiler:
+    """Wall time per phase and cells changed for the last ``window`` ticks.
+
+    Each tick becomes one record: the tick number, seconds spent in every
+    phase of :data:`PHASES` (0 for phases that did not run), the whole
+    tick's seconds as ``total`` and the cells changed by the step. The
+    simulation thread writes records while the UI thread reads them, so
+    readers get copies taken under a lock.
+    """
+
+    enabled = True
+    columns = ("tick", *PHASES, "total", "changed")
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self.ticks = 0
+        self._records = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._index = {phase: i for i, phase in enumerate(PHASES)}
+        self._times = [0.0] * len(PHASES)
+        self._started = self._last = 0.0
+
+    def start(self) -> None:
+        self._times = [0.0] * len(PHASES)
+        self._started = self._last = time.perf_counter()
+
+    def mark(self, phase: str) -> None:
+        """Charge the time since the last mark (or ``start``) to ``phase``."""
+        now = time.perf_counter()
+        self._times[self._index[phase]] += now - self._last
+        self._last = now
+
+    def end(self, changed: int = 0) -> None:
+        record = (self.ticks, *self._times, time.perf_counter() - self._started, changed)
+        with self._lock:
+            self._records.append(record)
+            self.ticks += 1
+
+    def records(self) -> List[Dict[str, float]]:
+        """The ticks in the window, oldest first, as ``{column: value}`` dicts."""
+        with self._lock:
+            records = list(self._records)
+        return [dict(zip(self.columns, record)) for record in records]
+
+    def last(self) -> Dict[str, float]:
+        """The most recent tick's record, or ``{}`` before the first tick ends."""
+        with self._lock:
+            record = self._records[-1] if self._records else None
+        return dict(zip(self.columns, record)) if record else {}
+
+    def summary(self, percentiles: Iterable[float] = PERCENTILES) -> Dict[str, Dict[str, float]]:
+        """Rolling mean, max and percentiles of every phase, ``total`` and ``changed``.
+
+        Returns ``{column: {"mean": ..., "max": ..., "p50": ..., ...}}`` over the window.
+        """
+        with self._lock:
+            records = list(self._records)
+        summary = {}
+        for i, column in enumerate(self.columns[1:], start=1):
+            values = sorted(record[i] for record in records)
+            stats = {
+                "mean": sum(values) / len(values) if values else 0.0,
+                "max": values[-1] if values else 0.0,
+            }
+            for q in percentiles:
+                stats[f"p{q:g}"] = percentile(values, q)
+            summary[column] = stats
+        return summary
+
+    def export(self, path: str) -> None:
+        """Write the window to ``path``: CSV for ``.csv``, JSON otherwise."""
+        if path.endswith(".csv"):
+            self.to_csv(path)
+        else:
+            self.to_json(path)
+
+    def to_csv(self, path: str) -> None:
+        """One row per tick, with a header of :attr:`columns`; times are in seconds."""
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=self.columns)
+            writer.writeheader()
+            writer.writerows(self.records())
+
+    def to_json(self, path: str) -> None:
+        """The summary and every tick in the window; times are in seconds."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"phases": PHASES, "summary": self.summary(), "ticks": self.records()}, f, indent=2)
@@ -0,0 +1,327 @@
+"""Dense integer IDs for factions.
+
+Grids store small integer faction IDs instead of hex strings so the hot loops
+compare and index integers. :class:`Palette` is the bare color <-> ID mapping;
+:class:`FactionRegistry` adds the faction attributes in parallel arrays indexed
+by ID, recycles the IDs of dead factions and exposes the old string-keyed
+``factions`` dict as a read-only view. Relations between factions live in a
+:class:`~colorwar.relations.Relations` store indexed by ID.
+"""
+
+from array import array
+from collections.abc import Mapping, MutableMapping
+from typing import Dict, Iterator, List, Optional, Union
+
+from .relations import DENSE_LIMIT, Relations
+
+EMPTY = 0
+MAX_ID = 0xFFFF  # grids store IDs as uint16
+TRAITS = ("aggression", "defense", "expansionism", "risk")
+
+
+class Palette:
+    """Maps colors to dense integer IDs, with ``0`` reserved for empty cells."""
+
+    def __init__(self):
+        self.colors: List[Optional[str]] = [None]
+        self.ids: Dict[str, int] = {}
+        # Bumped whenever an ID changes color, so renderers can cache per-ID colors
+        self.version = 0
+
+    @property
+    def size(self) -> int:
+        """Number of ID slots, including the empty ID and any dead ones."""
+        return len(self.colors)
+
+    def id_of(self, color: str) -> int:
+        return self.ids[color]
+
+    def color_of(self, fid: int) -> Optional[str]:
+        return self.colors[fid]
+
+    def intern(self, color: Optional[str]) -> int:
+        """Return the ID for ``color``, allocating one if it is new."""
+        if color is None:
+            return EMPTY
+        fid = self.ids.get(color)
+        if fid is None:
+            fid = self._allocate()
+            self.colors[fid] = color
+            self.ids[color] = fid
+            self.version += 1
+        return fid
+
+    def _allocate(self) -> int:
+        if len(self.colors) > MAX_ID:
+            raise OverflowError("faction IDs exhausted")
+        self.colors.append(None)
+        return len(self.colors) - 1
+
+    def clear(self) -> None:
+        self.colors = [None]
+        self.ids = {}
+        self.version += 1
+
+
+class PersonalityView(MutableMapping):
+    """One faction's traits, read from and written to the registry arrays."""
+
+    __slots__ = ("_traits", "_fid")
+
+    def __init__(self, traits: Dict[str, array], fid: int):
+        self._traits = traits
+        self._fid = fid
+
+    def __getitem__(self, trait: str) -> float:
+        return self._traits[trait][self._fid]
+
+    def __setitem__(self, trait: str, value: float) -> None:
+        self._traits[trait][self._fid] = value
+
+    def __delitem__(self, trait: str) -> None:
+        raise TypeError("personality traits cannot be removed")
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(TRAITS)
+
+    def __len__(self) -> int:
+        return len(TRAITS)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
+class RelationsView(MutableMapping):
+    """One faction's ``{color: relation}`` dict, read from and written to the registry's relations store."""
+
+    __slots__ = ("_registry", "_fid")
+
+    def __init__(self, registry: "FactionRegistry", fid: int):
+        self._registry = registry
+        self._fid = fid
+
+    def __getitem__(self, color: str) -> float:
+        other = self._registry.ids[color]
+        if other == self._fid:
+            raise KeyError(color)
+        return self._registry.relations.get(self._fid, other)
+
+    def __setitem__(self, color: str, value: float) -> None:
+        self._registry.relations.set(self._fid, self._registry.ids[color], value)
+
+    def __delitem__(self, color: str) -> None:
+        self[color] = 0.0
+
+    def __iter__(self) -> Iterator[str]:
+        colors = self._registry.colors
+        return (colors[fid] for fid in self._registry.alive_ids() if fid != self._fid)
+
+    def __len__(self) -> int:
+        return len(self._registry.ids) - 1
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
+class FactionRecord(MutableMapping):
+    """Dict-like access to one faction stored in a :class:`FactionRegistry`.
+
+    ``name``, ``behavior`` and ``personality`` live in the registry's parallel
+    arrays and ``relations`` in its relations store; any other key is kept in
+    a per-faction dict of extras.
+    """
+
+    __slots__ = ("_registry", "id")
+
+    def __init__(self, registry: "FactionRegistry", fid: int):
+        self._registry = registry
+        self.id = fid
+
+    @property
+    def color(self) -> str:
+        return self._registry.colors[self.id]
+
+    def __getitem__(self, key: str):
+        registry = self._registry
+        if key == "name":
+            return registry.names[self.id]
+        if key == "behavior":
+            return registry.behaviors[self.id]
+        if key == "personality":
+            return PersonalityView(registry.traits, self.id)
+        if key == "relations":
+            return RelationsView(registry, self.id)
+        return registry.extras[self.id][key]
+
+    def __setitem__(self, key: str, value) -> None:
+        registry = self._registry
+        if key == "name":
+            registry.names[self.id] = value
+        elif key == "behavior":
+            registry.behaviors[self.id] = value
+        elif key == "personality":
+            for trait in TRAITS:
+                registry.traits[trait][self.id] = value.get(trait, 1.0)
+        elif key == "relations":
+            registry.set_relations(self.id, value)
+        else:
+            registry.extras[self.id][key] = value
+
+    def __delitem__(self, key: str) -> None:
+        if key in ("name", "behavior", "personality", "relations"):
+            raise TypeError(f"{key!r} cannot be removed from a faction")
+        del self._registry.extras[self.id][key]
+
+    def __iter__(self) -> Iterator[str]:
+        yield "name"
+        yield "behavior"
+        yield "personality"
+        yield "relations"
+        yield from self._registry.extras[self.id]
+
+    def __len__(self) -> int:
+        return 4 + len(self._registry.extras[self.id])
+
+    def __repr__(self) -> str:
+        return f"FactionRecord({self.color!r}, {dict(self)!r})"
+
+
+class FactionsView(Mapping):
+    """Read-only ``{color: record}`` view of the living factions."""
+
+    __slots__ = ("_registry",)
+
+    def __init__(self, registry: "FactionRegistry"):
+        self._registry = registry
+
+    def __getitem__(self, color: str) -> FactionRecord:
+        return FactionRecord(self._registry, self._registry.ids[color])
+
+    def __contains__(self, color) -> bool:
+        return color in self._registry.ids
+
+    def __iter__(self) -> Iterator[str]:
+        colors = self._registry.colors
+        return (colors[fid] for fid in self._registry.alive_ids())
+
+    def __len__(self) -> int:
+        return len(self._registry.ids)
+
+
+class FactionRegistry(Palette):
+    """Living factions under dense integer IDs.
+
+    Attributes are kept in parallel arrays indexed by ID: ``colors``,
+    ``names``, ``behaviors``, one ``array('d')`` per personality trait in
+    ``traits``, the ``alive`` flags and a dict of remaining fields per faction
+    in ``extras``. ``relations`` holds how each ID regards every other; it
+    stays dense up to ``dense_relations`` ID slots and draws its random
+    starting values from ``rng`` (default: the :mod:`random` module). IDs freed by :meth:`remove` are handed out again only after
+    :meth:`recycle` runs, so an ID read earlier in a tick never silently
+    refers to a different faction later in that tick.
+    """
+
+    def __init__(self, dense_relations: int = DENSE_LIMIT, rng=None):
+        super().__init__()
+        self.factions = FactionsView(self)
+        self.relations = Relations(dense_relations, rng)
+        self.clear()
+
+    def clear(self) -> None:
+        super().clear()
+        self.names: List[str] = [""]
+        self.behaviors: List[str] = [""]
+        self.traits: Dict[str, array] = {trait: array("d", [0.0]) for trait in TRAITS}
+        self.extras: List[Optional[dict]] = [None]
+        self.alive = bytearray(1)
+        self.relations.clear()
+        self._free: List[int] = []
+        self._released: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, color) -> bool:
+        return color in self.ids
+
+    def alive_ids(self) -> List[int]:
+        return [fid for fid, flag in enumerate(self.alive) if flag]
+
+    def record(self, fid: int) -> FactionRecord:
+        return FactionRecord(self, fid)
+
+    def intern(self, color: Optional[str]) -> int:
+        """Return the ID of a living faction; unlike a palette, never allocates."""
+        if color is None:
+            return EMPTY
+        return self.ids[color]
+
+    def _allocate(self) -> int:
+        if self._free:
+            return self._free.pop()
+        fid = super()._allocate()
+        self.names.append("")
+        self.behaviors.append("")
+        for values in self.traits.values():
+            values.append(0.0)
+        self.extras.append(None)
+        self.alive.append(0)
+        self.relations.grow(len(self.colors))
+        return fid
+
+    def add(self, color: str, record: Mapping) -> FactionRecord:
+        """Register a new faction from a legacy faction dict."""
+        if color in self.ids:
+            raise ValueError(f"faction {color} already exists")
+        fid = self._allocate()
+        self.colors[fid] = color
+        self.ids[color] = fid
+        self.version += 1
+        self.alive[fid] = 1
+        extras = dict(record)
+        self.names[fid] = extras.pop("name", "")
+        self.behaviors[fid] = extras.pop("behavior", "random")
+        personality = extras.pop("personality", {})
+        for trait in TRAITS:
+            self.traits[trait][fid] = personality.get(trait, 1.0)
+        self.extras[fid] = extras
+        self.set_relations(fid, extras.pop("relations", {}))
+        return FactionRecord(self, fid)
+
+    def set_relations(self, fid: int, relations: Mapping) -> None:
+        """Replace ``fid``'s relations with a ``{color: value}`` dict; unknown colors are skipped.
+
+        Relations towards ``fid`` are reset to neutral as well.
+        """
+        self.relations.reset(fid)
+        for color, value in relations.items():
+            other = self.ids.get(color)
+            if other is not None and other != fid:
+                self.relations.set(fid, other, value)
+
+    def remove(self, key: Union[str, int]) -> None:
+        """Remove a faction by color or ID.
+
+        The ID is only reused after the next :meth:`recycle`, so its cells may be
+        cleared after this call as long as that happens before then.
+        """
+        fid = self.ids[key] if isinstance(key, str) else key
+        if not self.alive[fid]:
+            raise KeyError(key)
+        del self.ids[self.colors[fid]]
+        self.colors[fid] = None
+        self.version += 1
+        self.names[fid] = ""
+        self.behaviors[fid] = ""
+        self.extras[fid] = None
+        self.alive[fid] = 0
+        self.relations.reset(fid)
+        self._released.append(fid)
+
+    def recycle(self) -> None:
+        """Make IDs removed since the last call available to :meth:`add`."""
+        if self._released:
+            # Reuse low IDs first to keep the arrays dense.
+            self._free.extend(self._released)
+            self._free.sort(reverse=True)
+            self._released = []
@@ -0,0 +1,140 @@
+"""Faction relations indexed by faction ID.
+
+Each faction holds a relation towards every other one, from -1 (hostile) to
+1 (allied); ``0`` is neutral. Nested ``{color: {color: value}}`` dicts cost
+one Python float per pair. :class:`Relations` keeps them in one float32
+matrix indexed by ID instead, so a birth or death clears one row and one
+column and ``step`` reads a whole batch of pairs with a single fancy index.
+
+A dense matrix grows with the square of the number of ID slots. Past
+``dense_limit`` slots (or without NumPy) the store switches to sparse rows
+that hold only the pairs that were set or looked up, and the random starting
+relations of :meth:`Relations.randomize` are drawn lazily, the first time a
+pair is read.
+"""
+
+import random
+from typing import Dict, Iterable, List, Set
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised only without numpy
+    np = None
+
+DENSE_LIMIT = 1024
+START_SPREAD = 0.3  # starting relations are uniform in [-0.3, 0.3]
+
+
+class Relations:
+    """Relation of each faction ID towards every other ID.
+
+    ``matrix[a, b]`` is how ``a`` regards ``b`` while the store is dense;
+    ``rows[a][b]`` holds the same once it is sparse. Exactly one of the two
+    is set. Random draws come from ``rng`` (a :class:`random.Random`,
+    default the :mod:`random` module), so seeding it reproduces them.
+    ``version`` goes up with every change.
+    """
+
+    def __init__(self, dense_limit: int = DENSE_LIMIT, rng=None):
+        self.dense_limit = dense_limit
+        self.rng = rng if rng is not None else random
+        self.version = 0
+        self.clear()
+
+    @property
+    def dense(self) -> bool:
+        return self.matrix is not None
+
+    def clear(self) -> None:
+        self.version += 1
+        self.size = 1
+        self.matrix = np.zeros((8, 8), dtype=np.float32) if np is not None and self.dense_limit > 0 else None
+        self.rows: List[Dict[int, float]] = None if self.dense else [{}]
+        self._pending: Set[int] = set()
+
+    def grow(self, size: int) -> None:
+        """Make room for IDs below ``size``; new slots start neutral."""
+        if size <= self.size:
+            return
+        self.version += 1
+        if self.dense and size > self.dense_limit:
+            self._to_sparse()
+        if self.dense:
+            capacity = len(self.matrix)
+            if size > capacity:
+                capacity = max(size, capacity * 2)
+                matrix = np.zeros((capacity, capacity), dtype=np.float32)
+                matrix[:self.size, :self.size] = self.matrix[:self.size, :self.size]
+                self.matrix = matrix
+        else:
+            self.rows.extend({} for _ in range(size - self.size))
+        self.size = size
+
+    def _to_sparse(self) -> None:
+        matrix = self.matrix[:self.size, :self.size]
+        self.rows = [
+            dict(zip(np.flatnonzero(row).tolist(), row[row != 0].tolist())) for row in matrix
+        ]
+        self.matrix = None
+
+    def reset(self, fid: int) -> None:
+        """Make ``fid`` neutral towards everyone and everyone towards it, in O(slots)."""
+        self.version += 1
+        if self.dense:
+            self.matrix[fid, :self.size] = 0
+            self.matrix[:self.size, fid] = 0
+            return
+        self.rows[fid].clear()
+        for row in self.rows:
+            row.pop(fid, None)
+        self._pending.discard(fid)
+
+    def get(self, a: int, b: int) -> float:
+        if self.dense:
+            return float(self.matrix[a, b])
+        row = self.rows[a]
+        value = row.get(b)
+        if value is None:
+            value = 0.0
+            if a != b and (a in self._pending or b in self._pending):
+                value = row[b] = round(self.rng.uniform(-START_SPREAD, START_SPREAD), 2)
+        return value
+
+    def set(self, a: int, b: int, value: float) -> None:
+        self.version += 1
+        if self.dense:
+            self.matrix[a, b] = value
+        else:
+            self.rows[a][b] = value
+
+    def randomize(self, ids: Iterable[int], others: Iterable[int] = None) -> None:
+        """Give each pair between ``ids`` and ``others`` (default: ``ids``) a random starting relation, both ways."""
+        self.version += 1
+        ids = list(ids)
+        others = ids if others is None else list(others)
+        if not self.dense:
+            # Drawn on first lookup; only pairs that ever meet cost memory.
+            self._pending.update(ids)
+            for group, members in ((ids, set(others)), (others, set(ids))):
+                for a in group:
+                    row = self.rows[a]
+                    for b in [b for b in row if b in members]:
+                        del row[b]
+            return
+        if not ids or not others:
+            return
+        rng = np.random.default_rng(self.rng.getrandbits(64))
+        rows, cols = np.array(ids), np.array(others)
+        block = np.round(rng.uniform(-START_SPREAD, START_SPREAD, (2, rows.size, cols.size)), 2)
+        self.matrix[np.ix_(rows, cols)] = block[0]
+        self.matrix[np.ix_(cols, rows)] = block[1].T
+        self.matrix[rows, rows] = 0
+
+    def lookup(self, sources, targets):
+        """Relations of ``sources[i]`` towards ``targets[i]`` for parallel ID arrays."""
+        if self.dense:
+            return self.matrix[sources, targets]
+        get = self.get
+        return np.fromiter(
+            (get(a, b) for a, b in zip(sources.tolist(), targets.tolist())), dtype=np.float32, count=len(sources)
+        )
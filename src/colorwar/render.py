@@ -0,0 +1,286 @@
+"""Renderers that turn grid cells into pixels.
+
+The simulations do not call pygame drawing functions themselves; they hand
+each cell that changed to a renderer. :class:`PygameRenderer` keeps a
+dirty-rectangle view of the grid for a window. :class:`NullRenderer`
+discards everything and never touches the display, which is what headless
+runs use. A simulation stepping on another thread publishes its changes to
+a :class:`~colorwar.frames.FrameRing` instead, which :meth:`show` paints
+from the main thread.
+
+Whole grids of faction IDs are painted in one go instead: with NumPy the
+IDs index an ID -> pixel value palette array and the result is blitted
+through ``pygame.surfarray``.
+
+The window shows the grid through a :class:`~colorwar.viewport.Camera`,
+so the grid can be larger than the screen; only the visible region is
+scaled to the window.
+"""
+
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+import pygame
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised only without numpy
+    np = None
+
+from .frames import Snapshot
+from .viewport import Camera, downsample_mode, level_size
+
+
+class NullRenderer:
+    """Renderer for headless runs: draws nothing."""
+
+    def draw_cell(self, x: int, y: int, color: Optional[str]) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+    def draw_grid(self, owners, width: int, palette: Sequence[Optional[str]], version: Optional[int] = None) -> None:
+        pass
+
+    def present(self, extra_rects: Iterable = ()) -> None:
+        pass
+
+    def show(self, frames) -> None:
+        pass
+
+
+class PygameRenderer:
+    """Dirty-rectangle renderer for a pygame window.
+
+    The grid is kept on a surface with one pixel per cell. Drawing a cell
+    sets its pixel and marks its tile dirty; :meth:`present` scales just the
+    dirty tiles up to the window and passes only their rectangles to
+    ``pygame.display.update``. Frame cost follows the number of changed
+    cells rather than the map size.
+
+    The simulation thread may draw while the main thread presents. Tiles are
+    unflagged before they are blitted, so a cell drawn mid-frame is either
+    in this frame's blit or queued again for the next one.
+
+    :meth:`draw_grid` repaints every cell from a grid of faction IDs. The
+    pixel value of each ID is kept in a palette array that only changes
+    where an ID changed color, and a fully dirty surface is scaled to the
+    window in a single blit.
+
+    :attr:`camera` decides which cells reach the window. By default it
+    shows the whole grid at ``cell_size`` pixels per cell on a canvas just
+    large enough; given a ``view_size`` it starts zoomed to fit that
+    canvas. Zoomed out past one cell per pixel, the window shows a level
+    of a pyramid of surfaces, each keeping the most common color of every
+    2 x 2 block of the level below. Levels are only built once the camera
+    first zooms out that far, and from then on refreshed from the tiles
+    that changed. Without NumPy they are sampled rather than voted.
+    """
+
+    tile = 16
+    repaint_tiles = 512  # more dirty tiles than this repaint the whole view in one blit
+
+    def __init__(self, screen, cell_size: int, grid_size: Tuple[int, int],
+                 view_size: Optional[Tuple[int, int]] = None):
+        self.screen = screen
+        self.cell_size = cell_size
+        self.width, self.height = grid_size
+        self.cells = pygame.Surface(grid_size)
+        if view_size is None:
+            self.camera = Camera(grid_size, (self.width * cell_size, self.height * cell_size), cell_size)
+        else:
+            self.camera = Camera(grid_size, view_size)
+            self.camera.fit()
+        self._camera_version = None  # camera.version last painted; anything else repaints the view
+        self.tiles_x = -(-self.width // self.tile)
+        self.tiles_y = -(-self.height // self.tile)
+        self.flags = bytearray(self.tiles_x * self.tiles_y)
+        self.dirty = []
+        self.levels = [self.cells]  # pyramid surfaces, level 0 first; built on first zoom out
+        self.lod_flags = bytearray(len(self.flags))  # tiles changed since the levels were refreshed
+        self.lod_dirty = []
+        self._colors: Dict[Optional[str], "pygame.Color"] = {}
+        self._pixels = None  # ID -> pixel value palette array for draw_grid
+        self._pixel_colors = []  # the colors it was built from
+        self._pixel_version = None
+        self.clear()
+
+    def _color(self, color: Optional[str]):
+        mapped = self._colors.get(color)
+        if mapped is None:
+            mapped = self._colors[color] = pygame.Color(color or "black")
+        return mapped
+
+    def _mark(self, tile: int) -> None:
+        if not self.flags[tile]:
+            self.flags[tile] = 1
+            self.dirty.append(tile)
+
+    def draw_cell(self, x: int, y: int, color: Optional[str]) -> None:
+        self.cells.set_at((x, y), self._color(color))
+        self._mark((y // self.tile) * self.tiles_x + x // self.tile)
+
+    def clear(self) -> None:
+        """Blank every cell and schedule a full repaint."""
+        self.cells.fill(self._color(None))
+        self._mark_all()
+
+    def _mark_all(self) -> None:
+        for tile in range(len(self.flags)):
+            self._mark(tile)
+
+    def palette_pixels(self, palette: Sequence[Optional[str]], version: Optional[int] = None):
+        """The pixel value of every ID's color on the cell surface, as a uint32 array.
+
+        Only IDs whose color changed since the last call are mapped again; a
+        ``version`` equal to the last one skips the comparison too.
+        """
+        if version is not None and version == self._pixel_version and len(palette) == len(self._pixel_colors):
+            return self._pixels
+        pixels, known = self._pixels, self._pixel_colors
+        if pixels is None or len(pixels) < len(palette):
+            grown = np.zeros(max(len(palette), 2 * len(known)), dtype=np.uint32)
+            if pixels is not None:
+                grown[:len(pixels)] = pixels
+            pixels = self._pixels = grown
+        if len(known) < len(palette):
+            known.extend([False] * (len(palette) - len(known)))  # never equal to a color
+        for fid, color in enumerate(palette):
+            if color != known[fid]:
+                known[fid] = color
+                pixels[fid] = self.cells.map_rgb(self._color(color))
+        self._pixel_version = version
+        return pixels
+
+    def draw_grid(self, owners, width: int, palette: Sequence[Optional[str]], version: Optional[int] = None) -> None:
+        """Repaint every cell from ``owners``, faction IDs row by row, and the color of each ID."""
+        if np is None:
+            self.clear()
+            for index, fid in enumerate(owners):
+                if fid:
+                    y, x = divmod(index, width)
+                    self.draw_cell(x, y, palette[fid])
+            return
+        ids = np.asarray(owners).reshape(-1, width)
+        # surfarray indexes pixels (x, y)
+        pygame.surfarray.blit_array(self.cells, self.palette_pixels(palette, version)[ids.T])
+        self._mark_all()
+
+    def show(self, frames) -> None:
+        """Paint everything published to the ``frames`` ring since the last call."""
+        for entry in frames.take():
+            if isinstance(entry, Snapshot):
+                self.draw_grid(entry.owners, entry.width, entry.palette, entry.version)
+                continue
+            self.draw_cells(entry.cells, entry.colors)
+
+    def draw_cells(self, cells: Sequence[int], colors: Sequence[Optional[str]]) -> None:
+        """Repaint many cells at once: flat indices and the color each now shows.
+
+        With NumPy the pixels are written through one ``pygame.surfarray``
+        view and their tiles marked together, which is what keeps a tick that
+        changed a large share of a big grid from stalling the frame.
+        """
+        width = self.width
+        if np is None:
+            for index, color in zip(cells, colors):
+                y, x = divmod(index, width)
+                self.draw_cell(x, y, color)
+            return
+        if not cells:
+            return
+        mapped = {color: self.cells.map_rgb(self._color(color)) for color in set(colors)}
+        ys, xs = np.divmod(np.asarray(cells, dtype=np.int64), width)
+        view = pygame.surfarray.pixels2d(self.cells)
+        view[xs, ys] = np.array([mapped[color] for color in colors], dtype=np.uint32)
+        del view  # unlock the surface
+        for tile in np.unique((ys // self.tile) * self.tiles_x + xs // self.tile).tolist():
+            self._mark(tile)
+
+    def _refresh_levels(self) -> None:
+        """Bring the pyramid levels up to date with the cells, building them on first use."""
+        full = len(self.levels) <= self.camera.max_level
+        while len(self.levels) <= self.camera.max_level:
+            size = level_size(self.width, self.height, len(self.levels))
+            self.levels.append(pygame.Surface(size, 0, self.cells))
+        dirty, self.lod_dirty = self.lod_dirty, []
+        for tile in dirty:
+            self.lod_flags[tile] = 0
+        if not (full or dirty):
+            return
+        if np is None:
+            for level in range(1, len(self.levels)):
+                below = self.levels[level - 1]
+                self.levels[level].blit(pygame.transform.scale(below, self.levels[level].get_size()), (0, 0))
+            return
+        if not full:
+            dirty_y, dirty_x = np.divmod(np.array(dirty), self.tiles_x)
+        views = [pygame.surfarray.pixels2d(surface) for surface in self.levels]
+        try:
+            for level in range(1, len(views)):
+                width, height = level_size(self.width, self.height, level)
+                if full:
+                    xs, ys = np.ix_(np.arange(width), np.arange(height))
+                else:
+                    # The block of this level right above each dirty tile; tiles
+                    # share a block once it shrinks to a single pixel
+                    size = max(1, self.tile >> level)
+                    left, top = (dirty_x * self.tile) >> level, (dirty_y * self.tile) >> level
+                    if size == 1:
+                        blocks = np.unique(top * width + left)
+                        top, left = np.divmod(blocks, width)
+                    span = np.arange(size)
+                    xs = np.minimum(left[:, None, None] + span[None, :, None], width - 1)
+                    ys = np.minimum(top[:, None, None] + span[None, None, :], height - 1)
+                downsample_mode(views[level - 1], views[level], xs, ys)
+        finally:
+            del views  # unlock the surfaces
+
+    def present(self, extra_rects: Iterable = ()) -> None:
+        """Push the dirty tiles, plus any ``extra_rects`` drawn by the caller, to the display.
+
+        Only tiles inside the camera's view are scaled to the window; after
+        the camera moved, or once more than :attr:`repaint_tiles` tiles are
+        dirty, the whole view is repainted in one blit instead.
+        """
+        if not pygame.display.get_init():
+            return
+        dirty, self.dirty = self.dirty, []
+        for tile in dirty:
+            self.flags[tile] = 0
+            if len(self.levels) > 1 and not self.lod_flags[tile]:
+                self.lod_flags[tile] = 1
+                self.lod_dirty.append(tile)
+        camera = self.camera
+        if camera.level:
+            self._refresh_levels()
+        source = self.levels[camera.level]
+        x, y, w, h = camera.source_rect()
+        scale, shift = camera.scale, camera.level
+        rects = list(extra_rects)
+        if camera.version != self._camera_version or len(dirty) > self.repaint_tiles:
+            self._camera_version = camera.version
+            view = pygame.Rect(0, 0, camera.view_width, camera.view_height)
+            if w * scale < view.w or h * scale < view.h:
+                self.screen.fill(self._color(None), view)
+            if w and h:
+                dest = pygame.Rect(0, 0, w * scale, h * scale)
+                self.screen.blit(pygame.transform.scale(source.subsurface(pygame.Rect(x, y, w, h)), dest.size), dest)
+            pygame.display.update(rects + [view])
+            return
+        visible = pygame.Rect(x, y, w, h)
+        size = self.tile
+        blitted = set()
+        for tile in dirty:
+            ty, tx = divmod(tile, self.tiles_x)
+            left, top = (tx * size) >> shift, (ty * size) >> shift
+            right, bottom = (((tx + 1) * size - 1) >> shift) + 1, (((ty + 1) * size - 1) >> shift) + 1
+            src = pygame.Rect(left, top, right - left, bottom - top).clip(visible)
+            if not (src.w and src.h) or (src.x, src.y) in blitted:
+                continue
+            blitted.add((src.x, src.y))
+            dest = pygame.Rect((src.x - x) * scale, (src.y - y) * scale, src.w * scale, src.h * scale)
+            self.screen.blit(pygame.transform.scale(source.subsurface(src), dest.size), dest)
+            rects.append(dest)
+        if rects:
+            pygame.display.update(rects)
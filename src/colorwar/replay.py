@@ -0,0 +1,337 @@
+"""Replay files: a compact, seekable record of every tick of a run.
+
+A ``.cwgreplay`` file is append-only. After a fixed header
+(:data:`FILE_HEADER`: magic, format version, compression, grid width and
+height, keyframe interval) it holds a sequence of chunks, each a
+:data:`CHUNK_HEADER` (kind, first tick, tick count, payload size) followed
+by its compressed payload:
+
+* a keyframe holds the whole grid after ``first_tick`` as uint16 faction IDs
+  and the living factions as UTF-8 JSON ``[[id, color, name], ...]``;
+* a delta chunk holds ``ticks`` consecutive ticks: the number of cells each
+  tick changed (uint32), the changed cells as gaps between sorted flat
+  indices (uint32), their new owners (uint16) and a JSON list of each tick's
+  faction events. Gaps and owners are stored as byte planes (every first
+  byte, then every second byte, ...): gaps are small, so the high planes are
+  nearly all zeros and compress to almost nothing.
+
+Chunks use the fast setting of the chosen compression so that recording
+keeps up with the simulation.
+
+Faction births and deaths are found by comparing the registry between
+ticks; merges are reported by the simulation. A file cut short by a crash
+stays readable up to its last complete chunk.
+
+:class:`ReplayReader` indexes the chunk headers once and seeks to any tick
+by loading the nearest keyframe at or before it and applying the deltas in
+between. Replays need NumPy, like binary saves.
+"""
+
+import argparse
+import json
+import struct
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised only without numpy
+    np = None
+
+from .engine import require_numpy
+from .savefile import COMPRESSIONS, SaveFormatError, _compress, _decompress
+
+MAGIC = b"CWGR"
+VERSION = 1
+FILE_HEADER = struct.Struct("<4sHBxIII")
+CHUNK_HEADER = struct.Struct("<BxxxIII")
+KEYFRAME, DELTAS = 1, 2
+REPLAY_EXTENSION = ".cwgreplay"
+
+Factions = Dict[int, Tuple[str, str]]
+
+
+def _planes(values: "np.ndarray") -> bytes:
+    return values.view(np.uint8).reshape(-1, values.itemsize).T.tobytes()
+
+
+def _unplanes(data: bytes, dtype: str, count: int, offset: int) -> "np.ndarray":
+    size = np.dtype(dtype).itemsize
+    planes = np.frombuffer(data, dtype=np.uint8, count=count * size, offset=offset)
+    return np.ascontiguousarray(planes.reshape(size, count).T).view(dtype).reshape(-1)
+
+
+def _living(registry) -> Factions:
+    """``{id: (color, name)}`` for the living factions of a registry."""
+    return {fid: (registry.colors[fid], registry.names[fid]) for fid in registry.alive_ids()}
+
+
+class ReplayWriter:
+    """Appends keyframes and batches of per-tick deltas to a replay file.
+
+    Deltas are buffered and written ``chunk_ticks`` ticks at a time, or
+    sooner when a keyframe or :meth:`close` flushes them.
+    """
+
+    def __init__(self, path: str, width: int, height: int, keyframe_every: int = 1000,
+                 chunk_ticks: int = 100, compression: str = "zlib"):
+        require_numpy()
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"unknown compression {compression!r}; expected one of {', '.join(COMPRESSIONS)}")
+        self.width, self.height = width, height
+        self.keyframe_every = keyframe_every
+        self.chunk_ticks = chunk_ticks
+        self.compression = compression
+        self._file = open(path, "wb")
+        self._file.write(FILE_HEADER.pack(
+            MAGIC, VERSION, COMPRESSIONS.index(compression), width, height, keyframe_every
+        ))
+        self._first = None
+        self._counts: List[int] = []
+        self._cells: List["np.ndarray"] = []
+        self._ids: List["np.ndarray"] = []
+        self._events: List[list] = []
+
+    def _chunk(self, kind: int, first_tick: int, ticks: int, payload: bytes) -> None:
+        payload = _compress(payload, self.compression, fast=True)
+        self._file.write(CHUNK_HEADER.pack(kind, first_tick, ticks, len(payload)))
+        self._file.write(payload)
+        self._file.flush()
+
+    def keyframe(self, tick: int, grid, factions: Factions) -> None:
+        """Write the whole ``grid`` (rows of IDs) and living ``factions`` as of ``tick``."""
+        self.flush()
+        table = json.dumps([[fid, color, name] for fid, (color, name) in sorted(factions.items())],
+                           ensure_ascii=False).encode("utf-8")
+        grid = np.asarray(grid, dtype="<u2")
+        self._chunk(KEYFRAME, tick, 0, struct.pack("<I", len(table)) + table + grid.tobytes())
+
+    def add(self, tick: int, cells, ids, events: list) -> None:
+        """Buffer one tick: sorted flat ``cells`` that changed, their new ``ids`` and its events."""
+        if self._first is None:
+            self._first = tick
+        self._counts.append(len(cells))
+        self._cells.append(np.diff(cells, prepend=0).astype("<u4"))
+        self._ids.append(np.asarray(ids, dtype="<u2"))
+        self._events.append(events)
+        if len(self._counts) >= self.chunk_ticks:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the buffered ticks as one delta chunk."""
+        if not self._counts:
+            return
+        payload = b"".join((
+            np.asarray(self._counts, dtype="<u4").tobytes(),
+            _planes(np.concatenate(self._cells)),
+            _planes(np.concatenate(self._ids)),
+            json.dumps(self._events, ensure_ascii=False).encode("utf-8"),
+        ))
+        self._chunk(DELTAS, self._first, len(self._counts), payload)
+        self._first = None
+        self._counts, self._cells, self._ids, self._events = [], [], [], []
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+
+
+class TickRecorder:
+    """Records a running simulation into a :class:`ReplayWriter`.
+
+    The simulation reports the cells it writes during a tick to
+    :meth:`touch` (flat index arrays) or :meth:`touch_cell` (one index),
+    or ``touch()`` when it replaces the whole grid, and calls :meth:`record`
+    at the end of the tick with the grid (a NumPy array or rows of IDs) and
+    registry. Only the touched cells are read, so recording costs
+    O(changed cells) rather than O(cells); a touched cell that ended the
+    tick with its old owner is recorded with that owner again. The whole
+    grid is read only for the keyframe every ``keyframe_every`` ticks.
+    :meth:`event` attaches an extra event, such as a merge, to the tick
+    being recorded.
+    """
+
+    def __init__(self, path: str, grid, registry, keyframe_every: int = 1000, **options):
+        current = np.asarray(grid, dtype=np.uint16)
+        self.height, self.width = current.shape
+        self.writer = ReplayWriter(path, self.width, self.height, keyframe_every, **options)
+        self.factions = _living(registry)
+        self.tick = 0
+        self.pending: List[dict] = []
+        self.cells: List[int] = []
+        self.touched: List["np.ndarray"] = []
+        self.everything = False
+        self.writer.keyframe(0, current, self.factions)
+
+    def event(self, kind: str, **data) -> None:
+        self.pending.append({"type": kind, **data})
+
+    def touch(self, cells=None) -> None:
+        """Note the flat indices ``cells`` as written this tick; without them, the whole grid."""
+        if cells is None:
+            self.everything = True
+        else:
+            self.touched.append(cells)
+
+    def touch_cell(self, cell: int) -> None:
+        self.cells.append(cell)
+
+    def _changes(self, grid):
+        """The sorted cells touched this tick and their owners in ``grid``."""
+        if self.everything:
+            ids = np.array(grid, dtype=np.uint16).reshape(-1)  # a copy: the writer buffers it
+            return np.arange(ids.size), ids
+        cells = np.unique(np.concatenate([np.asarray(self.cells, dtype=np.int64),
+                                          *(np.asarray(part, dtype=np.int64) for part in self.touched)]))
+        if isinstance(grid, np.ndarray):
+            return cells, grid.reshape(-1)[cells]
+        width = self.width
+        return cells, np.array([grid[cell // width][cell % width] for cell in cells.tolist()], dtype=np.uint16)
+
+    def record(self, grid, registry) -> None:
+        cells, ids = self._changes(grid)
+        self.cells, self.touched, self.everything = [], [], False
+
+        # An ID that now holds another color died and was reused
+        factions = _living(registry)
+        before = self.factions
+        events = [
+            {"type": "death", "id": fid}
+            for fid, (color, _) in before.items() if factions.get(fid, (None,))[0] != color
+        ] + [
+            {"type": "birth", "id": fid, "color": color, "name": name}
+            for fid, (color, name) in factions.items() if before.get(fid, (None,))[0] != color
+        ] + self.pending
+        self.factions = factions
+        self.pending = []
+
+        self.tick += 1
+        self.writer.add(self.tick, cells, ids, events)
+        if self.tick % self.writer.keyframe_every == 0:
+            self.writer.keyframe(self.tick, grid, factions)
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+class ReplayReader:
+    """Random access to the ticks of a replay file.
+
+    ``ticks`` is the last recorded tick; tick 0 is the grid the recording
+    started from. :meth:`seek` returns the grid and factions after any tick.
+    """
+
+    def __init__(self, path: str):
+        require_numpy()
+        self.path = path
+        self.keyframes: List[Tuple[int, int, int]] = []  # (tick, offset, size)
+        self.deltas: List[Tuple[int, int, int, int]] = []  # (first tick, ticks, offset, size)
+        with open(path, "rb") as f:
+            header = f.read(FILE_HEADER.size)
+            if len(header) < FILE_HEADER.size:
+                raise SaveFormatError(f"{path}: file too short for a replay header")
+            magic, version, compression, self.width, self.height, self.keyframe_every = FILE_HEADER.unpack(header)
+            if magic != MAGIC:
+                raise SaveFormatError(f"{path}: not a Color War replay")
+            if version != VERSION:
+                raise SaveFormatError(f"{path}: unsupported replay version {version}")
+            if compression >= len(COMPRESSIONS):
+                raise SaveFormatError(f"{path}: unknown compression id {compression}")
+            self.compression = COMPRESSIONS[compression]
+            size = f.seek(0, 2)
+            offset = FILE_HEADER.size
+            while offset + CHUNK_HEADER.size <= size:
+                f.seek(offset)
+                kind, first, ticks, length = CHUNK_HEADER.unpack(f.read(CHUNK_HEADER.size))
+                start = offset + CHUNK_HEADER.size
+                if start + length > size:
+                    break  # torn final chunk
+                if kind == KEYFRAME:
+                    self.keyframes.append((first, start, length))
+                elif kind == DELTAS:
+                    self.deltas.append((first, ticks, start, length))
+                else:
+                    raise SaveFormatError(f"{path}: unknown chunk kind {kind}")
+                offset = start + length
+        if not self.keyframes:
+            raise SaveFormatError(f"{path}: replay holds no keyframe")
+        self.ticks = max(self.keyframes[-1][0], max((first + n - 1 for first, n, _, _ in self.deltas), default=0))
+
+    def _payload(self, offset: int, size: int) -> bytes:
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            return _decompress(f.read(size), self.compression)
+
+    def _keyframe(self, offset: int, size: int):
+        data = self._payload(offset, size)
+        (table_size,) = struct.unpack_from("<I", data)
+        table = json.loads(data[4:4 + table_size].decode("utf-8"))
+        grid = np.frombuffer(data, dtype="<u2", offset=4 + table_size).reshape(self.height, self.width).copy()
+        return grid, {fid: (color, name) for fid, color, name in table}
+
+    def _ticks(self, offset: int, size: int, first: int, count: int):
+        """Yield ``(tick, cells, ids, events)`` for each tick of a delta chunk."""
+        data = self._payload(offset, size)
+        counts = np.frombuffer(data, dtype="<u4", count=count)
+        total = int(counts.sum())
+        start = counts.nbytes
+        gaps = _unplanes(data, "<u4", total, start)
+        ids = _unplanes(data, "<u2", total, start + gaps.nbytes)
+        events = json.loads(data[start + gaps.nbytes + ids.nbytes:].decode("utf-8"))
+        bounds = [0, *np.cumsum(counts, dtype=np.int64).tolist()]
+        for i in range(count):
+            lo, hi = bounds[i], bounds[i + 1]
+            yield first + i, np.cumsum(gaps[lo:hi], dtype=np.int64), ids[lo:hi], events[i]
+
+    def iter_ticks(self, start: int = 1, stop: Optional[int] = None):
+        """Yield ``(tick, cells, ids, events)`` for the recorded ticks in ``[start, stop]``."""
+        stop = self.ticks if stop is None else stop
+        for first, count, offset, size in self.deltas:
+            if first + count <= start or first > stop:
+                continue
+            for tick, cells, ids, events in self._ticks(offset, size, first, count):
+                if start <= tick <= stop:
+                    yield tick, cells, ids, events
+
+    def seek(self, tick: int):
+        """The grid (a fresh ``height`` x ``width`` array) and ``{id: (color, name)}`` after ``tick``."""
+        if not 0 <= tick <= self.ticks:
+            raise ValueError(f"tick {tick} outside the recorded range 0..{self.ticks}")
+        base, offset, size = max(k for k in self.keyframes if k[0] <= tick)
+        grid, factions = self._keyframe(offset, size)
+        flat = grid.reshape(-1)
+        for _, cells, ids, events in self.iter_ticks(base + 1, tick):
+            flat[cells] = ids
+            for event in events:
+                if event["type"] == "death":
+                    factions.pop(event["id"], None)
+                elif event["type"] == "birth":
+                    factions[event["id"]] = (event["color"], event["name"])
+        return grid, factions
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Inspect a Color War replay file")
+    parser.add_argument("path")
+    parser.add_argument("--tick", type=int, default=None,
+                        help="Show the largest factions after this tick (default: the last one)")
+    parser.add_argument("--top", type=int, default=10, metavar="N", help="How many factions to list")
+    args = parser.parse_args(argv)
+
+    reader = ReplayReader(args.path)
+    tick = reader.ticks if args.tick is None else args.tick
+    print(f"{args.path}: {reader.width}x{reader.height}, ticks 0..{reader.ticks}, "
+          f"{len(reader.keyframes)} keyframes, {reader.compression}")
+    grid, factions = reader.seek(tick)
+    counts = Counter(grid.reshape(-1).tolist())
+    counts.pop(0, None)
+    print(f"tick {tick}: {len(factions)} factions alive")
+    for fid, cells in counts.most_common(args.top):
+        color, name = factions.get(fid, ("?", f"faction {fid}"))
+        print(f"  {name:30} {color}  {cells} cells")
+
+
+if __name__ == "__main__":
+    main()
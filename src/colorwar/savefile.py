@@ -0,0 +1,332 @@
+"""Binary ``.cwgbin`` save files.
+
+The legacy ``.cwgsave`` text format spells every cell out as a hex string
+and drops claim ages and cooldowns. A binary save is laid out as:
+
+* a fixed little-endian header (:data:`HEADER`): magic, format version,
+  compression, grid width and height, the byte lengths of the two
+  sections that follow and the tick the game was saved on (version 1
+  saves end the header before the tick, and load as tick 0);
+* the faction table, UTF-8 JSON listing ``[id, color, record]`` for every
+  living faction (relations are left out and regenerated on load, as with
+  text saves);
+* padding to an 8-byte boundary, then the array payload: ``claim_age`` as
+  int32, the grid as uint16 faction IDs and ``overwrite_cooldown`` as uint8,
+  each ``height * width`` cells in row-major order. The payload is stored
+  raw or compressed as a whole with zlib or lzma.
+
+Loading reads the arrays with :func:`numpy.frombuffer`, so the binary format
+needs NumPy. Text saves stay loadable through :func:`import_text`.
+"""
+
+import json
+import lzma
+import os
+import re
+import struct
+import zlib
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised only without numpy
+    np = None
+
+from .engine import require_numpy
+from .registry import FactionRegistry
+
+MAGIC = b"CWGS"
+VERSION = 2
+HEADER = struct.Struct("<4sHBxIIIQQ")
+_HEADER_V1 = struct.Struct("<4sHBxIIIQ")
+COMPRESSIONS = ("none", "zlib", "lzma")
+BINARY_EXTENSION = ".cwgbin"
+TEXT_EXTENSION = ".cwgsave"
+
+
+class SaveFormatError(ValueError):
+    """Raised for files that are not valid Color War saves."""
+
+
+@dataclass
+class SaveData:
+    """Contents of a save file.
+
+    ``grid`` holds faction IDs from the saving registry and ``factions``
+    maps each of those IDs to ``(color, record)``.
+    """
+
+    width: int
+    height: int
+    factions: Dict[int, Tuple[str, dict]]
+    grid: "np.ndarray"
+    claim_age: "np.ndarray"
+    overwrite_cooldown: "np.ndarray"
+    tick: int = 0
+
+    def fitted(self, width: int, height: int, ids: Dict[int, int]):
+        """Return ``(grid, claim_age, overwrite_cooldown)`` cropped or zero-padded to ``width`` x ``height``.
+
+        Grid IDs are translated through ``ids`` (saved ID -> new ID); cells
+        owned by IDs missing from it come back empty.
+        """
+        lookup = np.zeros(max(ids, default=0) + 1, dtype=np.uint16)
+        for saved, fid in ids.items():
+            lookup[saved] = fid
+        h, w = min(height, self.height), min(width, self.width)
+        saved = self.grid[:h, :w]
+        grid = np.zeros((height, width), dtype=np.uint16)
+        grid[:h, :w] = np.where(saved < lookup.size, lookup[np.minimum(saved, lookup.size - 1)], 0)
+        claim_age = np.zeros((height, width), dtype=np.int32)
+        claim_age[:h, :w] = self.claim_age[:h, :w]
+        cooldown = np.zeros((height, width), dtype=np.uint8)
+        cooldown[:h, :w] = self.overwrite_cooldown[:h, :w]
+        return grid, claim_age, cooldown
+
+
+def is_binary(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def _record_dict(record) -> dict:
+    data = {key: value for key, value in record.items() if key != "relations"}
+    data["personality"] = dict(record["personality"])
+    return data
+
+
+def _compress(payload: bytes, compression: str, fast: bool = False) -> bytes:
+    if compression == "zlib":
+        return zlib.compress(payload, 1 if fast else 6)
+    if compression == "lzma":
+        return lzma.compress(payload, preset=1 if fast else 6)
+    return payload
+
+
+def _decompress(payload: bytes, compression: str) -> bytes:
+    try:
+        if compression == "zlib":
+            return zlib.decompress(payload)
+        if compression == "lzma":
+            return lzma.decompress(payload)
+    except (zlib.error, lzma.LZMAError) as exc:
+        raise SaveFormatError(f"corrupt {compression} payload: {exc}") from exc
+    return payload
+
+
+def write_binary(
+    path: str,
+    registry: FactionRegistry,
+    grid,
+    claim_age,
+    overwrite_cooldown,
+    compression: str = "zlib",
+    tick: int = 0,
+) -> None:
+    """Write a binary save; the arrays may be anything :func:`numpy.asarray` takes, e.g. lists of rows.
+
+    A :class:`~colorwar.chunks.ChunkedGrid` converts itself chunk by chunk.
+    """
+    write_encoded(path, encode_factions(registry), grid, claim_age, overwrite_cooldown, compression, tick)
+
+
+def encode_factions(registry: FactionRegistry) -> bytes:
+    """The faction table section of a binary save for the living factions of ``registry``."""
+    return json.dumps(
+        [[fid, registry.colors[fid], _record_dict(registry.record(fid))] for fid in registry.alive_ids()],
+        ensure_ascii=False,
+    ).encode("utf-8")
+
+
+def write_encoded(path: str, table: bytes, grid, claim_age, overwrite_cooldown, compression: str = "zlib",
+                  tick: int = 0) -> None:
+    """Write a binary save from a table made by :func:`encode_factions`, e.g. on another thread."""
+    require_numpy()
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"unknown compression {compression!r}; expected one of {', '.join(COMPRESSIONS)}")
+    grid = np.asarray(grid, dtype="<u2")
+    height, width = grid.shape
+    table += b" " * (-(HEADER.size + len(table)) % 8)
+    payload = b"".join((
+        np.asarray(claim_age, dtype="<i4").tobytes(),
+        grid.tobytes(),
+        np.asarray(overwrite_cooldown, dtype="u1").tobytes(),
+    ))
+    payload = _compress(payload, compression)
+    header = HEADER.pack(
+        MAGIC, VERSION, COMPRESSIONS.index(compression), width, height, len(table), len(payload), tick
+    )
+    with open(path, "wb") as f:
+        f.write(header)
+        f.write(table)
+        f.write(payload)
+
+
+def read_binary(path: str) -> SaveData:
+    require_numpy()
+    with open(path, "rb") as f:
+        header = f.read(_HEADER_V1.size)
+        if len(header) < _HEADER_V1.size:
+            raise SaveFormatError(f"{path}: file too short for a save header")
+        magic, version, compression, width, height, table_size, payload_size = _HEADER_V1.unpack(header)
+        if magic != MAGIC:
+            raise SaveFormatError(f"{path}: not a binary Color War save")
+        if version not in (1, VERSION):
+            raise SaveFormatError(f"{path}: unsupported save version {version}")
+        tick = 0
+        if version == VERSION:
+            header += f.read(HEADER.size - _HEADER_V1.size)
+            if len(header) < HEADER.size:
+                raise SaveFormatError(f"{path}: file too short for a save header")
+            tick = HEADER.unpack(header)[-1]
+        if compression >= len(COMPRESSIONS):
+            raise SaveFormatError(f"{path}: unknown compression id {compression}")
+        # Only the two sections the header declares are read, once the file is known to hold them
+        if os.fstat(f.fileno()).st_size < len(header) + table_size + payload_size:
+            raise SaveFormatError(f"{path}: file truncated")
+        table = f.read(table_size)
+        payload = f.read(payload_size)
+
+    try:
+        factions = {}
+        for fid, color, record in json.loads(table.decode("utf-8")):
+            if "capital" in record:
+                record["capital"] = tuple(record["capital"])
+            factions[fid] = (color, record)
+    except (UnicodeDecodeError, ValueError, TypeError):
+        raise SaveFormatError(f"{path}: bad faction table") from None
+
+    payload = _decompress(payload, COMPRESSIONS[compression])
+    cells = width * height
+    if len(payload) != cells * 7:
+        raise SaveFormatError(f"{path}: payload holds {len(payload)} bytes, expected {cells * 7}")
+    shape = (height, width)
+    return SaveData(
+        width=width,
+        height=height,
+        factions=factions,
+        claim_age=np.frombuffer(payload, dtype="<i4", count=cells).reshape(shape),
+        grid=np.frombuffer(payload, dtype="<u2", count=cells, offset=cells * 4).reshape(shape),
+        overwrite_cooldown=np.frombuffer(payload, dtype="u1", count=cells, offset=cells * 6).reshape(shape),
+        tick=tick,
+    )
+
+
+_CAPITAL = re.compile(r"[(\[]\s*(-?\d+)\s*,\s*(-?\d+)\s*[)\]]")
+_COLOR = re.compile(r"#[0-9a-fA-F]{6}")
+
+
+def parse_capital(text: str) -> Tuple[int, int]:
+    """Parse a saved capital such as ``(12, 34)``; raises ``ValueError`` for anything else."""
+    match = _CAPITAL.fullmatch(text.strip())
+    if match is None:
+        raise ValueError(f"bad capital {text!r}")
+    return int(match.group(1)), int(match.group(2))
+
+
+class _Cells(dict):
+    """Maps cell strings to shared color objects, validating each new color once."""
+
+    def __missing__(self, cell: str) -> str:
+        if _COLOR.fullmatch(cell) is None:
+            raise ValueError(f"bad cell {cell!r}")
+        self[cell] = cell
+        return cell
+
+
+def _faction(parts: List[str]) -> Tuple[str, dict]:
+    color = parts[0]
+    if _COLOR.fullmatch(color) is None:
+        raise ValueError(f"bad faction color {color!r}")
+    return color, {
+        "name": parts[1],
+        "behavior": parts[2],
+        "tier": int(parts[3]),
+        "symbol": parts[4],
+        "dna": parts[5],
+        "capital": parse_capital(parts[6]),
+        "personality": {
+            "aggression": float(parts[7]),
+            "defense": float(parts[8]),
+            "expansionism": float(parts[9]),
+            "risk": float(parts[10])
+        },
+        "age": 0,
+        "merges": 0,
+        "offspring": 0,
+        "memory": [],
+        "lore": {
+            "motto": "Unknown",
+            "origin": "Unknown",
+            "victory_quote": "Victory is ours."
+        },
+        "relations": {}
+    }
+
+
+def iter_text(lines: Iterable[str], width: int, path: str = "<save>") -> Iterator[Tuple[str, int, object]]:
+    """Parse a ``.cwgsave`` text save one line at a time.
+
+    Yields ``("grid", lineno, (cells, saved_width))`` for each grid row,
+    with ``cells`` cropped or padded to ``width`` (``None`` for empty cells)
+    and ``saved_width`` the number of cells stored on the line, and
+    ``("faction", lineno, (color, record))`` for each faction. As in the
+    original loader, faction lines with fewer than 11 ``|``-separated fields
+    are skipped, here with a warning, and fields past the eleventh are
+    ignored; other malformed lines raise :class:`SaveFormatError` naming the
+    file and line.
+    """
+    section = None
+    cells = _Cells({"None": None})
+    for lineno, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        if line == "[GRID]":
+            section = "grid"
+            continue
+        elif line == "[FACTIONS]":
+            section = "factions"
+            continue
+        try:
+            if section == "grid":
+                # The maxsplit leaves anything past ``width`` unsplit in one trailing item.
+                row = list(map(cells.__getitem__, line.split(",", width)[:width]))
+                row.extend([None] * (width - len(row)))
+                yield "grid", lineno, (row, line.count(",") + 1)
+            elif section == "factions":
+                parts = line.split("|")
+                if len(parts) < 11:
+                    print(f"⚠️ {path}:{lineno}: skipping faction line with {len(parts)} fields, expected 11")
+                    continue
+                yield "faction", lineno, _faction(parts[:11])
+            else:
+                raise ValueError("data before the [GRID] header")
+        except ValueError as exc:
+            raise SaveFormatError(f"{path}:{lineno}: {exc}") from None
+
+
+def import_text(path: str, width: int, height: int):
+    """Read a legacy ``.cwgsave`` text save into a grid of the given size.
+
+    The file is streamed: grid rows are written straight into a
+    preallocated ``height`` x ``width`` list of colors (``None`` for empty),
+    cropping or padding as they arrive. Returns the grid, a
+    ``{color: record}`` dict and the ``(width, height)`` stored in the file.
+    """
+    grid = [[None] * width for _ in range(height)]
+    factions = {}
+    rows = saved_width = 0
+    with open(path, "r", encoding="utf-8") as f:
+        for kind, _, value in iter_text(f, width, path):
+            if kind == "grid":
+                row, cells = value
+                if rows < height:
+                    grid[rows] = row
+                rows += 1
+                saved_width = max(saved_width, cells)
+            else:
+                color, record = value
+                factions[color] = record
+    return grid, factions, (saved_width, rows)
@@ -0,0 +1,207 @@
+"""Terrain under the ``AISim`` grid.
+
+Every cell has a biome, and named layers such as the experimental zones
+mark further cells. A biome and every layer covering a cell each scale
+the spread and attack odds of factions acting from it. :class:`Terrain`
+multiplies those factors into one raster the size of the grid and only
+rebuilds it when the terrain changes, so a tick reads one float per cell
+instead of probing sets. A map with no effective terrain has no raster at
+all and the step skips the multiplication.
+
+Biomes come in contiguous regions: :meth:`Terrain.fill_voronoi` assigns
+each cell the biome of the nearest of a few random sites.
+
+Given a ``directory``, as with memmap storage, the biome codes, layer masks
+and raster are ``.npy`` files mapped from it instead of in-memory buffers.
+They are written and read a few rows at a time and their pages handed back
+after each, so terrain adds no per-cell memory to a run larger than RAM.
+"""
+
+import os
+from typing import Iterable, List, Mapping, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised only without numpy
+    np = None
+
+from .mapped import drop_pages
+
+# Biome codes are indices into BIOMES; factors scale spread and attack chances
+BIOMES = ("plain", "forest", "lava", "oasis")
+BIOME_FACTORS = {"plain": 1.0, "forest": 0.5, "lava": 0.1, "oasis": 2.0}
+# Share of Voronoi regions given to each biome
+REGION_WEIGHTS = {"plain": 6, "forest": 2, "lava": 1, "oasis": 1}
+# Experimental zones are marked on the terrain but do not change the odds yet
+ZONE_FACTOR = 1.0
+
+_ROWS_PER_CHUNK = 64
+_VORONOI_CELLS = 1 << 18  # cell-site distances computed at once while filling regions
+
+
+class Terrain:
+    """Biome codes and marked layers for a ``width`` x ``height`` grid, row-major.
+
+    With a ``directory`` (needs NumPy) they are flat memmaps of files in it.
+    """
+
+    def __init__(self, width: int, height: int, directory: Optional[str] = None):
+        self.width = width
+        self.height = height
+        self.directory = directory
+        self.biome = self._new("biome", "u1")
+        self.layers = {"experimental": (self._new("experimental", "u1"), ZONE_FACTOR)}
+        self._list = self._array = None
+        self._built = False
+
+    def _new(self, name: str, dtype: str):
+        """A zeroed flat array of one value per cell: a bytearray, or a memmap of ``terrain-<name>.npy``."""
+        if self.directory is None:
+            return bytearray(self.width * self.height)
+        path = os.path.join(self.directory, f"terrain-{name}.npy")
+        if os.path.exists(path):
+            os.remove(path)  # arrays handed out earlier keep their own mapping
+        return np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=(self.width * self.height,))
+
+    def _spans(self):
+        """``(start, stop)`` flat index ranges of :data:`_ROWS_PER_CHUNK` rows each."""
+        step = _ROWS_PER_CHUNK * self.width
+        cells = self.width * self.height
+        return [(start, min(start + step, cells)) for start in range(0, cells, step)]
+
+    def _release(self, start: int, stop: int, *arrays) -> None:
+        if self.directory is not None:
+            for array in arrays:
+                drop_pages(array, start, stop)
+
+    def changed(self) -> None:
+        """Drop the cached raster; call after writing :attr:`biome` or a layer mask directly."""
+        self._list = self._array = None
+        self._built = False
+
+    def paint(self, points: Iterable[Tuple[int, int]], biome: str) -> None:
+        """Set the biome of each ``(x, y)`` in ``points``; points off the grid are ignored."""
+        code = BIOMES.index(biome)
+        for x, y in points:
+            if 0 <= x < self.width and 0 <= y < self.height:
+                self.biome[y * self.width + x] = code
+        self.changed()
+
+    def add_layer(self, name: str, factor: float) -> None:
+        """Add an empty layer whose cells scale the odds by ``factor``."""
+        self.layers[name] = (self._new(name, "u1"), factor)
+        self.changed()
+
+    def mark(self, name: str, points: Iterable[Tuple[int, int]]) -> None:
+        """Add each ``(x, y)`` in ``points`` to layer ``name``."""
+        mask = self.layers[name][0]
+        for x, y in points:
+            if 0 <= x < self.width and 0 <= y < self.height:
+                mask[y * self.width + x] = 1
+        self.changed()
+
+    def fill_voronoi(self, rng, regions: int, weights: Mapping[str, float] = REGION_WEIGHTS) -> None:
+        """Cover the map with ``regions`` contiguous biome regions.
+
+        Sites and their biomes are drawn from ``rng`` (a ``random.Random``);
+        each cell takes the biome of its nearest site, ties going to the
+        site drawn first, so both code paths paint the same map.
+        """
+        names = list(weights)
+        sites = [
+            (rng.randrange(self.width), rng.randrange(self.height),
+             BIOMES.index(rng.choices(names, list(weights.values()))[0]))
+            for _ in range(regions)
+        ]
+        if not sites:
+            return
+        if np is not None:
+            self._voronoi_array(sites)
+        else:
+            self._voronoi_lists(sites)
+        self.changed()
+
+    def _voronoi_array(self, sites) -> None:
+        sx, sy, codes = (np.array(values, dtype=np.int64) for values in zip(*sites))
+        codes = codes.astype(np.uint8)
+        out = _flat(self.biome).reshape(self.height, self.width)
+        xs = np.arange(self.width)
+        dx2 = (xs[:, None] - sx[None, :]) ** 2
+        rows = max(1, min(_ROWS_PER_CHUNK, _VORONOI_CELLS // (self.width * len(sites))))
+        for y0 in range(0, self.height, rows):
+            ys = np.arange(y0, min(y0 + rows, self.height))
+            dy2 = (ys[:, None] - sy[None, :]) ** 2
+            nearest = np.argmin(dy2[:, None, :] + dx2[None, :, :], axis=2)
+            out[ys[0]:ys[-1] + 1] = codes[nearest]
+            self._release(y0 * self.width, (ys[-1] + 1) * self.width, self.biome)
+
+    def _voronoi_lists(self, sites) -> None:
+        biome = self.biome
+        for y in range(self.height):
+            row = y * self.width
+            for x in range(self.width):
+                best = None
+                for sx, sy, code in sites:
+                    d = (x - sx) ** 2 + (y - sy) ** 2
+                    if best is None or d < best:
+                        best, biome[row + x] = d, code
+
+    def _build(self) -> None:
+        if self._built:
+            return
+        self._built = True
+        factors = [BIOME_FACTORS[name] for name in BIOMES]
+        if np is not None:
+            self._build_array(factors)
+            return
+        layers = [(mask, factor) for mask, factor in self.layers.values() if factor != 1.0 and any(mask)]
+        if not layers and all(factors[code] == 1.0 for code in set(self.biome)):
+            return
+        raster = [factors[code] for code in self.biome]
+        for mask, factor in layers:
+            for i, flag in enumerate(mask):
+                if flag:
+                    raster[i] *= factor
+        self._list = raster
+
+    def _build_array(self, factors: List[float]) -> None:
+        # A few rows at a time, so mapped terrain never has more than that resident
+        biome = _flat(self.biome)
+        used = np.zeros(256, dtype=bool)
+        for start, stop in self._spans():
+            used[biome[start:stop]] = True
+            self._release(start, stop, self.biome)
+        layers = []
+        for mask, factor in self.layers.values():
+            if factor != 1.0 and any(_flat(mask)[start:stop].any() for start, stop in self._spans()):
+                layers.append((_flat(mask), factor))
+            self._release(0, len(mask), mask)
+        if not layers and all(factors[code] == 1.0 for code in np.flatnonzero(used)):
+            return
+        lut = np.array(factors, dtype=np.float32)
+        raster = (np.empty(self.width * self.height, dtype=np.float32) if self.directory is None
+                  else self._new("multiplier", "f4"))
+        for start, stop in self._spans():
+            out = raster[start:stop]
+            out[:] = lut[biome[start:stop]]
+            for mask, factor in layers:
+                out[mask[start:stop].astype(bool)] *= factor
+            self._release(start, stop, raster, self.biome, *(mask for mask, _ in layers))
+        self._array = raster
+
+    def multiplier_array(self):
+        """The flat per-cell multiplier as a float32 array, or None where every cell is 1."""
+        self._build()
+        return self._array
+
+    def multiplier_list(self) -> Optional[List[float]]:
+        """The flat per-cell multiplier as a list, or None where every cell is 1."""
+        self._build()
+        if self._list is None and self._array is not None:
+            self._list = self._array.tolist()
+        return self._list
+
+
+def _flat(buffer):
+    """A uint8 array over a bytearray, or the memmap itself."""
+    return buffer if isinstance(buffer, np.ndarray) else np.frombuffer(buffer, dtype=np.uint8)
@@ -0,0 +1,292 @@
+"""Per-faction territory counts maintained incrementally.
+
+Rescanning the grid to find out how many cells each faction holds costs
+O(cells). :class:`TerritoryCounter` is updated by every grid write instead, so
+reading faction power costs O(factions). ``counts[0]`` tracks empty cells.
+:class:`CellIndex` goes one step further for the list engine and keeps the
+cells themselves, so events can pick a faction's cells without searching.
+"""
+
+import random
+from array import array
+from math import exp, lgamma, log, log1p
+from typing import Dict, List, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised only without numpy
+    np = None
+
+from .chunks import ChunkedGrid
+from .registry import EMPTY
+
+
+def binomial(rng, n: int, p: float) -> int:
+    """A binomial ``(n, p)`` draw from one ``rng.random()``, by inverse CDF searched outward from the mode.
+
+    Costs O(|draw - mode|) steps, not O(n). Used instead of
+    ``random.binomialvariate`` (Python 3.12+) so a seed draws the same
+    counts on every Python version.
+    """
+    if p <= 0 or n <= 0:
+        return 0
+    if p >= 1:
+        return n
+    mode = min(n, int((n + 1) * p))
+    odds = p / (1 - p)
+    down = up = exp(lgamma(n + 1) - lgamma(mode + 1) - lgamma(n - mode + 1)
+                    + mode * log(p) + (n - mode) * log1p(-p))
+    u = rng.random() - down
+    lo = hi = mode
+    while u > 0 and (lo > 0 or hi < n):
+        if hi < n:
+            up *= (n - hi) / (hi + 1) * odds
+            hi += 1
+            u -= up
+            if u <= 0:
+                return hi
+        if lo > 0:
+            down *= lo / ((n - lo + 1) * odds)
+            lo -= 1
+            u -= down
+            if u <= 0:
+                return lo
+    # Only rounding leaves u above zero once every outcome was visited
+    return mode
+
+
+def distinct(rng, draws: int, size: int, limit: Optional[int] = None) -> int:
+    """How many distinct values ``draws`` uniform draws from ``size`` values give, counting up to ``limit``."""
+    found = 0
+    for _ in range(draws):
+        # A draw is new with probability (size - found) / size
+        if rng.random() * size < size - found:
+            found += 1
+            if found == limit:
+                break
+    return found
+
+
+class TerritoryCounter:
+    """Number of cells held by each faction ID."""
+
+    def __init__(self):
+        self.counts: List[int] = [0]
+
+    def reset(self, counts: Sequence[int]) -> None:
+        """Replace the counts with a full recount, indexed by ID."""
+        self.counts = [int(n) for n in counts] or [0]
+
+    def _grow(self, fid: int) -> None:
+        self.counts.extend([0] * (fid + 1 - len(self.counts)))
+
+    def move(self, old: int, new: int) -> None:
+        """Record one cell changing owner from ``old`` to ``new``."""
+        if new >= len(self.counts):
+            self._grow(new)
+        self.counts[old] -= 1
+        self.counts[new] += 1
+
+    def apply(self, old_ids, new_ids) -> None:
+        """Record a batch of cells changing owner, given parallel ID arrays."""
+        if np is not None and isinstance(old_ids, np.ndarray):
+            if old_ids.size == 0:
+                return
+            size = int(max(old_ids.max(), new_ids.max())) + 1
+            delta = np.bincount(new_ids, minlength=size) - np.bincount(old_ids, minlength=size)
+            if size > len(self.counts):
+                self._grow(size - 1)
+            for fid in np.flatnonzero(delta).tolist():
+                self.counts[fid] += int(delta[fid])
+            return
+        for old, new in zip(old_ids, new_ids):
+            self.move(old, new)
+
+    def __getitem__(self, fid: int) -> int:
+        return self.counts[fid] if fid < len(self.counts) else 0
+
+    def power(self, alive: Sequence[int]) -> Dict[int, int]:
+        """Return {id: cells} for every faction flagged in ``alive`` that holds territory."""
+        return {
+            fid: count
+            for fid, count in enumerate(self.counts[:len(alive)])
+            if count and fid != EMPTY and alive[fid]
+        }
+
+    def verify(self, expected: Sequence[int]) -> None:
+        """Raise ``AssertionError`` if the counts disagree with a full recount."""
+        size = max(len(self.counts), len(expected))
+        mismatched = [
+            (fid, self[fid], int(expected[fid]) if fid < len(expected) else 0)
+            for fid in range(size)
+            if self[fid] != (int(expected[fid]) if fid < len(expected) else 0)
+        ]
+        if mismatched:
+            details = ", ".join(f"id {fid}: counted {got}, actual {want}" for fid, got, want in mismatched[:10])
+            raise AssertionError(f"territory counts drifted from the grid ({details})")
+
+
+class _ChunkSlots:
+    """Cell slots kept per ``chunk`` x ``chunk`` chunk of the grid, allocated only for chunks with claimed cells."""
+
+    def __init__(self, width: int, chunk: int):
+        self.width = width
+        self.shift = chunk.bit_length() - 1
+        self.mask = chunk - 1
+        self.size = chunk * chunk
+        self.chunks_x = -(-width // chunk)
+        self.arrays: Dict[int, array] = {}
+        self.claimed: Dict[int, int] = {}  # claimed cells per allocated chunk
+
+    def _locate(self, cell: int):
+        y, x = divmod(cell, self.width)
+        return (y >> self.shift) * self.chunks_x + (x >> self.shift), ((y & self.mask) << self.shift) | (x & self.mask)
+
+    def __getitem__(self, cell: int) -> int:
+        i, offset = self._locate(cell)
+        slots = self.arrays.get(i)
+        return -1 if slots is None else slots[offset]
+
+    def __setitem__(self, cell: int, slot: int) -> None:
+        i, offset = self._locate(cell)
+        slots = self.arrays.get(i)
+        if slots is None:
+            if slot < 0:
+                return
+            slots = self.arrays[i] = array("i", [-1]) * self.size
+            self.claimed[i] = 0
+        if slot < 0 <= slots[offset]:
+            self.claimed[i] -= 1
+            if not self.claimed[i]:
+                del self.arrays[i], self.claimed[i]
+                return
+        elif slots[offset] < 0 <= slot:
+            self.claimed[i] += 1
+        slots[offset] = slot
+
+
+class CellIndex:
+    """The flat cell indices held by each faction ID, as indexable sets.
+
+    Every ID keeps a list of its cells and every claimed cell remembers its
+    slot in that list, so moving a cell between IDs is O(1) (the last entry
+    fills the gap) and drawing ``k`` distinct cells of a faction costs O(k)
+    however little of the map it holds. Empty cells are not listed: they
+    are the cells without a slot (-1), and are drawn by rejection.
+
+    Slots are kept in 32-bit :class:`array.array` objects: one of four bytes
+    per cell for rows of lists, or for a :class:`~colorwar.chunks.ChunkedGrid`
+    one per chunk that holds claimed cells, so a mostly empty map costs memory in
+    proportion to its claimed area. With ``arrays`` the member lists are
+    arrays too, rather than a list slot and an int object per cell. Draws
+    come from ``rng`` (default: the :mod:`random` module) and depend on
+    neither.
+    """
+
+    def __init__(self, rng=None, arrays: bool = False):
+        self.rng = rng if rng is not None else random
+        self._members = (lambda: array("i")) if arrays else list
+        self.members: List[List[int]] = [self._members()]
+        self.slots = array("i")
+        self.cells = 0
+        self.claimed = 0
+
+    def reset(self, grid: Sequence[Sequence[int]]) -> None:
+        """Index a grid of rows of IDs from scratch; uniformly empty chunks of a chunked grid are skipped."""
+        self.members = [self._members()]
+        if isinstance(grid, ChunkedGrid):
+            self.cells = grid.width * grid.height
+            self.slots = _ChunkSlots(grid.width, grid.chunk)
+            found = []
+            for i, x0, y0, w, h in grid.blocks():
+                if grid.cells[i] is None and grid.values[i] == EMPTY:
+                    continue
+                for y in range(y0, y0 + h):
+                    row = grid[y]
+                    found.extend((y * grid.width + x, row[x]) for x in range(x0, x0 + w) if row[x] != EMPTY)
+            # Row-major, as for rows of lists, so both storages draw the same cells
+            found.sort()
+        else:
+            self.cells = sum(len(row) for row in grid)
+            self.slots = array("i", [-1]) * self.cells
+            found = ((cell, fid) for cell, fid in enumerate(fid for row in grid for fid in row) if fid != EMPTY)
+        members, slots = self.members, self.slots
+        self.claimed = 0
+        for cell, fid in found:
+            if fid >= len(members):
+                members.extend(self._members() for _ in range(fid + 1 - len(members)))
+            slots[cell] = len(members[fid])
+            members[fid].append(cell)
+            self.claimed += 1
+
+    def move(self, cell: int, old: int, new: int) -> None:
+        """Record ``cell`` changing owner from ``old`` to ``new``."""
+        if old != EMPTY:
+            cells = self.members[old]
+            last = cells.pop()
+            if last != cell:
+                slot = self.slots[cell]
+                cells[slot] = last
+                self.slots[last] = slot
+            self.claimed -= 1
+        if new == EMPTY:
+            self.slots[cell] = -1
+            return
+        if new >= len(self.members):
+            self.members.extend(self._members() for _ in range(new + 1 - len(self.members)))
+        dest = self.members[new]
+        self.slots[cell] = len(dest)
+        dest.append(cell)
+        self.claimed += 1
+
+    def __len__(self) -> int:
+        return self.cells
+
+    def count(self, fid: int) -> int:
+        if fid == EMPTY:
+            return self.cells - self.claimed
+        return len(self.members[fid]) if fid < len(self.members) else 0
+
+    def choice(self, fid: int) -> int:
+        """One uniformly random cell held by ``fid``; raises ``IndexError`` if it holds none."""
+        if fid == EMPTY:
+            if not self.count(EMPTY):
+                raise IndexError("no empty cells")
+            return self.sample(EMPTY, 1)[0]
+        return self.rng.choice(self.members[fid])
+
+    def sample(self, fid: int, k: int) -> List[int]:
+        """Up to ``k`` distinct cells held by ``fid``, drawn uniformly."""
+        if fid == EMPTY:
+            return self._sample_empty(min(k, self.count(EMPTY)))
+        cells = self.members[fid] if fid < len(self.members) else []
+        return self.rng.sample(cells, min(k, len(cells)))
+
+    def _sample_empty(self, k: int) -> List[int]:
+        if k <= 0:
+            return []
+        slots = self.slots
+        if 2 * k > self.count(EMPTY):
+            # Too few empty cells left for rejection to find them quickly
+            return self.rng.sample([cell for cell in range(self.cells) if slots[cell] < 0], k)
+        found = {}
+        randrange = self.rng.randrange
+        while len(found) < k:
+            cell = randrange(self.cells)
+            if slots[cell] < 0:
+                found[cell] = None
+        return list(found)
+
+    def probe(self, fid: int, probes: int, limit: Optional[int] = None) -> List[int]:
+        """The cells of ``fid`` that ``probes`` uniform probes of the whole grid would find.
+
+        Stands in for rejection sampling with the same odds: the probes that
+        land on ``fid`` are one binomial draw with probability
+        ``count / cells`` each, and since a cell probed twice counts once,
+        the cells found are as many as those probes hit distinct cells,
+        capped at ``limit``. That many cells are then drawn directly. Costs
+        O(probes that land on ``fid``).
+        """
+        count = self.count(fid)
+        hits = binomial(self.rng, probes, count / self.cells if self.cells else 0)
+        return self.sample(fid, distinct(self.rng, hits, count, limit))
@@ -0,0 +1,146 @@
+"""Camera and level-of-detail pyramid for grids larger than the window.
+
+A :class:`Camera` maps part of the grid onto the canvas. Zoomed in, every
+cell covers ``scale`` x ``scale`` pixels. Zoomed out past one cell per
+pixel, the camera picks a pyramid ``level`` instead: level ``k`` has one
+pixel per 2**k x 2**k block of cells. Scales and levels are whole numbers,
+so every cell, or block of cells, lands on whole pixels and a changed
+region can be repainted without seams.
+
+Each level is derived from the one below it by :func:`downsample_mode`,
+which keeps the most common pixel of every 2 x 2 block. It takes index
+arrays rather than a whole level, so the renderer refreshes only the
+blocks above cells that changed.
+"""
+
+from typing import Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised only without numpy
+    np = None
+
+MAX_SCALE = 32
+
+
+def level_size(width: int, height: int, level: int) -> Tuple[int, int]:
+    """Size of pyramid ``level`` over a ``width`` x ``height`` grid; partial blocks count."""
+    span = 1 << level
+    return -(-width // span), -(-height // span)
+
+
+def levels_to_fit(width: int, height: int, view_width: int, view_height: int) -> int:
+    """The lowest level at which the whole grid fits in the view, one pixel per block."""
+    level = 0
+    while True:
+        w, h = level_size(width, height, level)
+        if (w <= view_width and h <= view_height) or (w == 1 and h == 1):
+            return level
+        level += 1
+
+
+def downsample_mode(src, dst, xs, ys) -> None:
+    """Set ``dst[xs, ys]`` to the most common value of the 2 x 2 block of ``src`` under each.
+
+    Both arrays are indexed ``[x, y]`` like ``pygame.surfarray``; ``dst``
+    is the next level up from ``src``. ``xs`` and ``ys`` are index arrays
+    that broadcast together, e.g. from ``np.ix_``, so many scattered blocks
+    refresh in one call. Blocks on an odd edge repeat their last row or
+    column. Ties go to the top-left cell, then top-right, then bottom-left.
+    """
+    width, height = src.shape
+    left, top = 2 * xs, 2 * ys
+    right, bottom = np.minimum(left + 1, width - 1), np.minimum(top + 1, height - 1)
+    a, b, c, d = src[left, top], src[right, top], src[left, bottom], src[right, bottom]
+    dst[xs, ys] = np.where(
+        (a == b) | (a == c) | (a == d), a,
+        np.where((b == c) | (b == d), b, np.where(c == d, c, a)),
+    )
+
+
+class Camera:
+    """Which part of a ``world`` grid is shown on a ``view`` of pixels, and how large.
+
+    :attr:`x` and :attr:`y` are the grid cell at the top-left corner of
+    the view. :attr:`version` changes whenever the camera moves, so a
+    renderer knows to repaint the whole view.
+    """
+
+    def __init__(self, world_size: Tuple[int, int], view_size: Tuple[int, int], scale: int = 1, level: int = 0):
+        self.world_width, self.world_height = world_size
+        self.view_width, self.view_height = view_size
+        self.max_level = levels_to_fit(self.world_width, self.world_height, self.view_width, self.view_height)
+        self.scale = max(1, min(scale, MAX_SCALE))
+        self.level = min(level, self.max_level) if self.scale == 1 else 0
+        self.x = self.y = 0.0
+        self.version = 0
+
+    @property
+    def span(self) -> int:
+        """Cells per pyramid pixel along each axis at the current level."""
+        return 1 << self.level
+
+    def fit(self) -> None:
+        """Show the whole grid as large as it fits, from the top-left corner."""
+        scale = min(self.view_width // self.world_width, self.view_height // self.world_height, MAX_SCALE)
+        self.scale, self.level = (scale, 0) if scale >= 1 else (1, self.max_level)
+        self.x = self.y = 0.0
+        self._moved()
+
+    def source_rect(self) -> Tuple[int, int, int, int]:
+        """The visible ``(x, y, w, h)`` on the current pyramid level, clipped to the grid."""
+        level_w, level_h = level_size(self.world_width, self.world_height, self.level)
+        x, y = int(self.x) >> self.level, int(self.y) >> self.level
+        w = min(self.view_width // self.scale, level_w - x)
+        h = min(self.view_height // self.scale, level_h - y)
+        return x, y, max(0, w), max(0, h)
+
+    def cell_at(self, px: int, py: int) -> Tuple[int, int]:
+        """The grid cell under view pixel ``(px, py)``; may lie off the grid."""
+        x, y, _, _ = self.source_rect()
+        return ((x + px // self.scale) << self.level, (y + py // self.scale) << self.level)
+
+    def zoom(self, steps: int, anchor: Optional[Tuple[int, int]] = None) -> None:
+        """Zoom in ``steps`` times (out if negative), keeping the cell under view pixel ``anchor`` in place.
+
+        Each step doubles or halves the scale, moving through the pyramid
+        levels below one cell per pixel. ``anchor`` defaults to the centre
+        of the view.
+        """
+        px, py = anchor if anchor is not None else (self.view_width // 2, self.view_height // 2)
+        cells_x = int(self.x) + px * self.span / self.scale
+        cells_y = int(self.y) + py * self.span / self.scale
+        scale, level = self.scale, self.level
+        for _ in range(abs(steps)):
+            if steps > 0:
+                if level:
+                    level -= 1
+                else:
+                    scale = min(scale * 2, MAX_SCALE)
+            elif scale > 1:
+                scale //= 2
+            else:
+                level = min(level + 1, self.max_level)
+        if (scale, level) == (self.scale, self.level):
+            return
+        self.scale, self.level = scale, level
+        self.x = float(round(cells_x - px * self.span / self.scale))
+        self.y = float(round(cells_y - py * self.span / self.scale))
+        self._moved()
+
+    def pan(self, dx: float, dy: float) -> None:
+        """Move the view ``dx``, ``dy`` pixels right and down over the grid."""
+        self.x += dx * self.span / self.scale
+        self.y += dy * self.span / self.scale
+        self._moved()
+
+    def _moved(self) -> None:
+        # Keep the view on the grid; zoomed out, align it to whole pyramid pixels
+        span = self.span
+        max_x = max(0, self.world_width - self.view_width * span // self.scale)
+        max_y = max(0, self.world_height - self.view_height * span // self.scale)
+        self.x = min(max(self.x, 0.0), max_x)
+        self.y = min(max(self.y, 0.0), max_y)
+        if span > 1:
+            self.x, self.y = float(int(self.x) // span * span), float(int(self.y) // span * span)
+        self.version += 1
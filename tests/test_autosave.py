@@ -0,0 +1,119 @@
+import os
+import sys
+import types
+
+pygame_stub = types.ModuleType('pygame')
+pygame_gui_stub = types.ModuleType('pygame_gui')
+pygame_gui_core_stub = types.ModuleType('pygame_gui.core')
+pygame_gui_elements_stub = types.ModuleType('pygame_gui.elements')
+
+pygame_gui_core_stub.ObjectID = object
+pygame_gui_stub.UIManager = object
+pygame_gui_stub.core = pygame_gui_core_stub
+pygame_gui_stub.elements = pygame_gui_elements_stub
+
+sys.modules.setdefault('pygame', pygame_stub)
+sys.modules.setdefault('pygame_gui', pygame_gui_stub)
+sys.modules.setdefault('pygame_gui.core', pygame_gui_core_stub)
+sys.modules.setdefault('pygame_gui.elements', pygame_gui_elements_stub)
+
+sys.path.insert(0, 'src')
+from ColorWarGame import AISim
+from colorwar.autosave import Autosaver, write_atomic
+from colorwar.savefile import read_binary
+
+import numpy as np
+import pytest
+
+
+@pytest.mark.parametrize("engine, storage", [("python", "lists"), ("python", "chunked"), ("numpy", "lists")])
+def test_snapshot_saves_the_grid_at_that_tick(tmp_path, engine, storage):
+    sim = AISim(engine=engine, headless=True, grid_size=(60, 40), seed=3, storage=storage)
+    sim.new_game(factions=10)
+    sim.simulate(ticks=5)
+    snapshot = sim.snapshot(tick=5)
+    grid = np.array(sim.grid)
+    ages = np.array(sim.claim_age if engine == "numpy" else sim.claim_age.to_lists())
+    sim.simulate(ticks=5)  # the snapshot must not follow the live grid
+
+    path = tmp_path / "snap.cwgbin"
+    write_atomic(str(path), snapshot)
+    data = read_binary(str(path))
+    assert not os.path.exists(f"{path}.tmp")
+    assert np.array_equal(data.grid, grid)
+    assert np.array_equal(data.claim_age, ages)
+
+    loaded = AISim(engine=engine, headless=True, grid_size=(60, 40), seed=3, storage=storage)
+    loaded.load_simulation(str(path))
+    assert np.count_nonzero(np.array(loaded.grid)) == np.count_nonzero(grid)
+    assert np.array_equal(np.array(loaded.claim_age), ages)
+
+
+def test_failed_write_keeps_the_previous_file(tmp_path, monkeypatch):
+    sim = AISim(engine="numpy", headless=True, grid_size=(30, 20), seed=3)
+    sim.new_game(factions=5)
+    path = tmp_path / "snap.cwgbin"
+    write_atomic(str(path), sim.snapshot())
+    before = path.read_bytes()
+
+    def fail(fd):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "fsync", fail)
+    with pytest.raises(OSError):
+        write_atomic(str(path), sim.snapshot())
+    assert path.read_bytes() == before
+    assert os.listdir(tmp_path) == ["snap.cwgbin"]
+
+
+def test_due_by_ticks_and_seconds(tmp_path, monkeypatch):
+    saver = Autosaver(str(tmp_path), every_ticks=3)
+    assert [saver.due() for _ in range(3)] == [False, False, True]
+
+    clock = [100.0]
+    monkeypatch.setattr("colorwar.autosave.time.monotonic", lambda: clock[0])
+    saver = Autosaver(str(tmp_path), every_ticks=None, every_seconds=2)
+    assert not saver.due()
+    clock[0] += 2
+    assert saver.due()
+
+    with pytest.raises(ValueError):
+        Autosaver(str(tmp_path), every_ticks=0)
+
+
+def test_simulation_rotates_autosaves(tmp_path):
+    saver = Autosaver(str(tmp_path), every_ticks=2, keep=3)
+    sim = AISim(engine="numpy", headless=True, grid_size=(40, 30), seed=3, autosave=saver)
+    sim.new_game(factions=5)
+    for _ in range(10):
+        sim.simulate(ticks=2)
+        saver.close()  # let each save finish so none is skipped as busy
+    assert saver.saved == 10
+    assert saver.last_error is None
+    saves = saver.saves()
+    assert len(saves) == 3
+    assert saves[-1] == saver.last_path
+    assert os.path.basename(saves[-1]).startswith("autosave-00000020-")
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+    assert read_binary(saves[-1]).tick == 20
+
+
+def test_rotation_keeps_the_latest_ticks_after_a_reload(tmp_path):
+    saver = Autosaver(str(tmp_path / "auto"), every_ticks=4, keep=2)
+    sim = AISim(engine="numpy", headless=True, grid_size=(40, 30), seed=3, autosave=saver)
+    sim.new_game(factions=5)
+    sim.simulate(ticks=6)
+    saver.close()  # the tick-4 save must not still be running when the tick-8 one is due
+    sim.save_simulation(str(tmp_path / "early.cwgbin"))
+    for _ in range(3):
+        sim.simulate(ticks=4)
+        saver.close()
+    assert [read_binary(path).tick for path in saver.saves()] == [12, 16]
+
+    # Back to tick 6: the game carries on from there, and its saves rotate out first
+    sim.load_simulation(str(tmp_path / "early.cwgbin"))
+    assert sim.tick == 6
+    sim.simulate(ticks=4)
+    saver.close()
+    assert [read_binary(path).tick for path in saver.saves()] == [12, 16]
+    assert saver.last_path not in saver.saves()
@@ -0,0 +1,83 @@
+import json
+import sys
+import types
+
+pygame_stub = types.ModuleType('pygame')
+pygame_gui_stub = types.ModuleType('pygame_gui')
+pygame_gui_core_stub = types.ModuleType('pygame_gui.core')
+pygame_gui_elements_stub = types.ModuleType('pygame_gui.elements')
+
+pygame_gui_core_stub.ObjectID = object
+pygame_gui_stub.UIManager = object
+pygame_gui_stub.core = pygame_gui_core_stub
+pygame_gui_stub.elements = pygame_gui_elements_stub
+
+sys.modules.setdefault('pygame', pygame_stub)
+sys.modules.setdefault('pygame_gui', pygame_gui_stub)
+sys.modules.setdefault('pygame_gui.core', pygame_gui_core_stub)
+sys.modules.setdefault('pygame_gui.elements', pygame_gui_elements_stub)
+
+sys.path.insert(0, 'src')
+from colorwar.batch import expand, load_spec, run_one, run_sweep
+
+import pytest
+
+SPEC = {
+    "ticks": 20,
+    "repeats": 2,
+    "seed": 5,
+    "grid_size": [30, 20],
+    "factions": 4,
+    "engine": "numpy",
+    "sample_every": 5,
+    "sweep": {"archetypes": ["Swarm", {"Empire": 2, "Cult": 1}]},
+}
+
+
+def test_expand_gives_every_combination_a_stable_id_and_seed():
+    runs = list(expand(SPEC))
+    assert len(runs) == 4
+    assert len({run["id"] for run in runs}) == 4
+    assert len({run["seed"] for run in runs}) == 4
+    # Adding a value to the sweep leaves the existing runs as they were
+    wider = dict(SPEC, sweep={"archetypes": ["Swarm", {"Empire": 2, "Cult": 1}, "Rogue"]})
+    assert runs == list(expand(wider))[:4]
+
+    with pytest.raises(ValueError):
+        list(expand(dict(SPEC, turbo=True)))
+    with pytest.raises(ValueError):
+        list(expand(dict(SPEC, expansion_chance=0.5)))
+
+
+def test_load_spec_reads_toml_and_json(tmp_path):
+    toml = tmp_path / "sweep.toml"
+    toml.write_text('ticks = 20\n[sweep]\narchetypes = ["Swarm", {Empire = 2, Cult = 1}]\n')
+    path = tmp_path / "sweep.json"
+    path.write_text(json.dumps(SPEC))
+    assert load_spec(str(toml))["sweep"] == SPEC["sweep"]
+    assert load_spec(str(path)) == SPEC
+
+
+@pytest.mark.parametrize("simulator", ["aisim", "game"])
+def test_run_one_summarizes_a_run(simulator):
+    params = dict(next(expand(dict(SPEC, sweep={})))["params"], simulator=simulator, archetypes=None)
+    run = {"id": "x", "repeat": 0, "seed": 3, "params": params}
+    result = run_one(run)
+    assert "error" not in result, result.get("error")
+    assert result["ticks"] == 20
+    assert result["winner"]["share"] > 0
+    assert [tick for tick, _ in result["factions"]][:4] == [0, 5, 10, 15]
+    assert run_one(run)["factions"] == result["factions"]  # same seed, same game
+
+
+def test_sweep_resumes_after_an_interruption(tmp_path):
+    output = tmp_path / "results.jsonl"
+    assert run_sweep(SPEC, str(output), workers=1) == {"done": 4, "skipped": 0, "failed": 0}
+    lines = output.read_text().splitlines()
+    assert sorted(json.loads(line)["id"] for line in lines) == sorted(run["id"] for run in expand(SPEC))
+
+    # Lose the last run and leave half of the one before
+    output.write_text("\n".join(lines[:2]) + "\n" + lines[2][:40])
+    assert run_sweep(SPEC, str(output), workers=1) == {"done": 2, "skipped": 2, "failed": 0}
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+    assert sorted(record["id"] for record in records) == sorted(run["id"] for run in expand(SPEC))
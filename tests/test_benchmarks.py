@@ -0,0 +1,43 @@
+import importlib.util
+import json
+import os
+
+spec = importlib.util.spec_from_file_location('bench_run', os.path.join('benchmarks', 'run.py'))
+bench_run = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(bench_run)
+
+
+def test_benchmarks_write_json(tmp_path):
+    out = tmp_path / 'results.json'
+    bench_run.main([
+        '--sizes', '80', '--factions', '5', '--engines', 'python', '--repeat', '2',
+        '-k', 'disaster', '--saves', os.path.join('saves', 'test_colorwar.cwgsave'), '--output', str(out),
+    ])
+    data = json.loads(out.read_text())
+    names = {result['name'] for result in data['results']}
+    assert names == {f'aisim.disaster.{event}' for event in bench_run.DISASTERS}
+    assert all(result['repeat'] == 2 and result['min'] <= result['median'] for result in data['results'])
+    assert 'commit' in data['machine']
+
+
+def test_draw_cases_need_a_real_pygame(tmp_path):
+    out = tmp_path / 'results.json'
+    bench_run.main([
+        '--sizes', '40', '--factions', '2', '--engines', 'python', '--repeat', '1',
+        '-k', 'game.draw', '--saves', '', '--output', str(out),
+    ])
+    names = {result['name'] for result in json.loads(out.read_text())['results']}
+    # The tests stub pygame, whose renderer would draw nothing
+    assert names == ({'game.draw'} if bench_run.DRAWING else set())
+
+
+def test_memory_benchmark_measures_each_storage(tmp_path):
+    spec = importlib.util.spec_from_file_location('bench_memory', os.path.join('benchmarks', 'memory.py'))
+    bench_memory = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(bench_memory)
+    out = tmp_path / 'memory.json'
+    bench_memory.main(['--sizes', '60', '--factions', '3', '--ticks', '2', '--output', str(out)])
+    results = json.loads(out.read_text())['results']
+    assert [result['params']['storage'] for result in results] == ['lists', 'memmap']
+    assert all(result['rss'] > 0 and result['peak_rss'] > 0 for result in results)
+    assert results[0]['file_bytes'] == 0 and results[1]['file_bytes'] > 60 * 60 * 9
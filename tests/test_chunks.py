@@ -0,0 +1,72 @@
+import sys
+
+sys.path.insert(0, 'src')
+from colorwar.chunks import ChunkedGrid, check_storage, copy_rows
+
+import numpy as np
+import pytest
+
+
+def test_cells_read_and_write_like_rows():
+    grid = ChunkedGrid(10, 6, 0, chunk=4)
+    assert grid.allocated() == 0
+    grid[1][9] = 5
+    grid[5][0] = 0  # writing a uniform chunk's own value allocates nothing
+    assert grid[1][9] == 5 and grid.get(8, 1) == 0
+    assert grid.allocated() == 1
+    grid[2] = [7] * 10
+    assert grid[2][:3] == [7, 7, 7] and len(grid[2]) == 10
+    assert grid.to_lists()[1] == [0] * 9 + [5]
+    with pytest.raises(IndexError):
+        grid[0][10]
+
+
+def test_copy_shares_chunks_until_written():
+    grid = ChunkedGrid(8, 8, 0, chunk=4)
+    grid[0][0] = 1
+    other = copy_rows(grid)
+    assert other.cells[0] is grid.cells[0]
+    other[0][1] = 2
+    assert other.cells[0] is not grid.cells[0]
+    assert grid[0][1] == 0 and other[0][:2] == [1, 2]
+    grid[0][0] = 3
+    assert other[0][0] == 1
+
+
+def test_compact_folds_uniform_chunks_including_edges():
+    grid = ChunkedGrid(6, 5, 0, chunk=4)
+    for y in range(4, 5):
+        for x in range(4, 6):
+            grid[y][x] = 9
+    grid[0][0] = 1
+    grid[0][0] = 0
+    assert grid.allocated() == 2
+    assert grid.compact() == 2
+    assert grid.allocated() == 0
+    assert grid.values == [0, 0, 0, 9]
+
+
+def test_load_and_array_go_chunk_by_chunk():
+    rows = np.zeros((5, 6), dtype=np.uint16)
+    rows[:, 4:] = 3
+    rows[1, 1] = 2
+    grid = ChunkedGrid(6, 5, 0, chunk=4)
+    grid.load(rows)
+    assert grid.allocated() == 1  # only the chunk holding the 2 is mixed
+    assert np.array_equal(np.asarray(grid, dtype=np.uint16), rows)
+    again = ChunkedGrid(6, 5, 0, chunk=4)
+    again.load(rows.tolist())
+    assert again.to_lists() == rows.tolist() and again.allocated() == 1
+
+
+def test_check_storage():
+    assert check_storage("chunked") == "chunked"
+    with pytest.raises(ValueError):
+        check_storage("chunked", "numpy")
+    assert check_storage("memmap", "numpy") == "memmap"
+    with pytest.raises(ValueError):
+        check_storage("memmap")
+    with pytest.raises(ValueError):
+        check_storage("disk")
+    with pytest.raises(ValueError):
+        ChunkedGrid(4, 4, chunk=3)
@@ -0,0 +1,161 @@
+import sys
+import types
+
+pygame_stub = types.ModuleType('pygame')
+sys.modules.setdefault('pygame', pygame_stub)
+
+sys.path.insert(0, 'src')
+from colorwar.engine import DIRECTION_ORDERS, ArrayGrid, check_engine, tick_coefficients
+from colorwar.registry import FactionRegistry
+from colorwar.terrain import Terrain
+
+import pytest
+
+
+def make_registry(*colors):
+    registry = FactionRegistry()
+    for i, color in enumerate(colors):
+        registry.add(color, {
+            "name": f"Faction {i}",
+            "behavior": "random",
+            "tier": 1,
+            "personality": {"aggression": 1.0, "defense": 1.0, "expansionism": 1.0, "risk": 1.0},
+            "relations": {},
+        })
+    return registry
+
+
+def power(world):
+    counts = world.counts()
+    return {fid: int(n) for fid, n in enumerate(counts) if fid and n}
+
+
+def test_check_engine_rejects_unknown():
+    assert check_engine("numpy") == "numpy"
+    with pytest.raises(ValueError):
+        check_engine("gpu")
+
+
+def test_color_view_round_trip():
+    world = ArrayGrid(4, 3)
+    world.colors[1][2] = "#ff0000"
+    assert world.colors[1][2] == "#ff0000"
+    assert world.colors[0][0] is None
+    assert world.to_lists()[1] == [None, None, "#ff0000", None]
+    assert world.color_counts() == {"#ff0000": 1}
+
+
+def test_load_lists_crops_and_pads():
+    world = ArrayGrid(3, 3)
+    world.load_lists([["#000001"] * 5, ["#000002"]])
+    assert world.to_lists() == [
+        ["#000001"] * 3,
+        ["#000002", None, None],
+        [None, None, None],
+    ]
+
+
+def test_tick_coefficients_tables():
+    registry = make_registry("#ff0000", "#00ff00", "#0000ff")
+    red, green, blue = (registry.id_of(color) for color in ("#ff0000", "#00ff00", "#0000ff"))
+    registry.remove(blue)
+    table = tick_coefficients(registry, {red: 70, green: 20, blue: 10}, 100)
+    assert table.counts[red] == 70 and table.counts[blue] == 0 and table.counts[0] == 0
+    # Red holds 65% of the map: its power drops by a fifth, the others' rise
+    assert table.power[red] == pytest.approx(0.56)
+    assert table.power[green] == pytest.approx(0.24)
+    assert table.spread[green] == pytest.approx(0.1 + 0.24 * 0.3)
+    assert table.attack[red] == pytest.approx(0.05 + 0.56 * 0.4)
+    assert table.jitter[green] == pytest.approx(0.1)
+    assert len(set(DIRECTION_ORDERS)) == 24
+
+
+def test_step_factions_spreads_and_ages():
+    registry = make_registry("#ff0000", "#0000ff")
+    world = ArrayGrid(20, 20, registry)
+    world.colors[5][5] = "#ff0000"
+    world.colors[15][15] = "#0000ff"
+    for _ in range(10):
+        world.step_factions(registry, power(world), None, lambda a, b: a)
+    counts = world.color_counts()
+    assert counts["#ff0000"] > 1 and counts["#0000ff"] > 1
+    assert world.claim_age.max() == 10
+    assert (world.last_owner == world.grid).all()
+
+
+def test_step_factions_scales_odds_by_terrain():
+    changed = []
+    for biome in ("plain", "lava"):
+        registry = make_registry("#ff0000", "#0000ff")
+        world = ArrayGrid(20, 20, registry)
+        world.colors[5][5] = "#ff0000"
+        world.colors[15][15] = "#0000ff"
+        terrain = Terrain(20, 20)
+        terrain.paint([(x, y) for y in range(20) for x in range(20)], biome)
+        for _ in range(10):
+            world.step_factions(registry, power(world), terrain.multiplier_array(), lambda a, b: a)
+        changed.append(int((world.grid != 0).sum()))
+    assert changed[1] < changed[0]
+
+
+def test_step_factions_fusion_creates_blend():
+    registry = make_registry("#ff0000", "#00ff00")
+    world = ArrayGrid(2, 1, registry)
+    world.colors[0][0] = "#ff0000"
+    world.colors[0][1] = "#00ff00"
+    # Allies never attack, so the pair can only fuse.
+    registry.factions["#ff0000"]["relations"]["#00ff00"] = 1.0
+    registry.factions["#00ff00"]["relations"]["#ff0000"] = 1.0
+    fused = []
+
+    def fuse(a, b):
+        fused.append((a, b))
+        if "#7f7f00" not in registry:
+            registry.add("#7f7f00", {"name": "Fusion"})
+        return registry.id_of("#7f7f00")
+
+    for _ in range(2000):
+        world.step_factions(registry, power(world), None, fuse)
+        if fused:
+            break
+    assert fused
+    assert "#7f7f00" in set(world.to_lists()[0])
+
+
+def test_step_expansion_claims_empty_cells_only():
+    world = ArrayGrid(10, 10)
+    world.colors[0][0] = "#ff0000"
+    world.colors[9][9] = "#00ff00"
+    for _ in range(30):
+        world.step_expansion({"#ff0000": 1.0, "#00ff00": 1.0})
+    counts = world.color_counts()
+    assert sum(counts.values()) == 100
+    assert set(counts) == {"#ff0000", "#00ff00"}
+
+
+def test_probe_counts_each_cell_once_up_to_limit():
+    world = ArrayGrid(4, 1)
+    world.grid[0, :2] = 1
+    hits = world.probe(1, 500)
+    assert sorted(hits.tolist()) == [0, 1]
+    assert world.probe(None, 500, limit=1).size == 1
+    assert world.probe(2, 500).size == 0
+
+
+def test_write_returns_only_changed_cells():
+    world = ArrayGrid(3, 2)
+    world.grid[0, 0] = 1
+    cells, previous = world.write([0, 1, 4], 1)
+    assert cells.tolist() == [1, 4] and previous.tolist() == [0, 0]
+    assert world.cells_of([1]).tolist() == [0, 1, 4]
+    assert world.frontier.mask[[0, 1, 4]].all()
+
+
+def test_quake_conserves_counts():
+    world = ArrayGrid(8, 8)
+    world.grid[:4] = 1
+    world.grid[4:, :2] = 2
+    before = world.counts().tolist()
+    touched = world.quake(200)
+    assert world.counts().tolist() == before
+    assert touched.size > 0
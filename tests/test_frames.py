@@ -0,0 +1,71 @@
+import sys
+import types
+
+pygame_stub = types.ModuleType('pygame')
+pygame_gui_stub = types.ModuleType('pygame_gui')
+pygame_gui_core_stub = types.ModuleType('pygame_gui.core')
+pygame_gui_elements_stub = types.ModuleType('pygame_gui.elements')
+
+pygame_gui_core_stub.ObjectID = object
+pygame_gui_stub.UIManager = object
+pygame_gui_stub.core = pygame_gui_core_stub
+pygame_gui_stub.elements = pygame_gui_elements_stub
+
+sys.modules.setdefault('pygame', pygame_stub)
+sys.modules.setdefault('pygame_gui', pygame_gui_stub)
+sys.modules.setdefault('pygame_gui.core', pygame_gui_core_stub)
+sys.modules.setdefault('pygame_gui.elements', pygame_gui_elements_stub)
+
+sys.path.insert(0, 'src')
+from ColorWarGame import AISim
+from colorwar.frames import FrameRing, Snapshot, TickChanges
+
+import pytest
+
+
+def test_take_returns_new_entries_once():
+    frames = FrameRing(capacity=4)
+    frames.publish([1, 2], ['#ff0000', '#ff0000'])
+    frames.publish([3], [None])
+    first = frames.take()
+    assert [entry.cells for entry in first] == [(1, 2), (3,)]
+    assert isinstance(first[0], TickChanges)
+    assert frames.take() == []
+
+
+def test_lapped_reader_asks_for_a_snapshot():
+    frames = FrameRing(capacity=2)
+    for cell in range(5):
+        frames.publish([cell], ['#ff0000'])
+    assert frames.take() == []
+    assert frames.wants_snapshot and frames.overruns == 1
+    frames.publish_snapshot(2, [0, 1], [None, '#ff0000'])
+    assert not frames.wants_snapshot
+    entries = frames.take()
+    assert len(entries) == 1 and isinstance(entries[0], Snapshot)
+
+
+@pytest.mark.parametrize("engine", ["python", "numpy"])
+def test_published_frames_rebuild_the_grid(engine):
+    sim = AISim(engine=engine, headless=True, grid_size=(100, 80), seed=2)
+    sim.frames = FrameRing(capacity=8)
+    sim.new_game()
+    screen = {}
+
+    def show():
+        for entry in sim.frames.take():
+            if isinstance(entry, Snapshot):
+                screen.clear()
+                screen.update((i, entry.palette[fid]) for i, fid in enumerate(entry.owners) if fid)
+            else:
+                screen.update(zip(entry.cells, entry.colors))
+
+    show()
+    for ticks in (3, 20, 1):  # 20 ticks overflow the ring and force a snapshot
+        sim.simulate(ticks=ticks)
+        show()
+        show()
+    colors = sim.registry.colors
+    expected = {i: colors[fid] for i, fid in enumerate(int(f) for row in sim.grid for f in row) if fid}
+    assert {i: c for i, c in screen.items() if c} == expected
+    assert sim.frames.overruns == 1
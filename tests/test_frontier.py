@@ -0,0 +1,46 @@
+import random
+import sys
+
+sys.path.insert(0, 'src')
+from colorwar.ages import ClaimAges
+from colorwar.frontier import Frontier, FrontierMask
+
+import numpy as np
+
+
+def test_frontier_skips_interior_cells():
+    grid = [[1, 1, 1], [1, 1, 1], [1, 1, 0]]
+    frontier = Frontier(3, 3)
+    frontier.rebuild(grid)
+    assert frontier.border == {5, 7}
+    grid[2][2] = 1
+    frontier.touch(grid, 2, 2)
+    assert frontier.border == set()
+
+
+def test_mask_matches_set_after_incremental_writes():
+    rng = random.Random(4)
+    width, height = 12, 9
+    grid = [[0] * width for _ in range(height)]
+    array = np.zeros((height, width), dtype=np.uint16)
+    frontier = Frontier(width, height)
+    mask = FrontierMask(width, height)
+    for _ in range(300):
+        x, y, fid = rng.randrange(width), rng.randrange(height), rng.choice([0, 1, 1, 2])
+        grid[y][x] = array[y, x] = fid
+        frontier.touch(grid, x, y)
+        mask.touch(array, x, y)
+    assert set(np.flatnonzero(mask.mask).tolist()) == frontier.border
+    fresh = FrontierMask(width, height)
+    fresh.rebuild(array)
+    assert (fresh.mask == mask.mask).all()
+
+
+def test_claim_ages_follow_the_tick():
+    ages = ClaimAges(2, 1)
+    ages.tick += 3
+    ages.claimed[0][1] = ages.tick
+    ages.tick += 2
+    assert list(ages[0]) == [5, 2]
+    ages[0][0] = 0
+    assert ages[0][0] == 0
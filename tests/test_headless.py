@@ -0,0 +1,197 @@
+import sys
+import types
+
+# Headless runs never touch the display, so bare stubs are enough
+pygame_stub = types.ModuleType('pygame')
+pygame_gui_stub = types.ModuleType('pygame_gui')
+pygame_gui_core_stub = types.ModuleType('pygame_gui.core')
+pygame_gui_elements_stub = types.ModuleType('pygame_gui.elements')
+
+pygame_gui_core_stub.ObjectID = object
+pygame_gui_stub.UIManager = object
+pygame_gui_stub.core = pygame_gui_core_stub
+pygame_gui_stub.elements = pygame_gui_elements_stub
+
+sys.modules.setdefault('pygame', pygame_stub)
+sys.modules.setdefault('pygame_gui', pygame_gui_stub)
+sys.modules.setdefault('pygame_gui.core', pygame_gui_core_stub)
+sys.modules.setdefault('pygame_gui.elements', pygame_gui_elements_stub)
+
+sys.path.insert(0, 'src')
+from ColorWarGame import AISim
+from colorwar.faction import Faction
+from colorwar.frontier import Frontier
+from colorwar.game import ColorWarGame
+
+import pytest
+
+
+def test_headless_aisim_requires_grid_size():
+    with pytest.raises(ValueError):
+        AISim(headless=True)
+
+
+@pytest.mark.parametrize("engine", ["python", "numpy"])
+def test_headless_aisim_runs_ticks(engine):
+    sim = AISim(engine=engine, headless=True, grid_size=(100, 80), territory_check_every=1)
+    sim.new_game()
+    assert sim.simulate(ticks=5) == 5
+    assert sum(sim.count_faction_power().values()) > 0
+
+
+def test_headless_game_runs_ticks():
+    game = ColorWarGame(grid_size=(30, 20), headless=True)
+    game.add_faction(Faction(name="Red", color="#ff0000", expansion_chance=0.5), count=5)
+    assert game.run(ticks=40) == 40
+    assert sum(cell is not None for row in game.grid for cell in row) > 5
+
+
+def grid_after(sim, ticks):
+    sim.new_game()
+    sim.simulate(ticks=ticks)
+    return [list(map(int, row)) for row in sim.grid]
+
+
+@pytest.mark.parametrize("engine", ["python", "numpy"])
+def test_same_seed_replays_aisim(engine):
+    runs = [AISim(engine=engine, headless=True, grid_size=(100, 80), seed=seed) for seed in (5, 5, 6)]
+    first, again, other = (grid_after(sim, 30) for sim in runs)
+    assert first == again
+    assert first != other
+    assert runs[0].factions.keys() == runs[1].factions.keys()
+
+
+@pytest.mark.parametrize("engine", ["python", "numpy"])
+def test_same_seed_replays_game(engine):
+    def play(seed):
+        game = ColorWarGame(grid_size=(30, 20), engine=engine, headless=True, seed=seed)
+        for i in range(3):
+            color = "#%06x" % game.rng.colors.randint(0, 0xFFFFFF)
+            game.add_faction(Faction(name=f"F{i}", color=color, expansion_chance=0.3), count=5)
+        game.run(ticks=15)
+        return [list(row) for row in game.grid]
+
+    assert play(9) == play(9)
+    assert play(9) != play(10)
+
+
+def test_chunked_storage_plays_the_same_game():
+    runs = [AISim(headless=True, grid_size=(130, 70), seed=4, storage=storage) for storage in ("lists", "chunked")]
+    lists, chunked = (grid_after(sim, 30) for sim in runs)
+    assert lists == chunked
+    assert runs[1].claim_age.to_lists() == runs[0].claim_age.to_lists()
+
+    def play(storage):
+        game = ColorWarGame(grid_size=(100, 70), headless=True, seed=2, storage=storage)
+        game.add_faction(Faction(name="Red", color="#ff0000", expansion_chance=0.5), count=5)
+        game.run(ticks=20)
+        return [list(row) for row in game.grid]
+
+    assert play("lists") == play("chunked")
+
+
+def test_chunked_storage_needs_python_engine():
+    with pytest.raises(ValueError):
+        AISim(engine="numpy", headless=True, grid_size=(10, 10), storage="chunked")
+
+
+def test_memmap_storage_checkpoints_and_resumes(tmp_path):
+    sim = AISim(engine="numpy", headless=True, grid_size=(90, 60), seed=4, storage="memmap",
+                run_dir=str(tmp_path), checkpoint_every=10)
+    sim.new_game(factions=12)
+    assert sim.simulate(ticks=15) == 15
+    assert not sim.engine.changed  # simulate() checkpointed on the way out
+    colors = [[sim.registry.colors[fid] for fid in row] for row in sim.grid.tolist()]
+
+    # Naming the run directory up front must not clear it before resume() reads it
+    resumed = AISim(engine="numpy", headless=True, grid_size=(90, 60), seed=5, storage="memmap",
+                    run_dir=str(tmp_path))
+    resumed.resume(str(tmp_path))
+    assert [[resumed.registry.colors[fid] for fid in row] for row in resumed.grid.tolist()] == colors
+    assert (resumed.claim_age == sim.claim_age).all()
+    assert resumed.count_faction_power() == {
+        fid: int(n) for fid, n in enumerate(resumed.engine.counts()) if fid and n and resumed.registry.alive[fid]
+    }
+    resumed.simulate(ticks=3)
+    assert resumed.engine.tick == 18
+
+
+def test_memmap_storage_needs_numpy_engine_without_workers():
+    with pytest.raises(ValueError):
+        AISim(headless=True, grid_size=(10, 10), storage="memmap")
+    with pytest.raises(ValueError):
+        AISim(engine="numpy", headless=True, grid_size=(10, 10), storage="memmap", workers=2)
+    with pytest.raises(ValueError):
+        AISim(engine="numpy", headless=True, grid_size=(10, 10), checkpoint_every=10)
+    with pytest.raises(ValueError):
+        AISim(engine="numpy", headless=True, grid_size=(10, 10), storage="memmap", autosave=object())
+
+
+def test_new_game_closes_the_previous_stepper():
+    from multiprocessing import shared_memory
+
+    sim = AISim(engine="numpy", headless=True, grid_size=(100, 80), workers=1, seed=5)
+    sim.new_game()
+    old = sim.stepper
+    names = [block.spec[0] for block in old.blocks.values()]
+    sim.new_game()
+    assert sim.stepper is not old and old.pool is None and not old.blocks
+    for name in names:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
+    sim.close()
+    assert sim.stepper is None
+
+
+@pytest.mark.parametrize("storage", ["lists", "memmap"])
+def test_window_loop_starts_numpy_simulation_after_load(monkeypatch, storage):
+    import threading
+    import ColorWarGame
+    from types import SimpleNamespace
+
+    # Drive run() on a headless sim with just enough of pygame for its loop
+    sim = AISim(engine="numpy", headless=True, grid_size=(30, 20), storage=storage)
+    sim.ui_manager = SimpleNamespace(update=lambda delta: None, draw_ui=lambda screen: None)
+    sim.ui_rect = None
+    monkeypatch.setattr(ColorWarGame.pygame, "time", SimpleNamespace(Clock=lambda: SimpleNamespace(tick=lambda fps: 16)),
+                        raising=False)
+    monkeypatch.setattr(ColorWarGame.pygame, "display", SimpleNamespace(flip=lambda: None), raising=False)
+    monkeypatch.setattr(ColorWarGame.pygame, "quit", lambda: None, raising=False)
+    started = threading.Event()
+    sim.simulate = started.set
+    frames = []
+
+    def handle_events():
+        frames.append(started.is_set())
+        sim.load_complete = len(frames) > 2  # a load finishes on the third frame
+        sim.running = len(frames) < 5
+
+    sim.handle_events = handle_events
+    with pytest.raises(SystemExit):
+        sim.run()
+    assert started.wait(5)
+    assert frames[:3] == [False] * 3
+
+
+@pytest.mark.parametrize("storage", ["lists", "chunked"])
+def test_game_step_writes_the_grid_in_place(storage):
+    game = ColorWarGame(grid_size=(90, 60), headless=True, seed=3, storage=storage)
+    game.add_faction(Faction(name="Red", color="#ff0000", expansion_chance=0.5), count=5)
+    grid, rows = game.grid, list(game.grid)
+    game.run(ticks=20)
+    assert game.grid is grid and all(a is b for a, b in zip(game.grid, rows))
+    expected = Frontier(90, 60)
+    expected.rebuild(game.grid)
+    assert game.frontier.border == expected.border
+
+
+@pytest.mark.parametrize("storage", ["lists", "chunked"])
+def test_list_step_writes_the_grid_in_place(storage):
+    sim = AISim(headless=True, grid_size=(120, 80), seed=2, storage=storage)
+    sim.new_game()
+    grid, rows = sim.grid, list(sim.grid)
+    sim.simulate(ticks=5)
+    sim.set_cell(3, 4, 0)
+    sim.simulate(ticks=5)
+    assert sim.grid is grid and all(a is b for a, b in zip(sim.grid, rows))
+    assert [list(row) for row in sim.last_owner] == [list(row) for row in sim.grid]
@@ -0,0 +1,148 @@
+import random
+import tracemalloc
+import sys
+import types
+
+pygame_stub = types.ModuleType('pygame')
+sys.modules.setdefault('pygame', pygame_stub)
+
+sys.path.insert(0, 'src')
+from colorwar.engine import ArrayGrid
+from colorwar.mapped import MappedGrid, read_checkpoint
+from colorwar.parallel import ParallelStepper
+from colorwar.registry import FactionRegistry
+from colorwar.savefile import SaveFormatError, encode_factions
+
+import numpy as np
+import pytest
+
+
+def make_registry():
+    registry = FactionRegistry()
+    for i in range(12):
+        registry.add(f"#0000{i + 1:02x}", {
+            "name": f"Faction {i}",
+            "personality": {"aggression": 1.5, "defense": 1.0, "expansionism": 1.0, "risk": 1.5},
+        })
+    random.seed(3)
+    registry.relations.randomize(registry.alive_ids())
+    return registry
+
+
+def fill(world):
+    rng = np.random.default_rng(7)
+    shape = (world.height, world.width)
+    grid = rng.integers(0, 13, size=shape) * (rng.random(shape) < 0.3)
+    world.load_arrays(grid, np.full(shape, 10), np.zeros(shape))
+
+
+def fuse_into(registry):
+    def fuse(a, b):
+        color = f"#ff{a:02x}{b:02x}"
+        if color not in registry:
+            registry.add(color, {"name": color})
+        return registry.id_of(color)
+    return fuse
+
+
+def play(world, registry, ticks=15, step=None):
+    step = step or world.step_factions
+    fuse = fuse_into(registry)
+    for _ in range(ticks):
+        power = {fid: int(n) for fid, n in enumerate(world.counts()) if fid and n}
+        step(registry, power, None, fuse)
+    return np.array(world.grid), np.array(world.claim_age), np.array(world.overwrite_cooldown)
+
+
+def test_bands_step_like_the_stripe_pool(tmp_path):
+    registry = make_registry()
+    reference = ArrayGrid(40, 30, registry, rng=np.random.default_rng(4))
+    fill(reference)
+    stepper = ParallelStepper(workers=0, stripes=1)
+    stepper.share(reference)
+    try:
+        expected = play(reference, registry, step=lambda *args: stepper.step(reference, *args))
+    finally:
+        stepper.close()
+    assert len(registry) > 12  # fusions were applied
+    for band_rows in (2, 7):
+        registry = make_registry()
+        world = MappedGrid(40, 30, str(tmp_path / f"run{band_rows}"), registry, np.random.default_rng(4),
+                           band_rows=band_rows)
+        assert world.seed == stepper.seed  # both draw it from the world's generator
+        fill(world)
+        for ours, theirs in zip(play(world, registry), expected):
+            assert (ours == theirs).all()
+
+
+def test_release_keeps_the_files(tmp_path):
+    world = MappedGrid(300, 50, str(tmp_path), band_rows=8)
+    bands = world.bands()
+    assert len(bands) == 7 and bands[0][0] == 0 and bands[-1][1] == 50
+    world.grid[20:40] = 3
+    world.release()
+    assert (world.grid[20:40] == 3).all() and world.counts()[3] == 20 * 300
+    world.clear()
+    assert not world.grid.any()
+
+
+def test_checkpoint_resumes_until_the_next_step(tmp_path):
+    registry = make_registry()
+    world = MappedGrid(40, 30, str(tmp_path), registry)
+    fill(world)
+    with pytest.raises(SaveFormatError):
+        read_checkpoint(str(tmp_path))
+    grid, ages, _ = play(world, registry, ticks=3)
+    world.checkpoint(encode_factions(registry))
+    assert read_checkpoint(str(tmp_path))["tick"] == 3
+
+    resumed = MappedGrid(40, 30, str(tmp_path), registry, resume=True)
+    assert resumed.seed == world.seed and resumed.tick == 3
+    assert (resumed.grid == grid).all() and (resumed.claim_age == ages).all()
+    with pytest.raises(ValueError):
+        MappedGrid(30, 40, str(tmp_path), registry, resume=True)
+    play(world, registry, ticks=1)
+    with pytest.raises(SaveFormatError):
+        read_checkpoint(str(tmp_path))
+
+
+def test_probe_counts_distinct_cells(tmp_path):
+    world = MappedGrid(50, 50, str(tmp_path), band_rows=8)
+    world.grid[:25] = 1
+    found = np.mean([world.probe(1, 1000).size for _ in range(200)])
+    expected = 1250 * (1 - (1 - 1 / 2500) ** 1000)
+    assert abs(found - expected) < 0.02 * expected
+    assert world.probe(1, 1000, limit=30).size == 30
+
+
+def test_event_ticks_stay_within_a_band(tmp_path):
+    registry = make_registry()
+    world = MappedGrid(2000, 1000, str(tmp_path), registry, band_rows=20)
+    # Wide territories, so a tick changes a few border cells rather than most of the map
+    territories = np.broadcast_to(np.arange(world.width) // 50 % 13, (world.height, world.width))
+    world.load_arrays(territories, np.full(territories.shape, 10), np.zeros(territories.shape))
+    power = {fid: int(n) for fid, n in enumerate(world.counts()) if fid and n}
+    events = {
+        "step": lambda: world.step_factions(registry, power, None, fuse_into(registry)),
+        "time warp": lambda: world.scatter(0.05),
+        "volcano": lambda: world.probe(3, 1000),
+        "plague": lambda: world.probe(None, 200),
+        "regrowth": lambda: world.choose(0, 30),
+        "wipeout": lambda: world.cells_of([5]),
+        "quake": lambda: world.quake(200),
+    }
+    for event in events.values():
+        event()  # first calls import and cache parts of NumPy
+    tracemalloc.start()
+    try:
+        for name, event in events.items():
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            found = event()
+            peak = tracemalloc.get_traced_memory()[1] - before
+            found = sum(part.nbytes for part in found) if isinstance(found, tuple) else found.nbytes
+            # Besides the cells found, gathered band by band, a fraction of a band; ArrayGrid
+            # needs a byte or more per cell of the map for each of these
+            assert peak - 2 * found < world.grid.size // 4, name
+    finally:
+        tracemalloc.stop()
@@ -0,0 +1,116 @@
+import gc
+import random
+import sys
+import types
+
+pygame_stub = types.ModuleType('pygame')
+sys.modules.setdefault('pygame', pygame_stub)
+
+sys.path.insert(0, 'src')
+from colorwar.engine import ArrayGrid
+from colorwar.parallel import ParallelStepper, split_rows
+from colorwar.registry import FactionRegistry
+from colorwar.terrain import Terrain
+
+import numpy as np
+import pytest
+
+
+def make_world(width=40, height=30):
+    registry = FactionRegistry()
+    for i in range(12):
+        registry.add(f"#0000{i + 1:02x}", {
+            "name": f"Faction {i}",
+            "personality": {"aggression": 1.5, "defense": 1.0, "expansionism": 1.0, "risk": 1.5},
+        })
+    random.seed(3)
+    registry.relations.randomize(registry.alive_ids())
+    world = ArrayGrid(width, height, registry, rng=np.random.default_rng(4))
+    rng = np.random.default_rng(7)
+    world.grid[:] = rng.integers(0, 13, size=(height, width)) * (rng.random((height, width)) < 0.3)
+    world.claim_age[:] = 10
+    world.last_owner[:] = world.grid
+    world.frontier.rebuild(world.grid)
+    return registry, world
+
+
+def fuse_into(registry):
+    def fuse(a, b):
+        color = f"#ff{a:02x}{b:02x}"
+        if color not in registry:
+            registry.add(color, {"name": color})
+        return registry.id_of(color)
+    return fuse
+
+
+def run(stripes, workers=0, ticks=15, terrain=None):
+    registry, world = make_world()
+    raster = terrain.multiplier_array() if terrain is not None else None
+    stepper = ParallelStepper(workers=workers, stripes=stripes, seed=11, mp_context="fork")
+    stepper.share(world)
+    fuse = fuse_into(registry)
+    try:
+        for _ in range(ticks):
+            before = world.grid.copy()
+            power = {fid: int(n) for fid, n in enumerate(world.counts()) if fid and n}
+            changed, previous = stepper.step(world, registry, power, raster, fuse)
+            assert (before.reshape(-1)[changed] == previous).all()
+            assert (before != world.grid).sum() == changed.size
+        return world.grid.copy(), world.claim_age.copy(), world.overwrite_cooldown.copy(), len(registry)
+    finally:
+        stepper.close()
+
+
+def test_split_rows_keeps_two_rows_per_stripe():
+    assert split_rows(10, 3) == [(0, 3), (3, 6), (6, 10)]
+    assert split_rows(5, 8) == [(0, 2), (2, 5)]
+    assert split_rows(1, 4) == [(0, 1)]
+
+
+def test_result_does_not_depend_on_stripes():
+    grid, ages, cooldown, factions = run(stripes=1)
+    assert factions > 12  # fusions were applied
+    for stripes in (2, 7):
+        other = run(stripes=stripes)
+        assert (other[0] == grid).all()
+        assert (other[1] == ages).all()
+        assert (other[2] == cooldown).all()
+
+
+def test_terrain_result_does_not_depend_on_stripes():
+    terrain = Terrain(40, 30)
+    terrain.fill_voronoi(random.Random(2), 5)
+    grid = run(stripes=1, terrain=terrain)[0]
+    assert not (grid == run(stripes=1)[0]).all()
+    assert (run(stripes=4, terrain=terrain)[0] == grid).all()
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="fork start method")
+def test_process_pool_matches_in_process_run():
+    expected = run(stripes=3)[0]
+    assert (run(stripes=3, workers=2)[0] == expected).all()
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="fork start method")
+def test_dropped_stepper_stops_its_workers():
+    registry, world = make_world()
+    stepper = ParallelStepper(workers=2, seed=11, mp_context="fork")
+    stepper.share(world)
+    power = {fid: int(n) for fid, n in enumerate(world.counts()) if fid and n}
+    stepper.step(world, registry, power, None, fuse_into(registry))
+    processes = list(stepper.pool._processes.values())
+    assert processes
+    del stepper
+    gc.collect()
+    assert not any(process.is_alive() for process in processes)
+
+
+def test_sparse_relations_fall_back_to_serial_step():
+    registry, world = make_world()
+    registry.relations.grow(registry.relations.dense_limit + 1)
+    stepper = ParallelStepper(workers=0, seed=1)
+    stepper.share(world)
+    power = {fid: int(n) for fid, n in enumerate(world.counts()) if fid and n}
+    changed, _ = stepper.step(world, registry, power, None, fuse_into(registry))
+    assert changed.size > 0
+    stepper.close()
@@ -0,0 +1,62 @@
+import csv
+import json
+import sys
+import types
+
+pygame_stub = types.ModuleType('pygame')
+pygame_gui_stub = types.ModuleType('pygame_gui')
+pygame_gui_core_stub = types.ModuleType('pygame_gui.core')
+pygame_gui_elements_stub = types.ModuleType('pygame_gui.elements')
+
+pygame_gui_core_stub.ObjectID = object
+pygame_gui_stub.UIManager = object
+pygame_gui_stub.core = pygame_gui_core_stub
+pygame_gui_stub.elements = pygame_gui_elements_stub
+
+sys.modules.setdefault('pygame', pygame_stub)
+sys.modules.setdefault('pygame_gui', pygame_gui_stub)
+sys.modules.setdefault('pygame_gui.core', pygame_gui_core_stub)
+sys.modules.setdefault('pygame_gui.elements', pygame_gui_elements_stub)
+
+sys.path.insert(0, 'src')
+from ColorWarGame import AISim
+from colorwar.profiler import PHASES, NullProfiler, TickProfiler, percentile
+
+
+def test_percentile_interpolates():
+    assert percentile([], 50) == 0.0
+    assert percentile([1.0, 2.0, 3.0, 4.0], 50) == 2.5
+    assert percentile([1.0, 2.0, 3.0, 4.0], 100) == 4.0
+
+
+def test_profiler_keeps_a_rolling_window(tmp_path):
+    profiler = TickProfiler(window=3)
+    for changed in range(5):
+        profiler.start()
+        profiler.mark("step")
+        profiler.mark("events")
+        profiler.end(changed)
+    records = profiler.records()
+    assert [r["tick"] for r in records] == [2, 3, 4]
+    assert profiler.last()["changed"] == 4
+    assert all(r["total"] >= r["step"] + r["events"] for r in records)
+    summary = profiler.summary()
+    assert summary["changed"]["p50"] == 3 and summary["changed"]["max"] == 4
+
+    profiler.export(str(tmp_path / "ticks.csv"))
+    with open(tmp_path / "ticks.csv", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [int(r["changed"]) for r in rows] == [2, 3, 4]
+    profiler.export(str(tmp_path / "ticks.json"))
+    data = json.loads((tmp_path / "ticks.json").read_text())
+    assert data["phases"] == list(PHASES) and len(data["ticks"]) == 3
+
+
+def test_simulate_reports_every_tick():
+    sim = AISim(engine="numpy", headless=True, grid_size=(100, 80), seed=1, profile=True)
+    sim.new_game()
+    sim.simulate(ticks=20)
+    records = sim.profiler.records()
+    assert len(records) == 20
+    assert all(r["step"] > 0 and r["changed"] > 0 for r in records)
+    assert isinstance(AISim(headless=True, grid_size=(10, 10)).profiler, NullProfiler)
@@ -0,0 +1,79 @@
+import sys
+
+sys.path.insert(0, 'src')
+from colorwar.registry import EMPTY, FactionRegistry
+
+import pytest
+
+
+def faction(name, **traits):
+    personality = {"aggression": 1.0, "defense": 1.0, "expansionism": 1.0, "risk": 1.0}
+    personality.update(traits)
+    return {"name": name, "behavior": "random", "tier": 1, "personality": personality}
+
+
+def test_add_assigns_dense_ids():
+    registry = FactionRegistry()
+    a = registry.add("#ff0000", faction("A"))
+    b = registry.add("#00ff00", faction("B"))
+    assert (a.id, b.id) == (1, 2)
+    assert registry.intern(None) == EMPTY
+    assert registry.id_of("#00ff00") == 2
+    assert registry.colors[1] == "#ff0000"
+    with pytest.raises(ValueError):
+        registry.add("#ff0000", faction("again"))
+
+
+def test_records_write_through_parallel_arrays():
+    registry = FactionRegistry()
+    record = registry.add("#ff0000", faction("A", risk=1.5))
+    other = registry.add("#00ff00", faction("B"))
+    view = registry.factions["#ff0000"]
+    view["behavior"] = "hive"
+    view["personality"]["aggression"] += 0.5
+    view["name"] += " (Mutated)"
+    view.setdefault("relations", {})["#00ff00"] = 0.1
+    assert registry.behaviors[record.id] == "hive"
+    assert registry.traits["aggression"][record.id] == 1.5
+    assert registry.traits["risk"][record.id] == 1.5
+    assert registry.names[record.id] == "A (Mutated)"
+    assert registry.relations.get(record.id, other.id) == pytest.approx(0.1)
+    assert registry.relations.get(other.id, record.id) == 0
+    assert dict(view)["tier"] == 1
+
+
+def test_factions_view_is_read_only():
+    registry = FactionRegistry()
+    registry.add("#ff0000", faction("A"))
+    with pytest.raises(TypeError):
+        registry.factions["#00ff00"] = faction("B")
+    with pytest.raises(TypeError):
+        del registry.factions["#ff0000"]
+    assert list(registry.factions) == ["#ff0000"]
+
+
+def test_removed_ids_are_recycled_after_recycle():
+    registry = FactionRegistry()
+    first = registry.add("#000001", faction("A")).id
+    registry.add("#000002", faction("B"))
+    registry.remove("#000001")
+    assert "#000001" not in registry.factions
+    assert len(registry) == 1
+    assert registry.add("#000003", faction("C")).id == 3
+    registry.recycle()
+    assert registry.add("#000004", faction("D")).id == first
+    assert registry.names[first] == "D"
+
+
+def test_version_changes_with_colors():
+    registry = FactionRegistry()
+    versions = [registry.version]
+    a = registry.add("#ff0000", faction("A"))
+    versions.append(registry.version)
+    registry.record(a.id)["name"] = "renamed"
+    assert registry.version == versions[-1]  # same colors
+    registry.remove(a.id)
+    versions.append(registry.version)
+    registry.clear()
+    versions.append(registry.version)
+    assert len(set(versions)) == 4
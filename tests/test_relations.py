@@ -0,0 +1,65 @@
+import sys
+
+sys.path.insert(0, 'src')
+from colorwar.registry import FactionRegistry
+from colorwar.relations import Relations
+
+import numpy as np
+import pytest
+
+
+def test_dense_rows_and_columns_reset():
+    relations = Relations()
+    relations.grow(20)
+    relations.set(3, 5, 0.5)
+    relations.set(5, 3, -0.25)
+    relations.set(7, 3, 0.75)
+    assert relations.lookup(np.array([3, 5, 7]), np.array([5, 3, 3])).tolist() == [0.5, -0.25, 0.75]
+    relations.reset(3)
+    assert relations.get(3, 5) == relations.get(5, 3) == relations.get(7, 3) == 0
+
+
+def test_randomize_draws_every_pair_both_ways():
+    relations = Relations()
+    relations.grow(6)
+    relations.randomize([1, 2, 3, 4, 5])
+    block = relations.matrix[1:6, 1:6]
+    assert (np.diag(block) == 0).all()
+    assert (np.abs(block) <= 0.3 + 1e-6).all()
+    assert np.count_nonzero(block) > 10
+
+
+def test_switches_to_sparse_past_the_limit():
+    relations = Relations(dense_limit=4)
+    relations.grow(4)
+    relations.set(1, 2, 0.5)
+    relations.grow(10)
+    assert not relations.dense
+    assert relations.get(1, 2) == 0.5
+    relations.set(9, 1, -0.5)
+    relations.reset(1)
+    assert relations.rows[9] == {} and relations.rows[1] == {}
+
+
+def test_sparse_randomize_draws_on_first_lookup():
+    relations = Relations(dense_limit=0)
+    relations.grow(1000)
+    relations.randomize(range(1, 1000))
+    assert sum(len(row) for row in relations.rows) == 0
+    value = relations.get(10, 20)
+    assert -0.3 <= value <= 0.3
+    assert relations.get(10, 20) == value
+    assert relations.get(10, 10) == 0
+    assert sum(len(row) for row in relations.rows) == 1
+
+
+def test_records_expose_relations_by_color():
+    registry = FactionRegistry(dense_relations=2)
+    for color in ("#000001", "#000002", "#000003"):
+        registry.add(color, {"name": color, "relations": {"#000001": 0.4, "#123456": 1.0}})
+    record = registry.factions["#000003"]
+    assert record["relations"]["#000001"] == pytest.approx(0.4)
+    record["relations"] = {"#000002": -0.2}
+    assert dict(record["relations"]) == {"#000001": 0, "#000002": pytest.approx(-0.2)}
+    registry.remove("#000002")
+    assert dict(record["relations"]) == {"#000001": 0}
@@ -0,0 +1,164 @@
+import sys
+import types
+
+pygame_stub = types.ModuleType('pygame')
+sys.modules.setdefault('pygame', pygame_stub)
+
+sys.path.insert(0, 'src')
+from colorwar import render
+from colorwar.frames import FrameRing
+
+import numpy as np
+
+
+class FakeRect:
+    def __init__(self, x, y, w, h):
+        self.x, self.y, self.w, self.h = x, y, w, h
+
+    @property
+    def size(self):
+        return (self.w, self.h)
+
+    def clip(self, other):
+        x, y = max(self.x, other.x), max(self.y, other.y)
+        right, bottom = min(self.x + self.w, other.x + other.w), min(self.y + self.h, other.y + other.h)
+        return FakeRect(x, y, max(0, right - x), max(0, bottom - y))
+
+    def __eq__(self, other):
+        return (self.x, self.y, self.w, self.h) == (other.x, other.y, other.w, other.h)
+
+
+class FakeSurface:
+    def __init__(self, size, flags=0, like=None):
+        self.size = size
+        self.pixels = {}
+        self.blits = []
+        self.array = np.zeros(size, dtype=np.uint32)
+        self.mapped = []
+
+    def fill(self, color, rect=None):
+        self.pixels = {}
+        self.array[:] = 0
+
+    def set_at(self, pos, color):
+        self.pixels[pos] = color
+
+    def map_rgb(self, color):
+        self.mapped.append(color)
+        return 0 if color == 'black' else int(color[1:], 16)
+
+    def get_rect(self):
+        return FakeRect(0, 0, *self.size)
+
+    def subsurface(self, rect):
+        return rect
+
+    def blit(self, source, dest):
+        self.blits.append(dest)
+
+
+def blit_array(surface, array):
+    surface.array = array.copy()
+
+
+def pixels2d(surface):
+    return surface.array
+
+
+def fake_pygame(updates):
+    return types.SimpleNamespace(
+        Color=lambda color: color,
+        Rect=FakeRect,
+        Surface=FakeSurface,
+        display=types.SimpleNamespace(get_init=lambda: True, update=updates.append),
+        surfarray=types.SimpleNamespace(blit_array=blit_array, pixels2d=pixels2d),
+        transform=types.SimpleNamespace(scale=lambda surface, size: surface),
+    )
+
+
+def test_present_updates_only_dirty_tiles(monkeypatch):
+    updates = []
+    monkeypatch.setattr(render, 'pygame', fake_pygame(updates))
+    screen = FakeSurface((200, 120))
+    renderer = render.PygameRenderer(screen, 2, (100, 60))
+    renderer.present()
+    assert updates[-1] == [FakeRect(0, 0, 200, 120)]  # first frame is scaled up in one blit
+    assert screen.blits == [FakeRect(0, 0, 200, 120)]
+
+    renderer.draw_cell(3, 4, '#ff0000')
+    renderer.draw_cell(5, 1, '#00ff00')
+    renderer.draw_cell(99, 59, '#0000ff')
+    renderer.present()
+    assert updates[-1] == [FakeRect(0, 0, 32, 32), FakeRect(192, 96, 8, 24)]
+
+    renderer.present()
+    assert len(updates) == 2  # nothing changed, nothing pushed
+
+
+def test_show_paints_published_frames(monkeypatch):
+    monkeypatch.setattr(render, 'pygame', fake_pygame([]))
+    renderer = render.PygameRenderer(FakeSurface((8, 6)), 2, (4, 3))
+    frames = FrameRing()
+    frames.publish_snapshot(4, [0, 1, 0, 0, 0, 0, 2, 0, 0, 0, 0, 1], [None, '#ff0000', '#00ff00'])
+    frames.publish([0, 11], ['#00ff00', None])
+    renderer.show(frames)
+    # The snapshot is blitted whole, indexed (x, y); the changes after it through the same view
+    assert renderer.cells.array.T.tolist() == [
+        [0x00ff00, 0xff0000, 0, 0],
+        [0, 0, 0x00ff00, 0],
+        [0, 0, 0, 0],
+    ]
+    renderer.cells.array[0, 0] = 7
+    renderer.show(frames)  # nothing new
+    assert renderer.cells.array[0, 0] == 7
+
+
+def test_draw_grid_maps_only_changed_palette_entries(monkeypatch):
+    monkeypatch.setattr(render, 'pygame', fake_pygame([]))
+    renderer = render.PygameRenderer(FakeSurface((4, 2)), 1, (2, 2))
+    grid = np.array([[1, 0], [2, 1]], dtype=np.uint16)
+    renderer.draw_grid(grid, 2, [None, '#000010', '#000020'], version=1)
+    assert renderer.cells.array.tolist() == [[0x10, 0x20], [0, 0x10]]
+    mapped = len(renderer.cells.mapped)
+
+    renderer.draw_grid(grid, 2, [None, '#000010', '#000020'], version=1)
+    assert len(renderer.cells.mapped) == mapped
+    renderer.draw_grid(grid, 2, [None, '#000010', '#000030', '#000040'], version=2)
+    assert renderer.cells.mapped[mapped:] == ['#000030', '#000040']
+    assert renderer.cells.array.tolist() == [[0x10, 0x30], [0, 0x10]]
+
+
+def test_present_paints_only_the_camera_view(monkeypatch):
+    updates = []
+    monkeypatch.setattr(render, 'pygame', fake_pygame(updates))
+    screen = FakeSurface((64, 64))
+    renderer = render.PygameRenderer(screen, 1, (256, 256), view_size=(64, 64))
+    assert (renderer.camera.level, renderer.camera.source_rect()) == (2, (0, 0, 64, 64))
+    renderer.camera.zoom(2, (0, 0))  # back to one cell per pixel at the top-left corner
+    renderer.present()
+    assert updates[-1] == [FakeRect(0, 0, 64, 64)]
+
+    renderer.draw_cells([5 * 256 + 5, 200 * 256 + 200], ['#ff0000', '#ff0000'])
+    renderer.present()
+    assert updates[-1] == [FakeRect(0, 0, 16, 16)]  # the tile off screen is not blitted
+
+
+def test_zoomed_out_view_refreshes_dirty_pyramid_blocks(monkeypatch):
+    updates = []
+    monkeypatch.setattr(render, 'pygame', fake_pygame(updates))
+    renderer = render.PygameRenderer(FakeSurface((16, 16)), 1, (64, 64), view_size=(16, 16))
+    renderer.draw_grid(np.ones((64, 64), dtype=np.uint16), 64, [None, '#000001'])
+    renderer.present()
+    levels = renderer.levels
+    assert [level.size for level in levels] == [(64, 64), (32, 32), (16, 16)]
+    assert (levels[2].array == 1).all()
+
+    # Three 2 x 2 blocks of a 4 x 4 block change: the level 2 pixel above follows the majority
+    cells = [0, 1, 64, 65, 2, 3, 66, 67, 128, 129, 192, 193, 64 * 4 + 4, 64 * 40 + 40]
+    renderer.draw_cells(cells, ['#000002'] * len(cells))
+    renderer.present()
+    assert levels[1].array[:2, :2].tolist() == [[2, 2], [2, 1]]
+    assert levels[1].array[2, 2] == 1  # one cell of four is not a majority
+    assert levels[2].array[0, 0] == 2 and levels[2].array[1, 1] == 1
+    assert levels[1].array[20, 20] == 1 and levels[2].array[10, 10] == 1
+    assert updates[-1] == [FakeRect(0, 0, 4, 4), FakeRect(8, 8, 4, 4)]
@@ -0,0 +1,97 @@
+import os
+import sys
+import types
+
+pygame_stub = types.ModuleType('pygame')
+pygame_gui_stub = types.ModuleType('pygame_gui')
+pygame_gui_core_stub = types.ModuleType('pygame_gui.core')
+pygame_gui_elements_stub = types.ModuleType('pygame_gui.elements')
+
+pygame_gui_core_stub.ObjectID = object
+pygame_gui_stub.UIManager = object
+pygame_gui_stub.core = pygame_gui_core_stub
+pygame_gui_stub.elements = pygame_gui_elements_stub
+
+sys.modules.setdefault('pygame', pygame_stub)
+sys.modules.setdefault('pygame_gui', pygame_gui_stub)
+sys.modules.setdefault('pygame_gui.core', pygame_gui_core_stub)
+sys.modules.setdefault('pygame_gui.elements', pygame_gui_elements_stub)
+
+sys.path.insert(0, 'src')
+from ColorWarGame import AISim
+from colorwar.replay import ReplayReader
+from colorwar.savefile import SaveFormatError
+
+import numpy as np
+import pytest
+
+
+def record(path, engine, ticks=30, storage="lists", restart=None):
+    sim = AISim(engine=engine, headless=True, grid_size=(100, 80), seed=7, storage=storage)
+    sim.new_game()
+    sim.start_replay(str(path), keyframe_every=7)
+    grids = [np.array(sim.grid)]
+    factions = [set(sim.registry.alive_ids())]
+    for tick in range(ticks):
+        if tick == restart:
+            sim.new_game()  # replaces the whole grid mid-recording
+        sim.simulate(ticks=1)
+        grids.append(np.array(sim.grid))
+        factions.append(set(sim.registry.alive_ids()))
+    sim.stop_replay()
+    return grids, factions
+
+
+@pytest.mark.parametrize("engine", ["python", "numpy"])
+def test_seek_reproduces_every_tick(tmp_path, engine):
+    path = tmp_path / 'run.cwgreplay'
+    grids, factions = record(path, engine)
+    reader = ReplayReader(str(path))
+    assert reader.ticks == 30
+    assert [tick for tick, _, _ in reader.keyframes] == [0, 7, 14, 21, 28]
+    for tick in (0, 1, 6, 7, 13, 29, 30):
+        grid, alive = reader.seek(tick)
+        assert (grid == grids[tick]).all()
+        assert set(alive) == factions[tick]
+    with pytest.raises(ValueError):
+        reader.seek(31)
+
+
+@pytest.mark.parametrize("engine, storage", [("python", "chunked"), ("numpy", "memmap")])
+def test_recording_follows_a_restarted_game(tmp_path, engine, storage):
+    path = tmp_path / 'run.cwgreplay'
+    grids, _ = record(path, engine, ticks=12, storage=storage, restart=9)
+    reader = ReplayReader(str(path))
+    for tick in (8, 9, 10, 12):
+        assert (reader.seek(tick)[0] == grids[tick]).all()
+    _, cells, _, _ = next(reader.iter_ticks(10, 10))
+    assert cells.size == 100 * 80
+    # Other ticks hold only the cells written during them
+    _, cells, _, _ = next(reader.iter_ticks(11, 11))
+    assert 0 < cells.size < 100 * 80 // 2
+
+
+def test_ticks_carry_faction_events(tmp_path):
+    path = tmp_path / 'run.cwgreplay'
+    _, factions = record(path, "numpy", ticks=60)
+    events = [event for _, _, _, tick_events in ReplayReader(str(path)).iter_ticks() for event in tick_events]
+    births = {event["id"] for event in events if event["type"] == "birth"}
+    deaths = {event["id"] for event in events if event["type"] == "death"}
+    assert births or deaths
+    assert births >= factions[-1] - factions[0]
+    assert all(set(event["parents"]) and event["via"] in ("auto", "fusion")
+               for event in events if event["type"] == "merge")
+
+
+def test_torn_replay_reads_up_to_last_full_chunk(tmp_path):
+    path = tmp_path / 'run.cwgreplay'
+    grids, _ = record(path, "numpy", ticks=10)
+    with open(path, 'rb+') as f:
+        f.truncate(os.path.getsize(path) - 5)
+    reader = ReplayReader(str(path))
+    assert reader.ticks == 7  # only the tick-7 keyframe survived past the cut
+    assert (reader.seek(7)[0] == grids[7]).all()
+    with open(path, 'wb') as f:
+        f.write(b'nope')
+    with pytest.raises(SaveFormatError):
+        ReplayReader(str(path))
@@ -0,0 +1,156 @@
+import struct
+import sys
+
+sys.path.insert(0, 'src')
+from colorwar.registry import FactionRegistry
+from colorwar.savefile import HEADER, SaveFormatError, import_text, is_binary, parse_capital, read_binary, write_binary
+
+import numpy as np
+import pytest
+
+
+def make_registry():
+    registry = FactionRegistry()
+    for color, name in (("#ff0000", "Red"), ("#00ff00", "Green"), ("#0000ff", "Blue")):
+        registry.add(color, {
+            "name": name,
+            "behavior": "hive",
+            "tier": 2,
+            "capital": (1, 2),
+            "personality": {"aggression": 1.5, "defense": 0.5, "expansionism": 1.0, "risk": 2.0},
+            "relations": {"#123456": 0.1},
+        })
+    registry.remove("#00ff00")
+    return registry
+
+
+@pytest.mark.parametrize("compression", ["none", "zlib", "lzma"])
+def test_binary_round_trip(tmp_path, compression):
+    registry = make_registry()
+    grid = np.array([[1, 0, 3], [3, 3, 1]], dtype=np.uint16)
+    ages = np.arange(6, dtype=np.int32).reshape(2, 3) * 100
+    cooldown = np.array([[0, 4, 0], [8, 0, 0]], dtype=np.uint8)
+    path = str(tmp_path / "world.cwgbin")
+    write_binary(path, registry, grid, ages, cooldown, compression=compression)
+
+    assert is_binary(path)
+    data = read_binary(path)
+    assert (data.width, data.height) == (3, 2)
+    assert (data.grid == grid).all()
+    assert (data.claim_age == ages).all()
+    assert (data.overwrite_cooldown == cooldown).all()
+    assert sorted(data.factions) == [1, 3]
+    color, record = data.factions[3]
+    assert color == "#0000ff"
+    assert record["name"] == "Blue"
+    assert record["capital"] == (1, 2)
+    assert record["personality"]["risk"] == 2.0
+    assert "relations" not in record
+
+
+def test_fitted_crops_pads_and_remaps(tmp_path):
+    registry = make_registry()
+    path = str(tmp_path / "world.cwgbin")
+    write_binary(path, registry, [[1, 3, 3], [3, 1, 1]], [[5, 6, 7], [8, 9, 10]], [[0] * 3] * 2)
+    grid, ages, cooldown = read_binary(path).fitted(2, 3, {1: 2, 3: 1})
+    assert grid.tolist() == [[2, 1], [1, 2], [0, 0]]
+    assert ages.tolist() == [[5, 6], [8, 9], [0, 0]]
+    assert cooldown.shape == (3, 2)
+
+
+def test_version_1_saves_load_as_tick_0(tmp_path):
+    path = tmp_path / "world.cwgbin"
+    write_binary(str(path), make_registry(), [[1, 3], [3, 1]], [[5, 6], [7, 8]], [[0, 0], [0, 0]], tick=1234)
+    assert read_binary(str(path)).tick == 1234
+    data = path.read_bytes()
+    # Version 1 headers stop before the tick; both keep the table 8-byte aligned
+    fields = list(HEADER.unpack_from(data)[:-1])
+    fields[1] = 1
+    path.write_bytes(struct.pack("<4sHBxIIIQ", *fields) + data[HEADER.size:])
+    old = read_binary(str(path))
+    assert old.tick == 0 and old.grid.tolist() == [[1, 3], [3, 1]]
+
+
+def test_rejects_bad_files(tmp_path):
+    path = tmp_path / "junk.cwgbin"
+    path.write_bytes(b"CWGS\x63\x00")
+    with pytest.raises(SaveFormatError):
+        read_binary(str(path))
+
+
+@pytest.mark.parametrize("table", [b"\xff\xfe", b"[[1, 2", b"[[1, \"#ff0000\"]]", b"[5]"])
+def test_rejects_bad_faction_tables(tmp_path, table):
+    path = tmp_path / "bad.cwgbin"
+    write_binary(str(path), make_registry(), np.zeros((2, 2)), np.zeros((2, 2)), np.zeros((2, 2)), "none")
+    data = path.read_bytes()
+    size = HEADER.unpack_from(data)[5]
+    table += b" " * (size - len(table))
+    path.write_bytes(data[:HEADER.size] + table + data[HEADER.size + size:])
+    with pytest.raises(SaveFormatError, match="bad faction table"):
+        read_binary(str(path))
+    path.write_bytes(data[:-1])
+    with pytest.raises(SaveFormatError, match="truncated"):
+        read_binary(str(path))
+
+
+def test_import_text_crops_and_pads_while_streaming(tmp_path):
+    path = tmp_path / "old.cwgsave"
+    path.write_text(
+        "[GRID]\n#ff0000,None,#ff0000\nNone,#ff0000,None\n#ff0000,#ff0000,#ff0000\n"
+        "[FACTIONS]\n#ff0000|Red|hive|2|*|R-1|(4, 5)|1.0|1.0|1.0|1.0\n",
+        encoding="utf-8",
+    )
+    assert not is_binary(str(path))
+    grid, factions, saved_size = import_text(str(path), 4, 2)
+    assert grid == [["#ff0000", None, "#ff0000", None], [None, "#ff0000", None, None]]
+    assert saved_size == (3, 3)
+    assert factions["#ff0000"]["capital"] == (4, 5)
+    grid, _, _ = import_text(str(path), 2, 4)
+    assert grid[1:] == [[None, "#ff0000"], ["#ff0000", "#ff0000"], [None, None]]
+
+
+@pytest.mark.parametrize("line", [
+    "#ff0000|Red|hive|2|*|R-1|__import__('os')|1.0|1.0|1.0|1.0",
+    "#ff0000|Red|hive|two|*|R-1|(4, 5)|1.0|1.0|1.0|1.0",
+])
+def test_import_text_reports_malformed_lines(tmp_path, line):
+    path = tmp_path / "bad.cwgsave"
+    path.write_text(f"[GRID]\nNone\n\n[FACTIONS]\n{line}\n", encoding="utf-8")
+    with pytest.raises(SaveFormatError, match=r"bad\.cwgsave:5: "):
+        import_text(str(path), 1, 1)
+
+
+def test_import_text_skips_short_faction_lines(tmp_path, capsys):
+    path = tmp_path / "old.cwgsave"
+    path.write_text(
+        "[GRID]\nNone\n[FACTIONS]\n#ff0000|Red|hive|2|*|R-1|(4, 5)|1.0|1.0|1.0\n"
+        "#0000ff|Blue|hive|2|*|R-1|(4, 5)|1.0|1.0|1.0|1.0\n",
+        encoding="utf-8",
+    )
+    _, factions, _ = import_text(str(path), 1, 1)
+    assert list(factions) == ["#0000ff"]
+    assert "old.cwgsave:4: skipping faction line with 10 fields" in capsys.readouterr().out
+
+
+def test_import_text_ignores_extra_faction_fields(tmp_path, capsys):
+    path = tmp_path / "long.cwgsave"
+    path.write_text("[GRID]\nNone\n[FACTIONS]\n#00ff00|Green|hive|2|*|G-1|(4, 5)|1.0|1.0|1.0|0.5|later|fields\n",
+                    encoding="utf-8")
+    _, factions, _ = import_text(str(path), 1, 1)
+    record = factions["#00ff00"]
+    assert record["name"] == "Green" and record["personality"]["risk"] == 0.5
+    assert capsys.readouterr().out == ""
+
+
+def test_import_text_rejects_bad_cells(tmp_path):
+    path = tmp_path / "bad.cwgsave"
+    path.write_text("[GRID]\nNone,#ff0000\nNone,red\n", encoding="utf-8")
+    with pytest.raises(SaveFormatError, match=r":3: bad cell 'red'"):
+        import_text(str(path), 2, 2)
+
+
+def test_parse_capital_is_strict():
+    assert parse_capital(" (3, -4) ") == (3, -4)
+    assert parse_capital("[0,0]") == (0, 0)
+    with pytest.raises(ValueError):
+        parse_capital("(1, 2, 3)")
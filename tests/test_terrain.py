@@ -0,0 +1,98 @@
+import random
+import sys
+import tracemalloc
+import types
+
+pygame_stub = types.ModuleType('pygame')
+pygame_gui_stub = types.ModuleType('pygame_gui')
+pygame_gui_core_stub = types.ModuleType('pygame_gui.core')
+pygame_gui_elements_stub = types.ModuleType('pygame_gui.elements')
+
+pygame_gui_core_stub.ObjectID = object
+pygame_gui_stub.UIManager = object
+pygame_gui_stub.core = pygame_gui_core_stub
+pygame_gui_stub.elements = pygame_gui_elements_stub
+
+sys.modules.setdefault('pygame', pygame_stub)
+sys.modules.setdefault('pygame_gui', pygame_gui_stub)
+sys.modules.setdefault('pygame_gui.core', pygame_gui_core_stub)
+sys.modules.setdefault('pygame_gui.elements', pygame_gui_elements_stub)
+
+sys.path.insert(0, 'src')
+from ColorWarGame import AISim
+from colorwar import terrain as terrain_module
+from colorwar.terrain import BIOMES, Terrain
+
+import numpy as np
+import pytest
+
+
+def test_plain_terrain_has_no_raster():
+    terrain = Terrain(5, 4)
+    terrain.mark("experimental", [(1, 1), (9, 9)])
+    assert terrain.multiplier_array() is None
+    assert terrain.multiplier_list() is None
+
+
+def test_raster_combines_biomes_and_layers_and_is_cached():
+    terrain = Terrain(4, 3)
+    terrain.paint([(0, 0), (1, 0)], "lava")
+    terrain.paint([(3, 2), (7, 7)], "oasis")
+    terrain.add_layer("ruins", 0.5)
+    terrain.mark("ruins", [(1, 0), (3, 2)])
+    raster = terrain.multiplier_array()
+    assert raster.dtype == np.float32
+    assert raster.tolist() == terrain.multiplier_list()
+    assert raster[[0, 1, 2, 11]].tolist() == pytest.approx([0.1, 0.05, 1.0, 1.0])
+    assert terrain.multiplier_array() is raster
+    terrain.paint([(2, 0)], "forest")
+    assert terrain.multiplier_array() is not raster
+    assert terrain.multiplier_array()[2] == 0.5
+
+
+def test_voronoi_regions_match_without_numpy(monkeypatch):
+    terrain = Terrain(50, 30)
+    terrain.fill_voronoi(random.Random(4), 6)
+    fallback = Terrain(50, 30)
+    monkeypatch.setattr(terrain_module, "np", None)
+    fallback.fill_voronoi(random.Random(4), 6)
+    assert fallback.biome == terrain.biome
+    assert set(terrain.biome) <= set(range(len(BIOMES)))
+    # Regions are contiguous: few cells differ from their right-hand neighbour
+    codes = np.frombuffer(terrain.biome, dtype=np.uint8).reshape(30, 50)
+    assert (codes[:, 1:] != codes[:, :-1]).sum() < 30 * 6
+
+
+def test_terrain_in_a_directory_stays_out_of_memory(tmp_path):
+    # Tall and narrow, so the rows Voronoi filling works through at once are a small share of the map
+    expected = Terrain(250, 16000)
+    expected.fill_voronoi(random.Random(4), 8)
+    expected.add_layer("ruins", 0.5)
+    expected.mark("ruins", [(5, 5), (249, 15999)])
+    tracemalloc.start()
+    try:
+        mapped = Terrain(250, 16000, str(tmp_path))
+        mapped.fill_voronoi(random.Random(4), 8)
+        mapped.add_layer("ruins", 0.5)
+        mapped.mark("ruins", [(5, 5), (249, 15999)])
+        raster = mapped.multiplier_array()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    # The files hold the cells; only a few rows at a time pass through memory
+    assert peak < 250 * 16000 // 2
+    assert isinstance(raster, np.memmap) and (raster == expected.multiplier_array()).all()
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "terrain-biome.npy", "terrain-experimental.npy", "terrain-multiplier.npy", "terrain-ruins.npy"]
+
+
+def test_new_game_lays_out_biome_regions():
+    for engine in ("python", "numpy"):
+        sim = AISim(engine=engine, headless=True, grid_size=(60, 40), seed=9, biome_regions=8)
+        sim.new_game(factions=6)
+        assert sim.terrain.multiplier_list() is not None
+        assert sum(sim.terrain.layers["experimental"][0]) == len(sim.experimental_zones)
+        sim.simulate(ticks=5)
+    plain = AISim(engine="python", headless=True, grid_size=(60, 40), seed=9)
+    plain.new_game(factions=6)
+    assert plain.terrain.multiplier_list() is None
@@ -0,0 +1,123 @@
+import random
+import sys
+
+sys.path.insert(0, 'src')
+from colorwar.chunks import ChunkedGrid
+from colorwar.territory import CellIndex, TerritoryCounter, binomial
+
+import numpy as np
+import pytest
+
+
+def test_move_tracks_owner_changes():
+    counter = TerritoryCounter()
+    counter.reset([4])
+    counter.move(0, 1)
+    counter.move(0, 3)
+    counter.move(1, 3)
+    assert counter.counts == [2, 0, 0, 2]
+    assert counter[7] == 0
+
+
+def test_apply_batches_from_arrays():
+    counter = TerritoryCounter()
+    counter.reset([6, 0])
+    counter.apply(np.array([0, 0, 0], dtype=np.uint16), np.array([1, 1, 2], dtype=np.uint16))
+    counter.apply(np.array([1], dtype=np.uint16), np.array([2], dtype=np.uint16))
+    assert counter.counts == [3, 1, 2]
+
+
+def test_power_skips_empty_and_dead_factions():
+    counter = TerritoryCounter()
+    counter.reset([5, 3, 2, 0])
+    assert counter.power(bytearray([0, 1, 0, 1])) == {1: 3}
+
+
+def test_verify_reports_drift():
+    counter = TerritoryCounter()
+    counter.reset([3, 1])
+    counter.verify([3, 1, 0])
+    counter.move(0, 1)
+    with pytest.raises(AssertionError, match="id 1: counted 2, actual 1"):
+        counter.verify([3, 1])
+
+
+def test_cell_index_moves_and_samples():
+    index = CellIndex()
+    index.reset([[0, 1, 1], [2, 0, 1]])
+    assert sorted(index.members[1]) == [1, 2, 5]
+    index.move(1, 1, 3)
+    index.move(4, 0, 1)
+    assert sorted(index.members[1]) == [2, 4, 5]
+    assert index.members[3] == [1]
+    assert all(index.members[fid][index.slots[cell]] == cell
+               for fid in range(4) for cell in index.members[fid])
+    assert sorted(index.sample(1, 10)) == [2, 4, 5]
+    assert index.choice(3) == 1
+    assert index.sample(7, 2) == []
+
+
+def test_cell_index_probe_caps_hits():
+    index = CellIndex()
+    index.reset([[1] * 10 + [0] * 10])
+    assert len(index.probe(1, 1000, 4)) == 4
+    assert len(index.probe(1, 1000)) == 10
+    assert index.probe(2, 1000) == []
+
+
+def test_cell_index_probe_counts_distinct_cells():
+    index = CellIndex(random.Random(3))
+    index.reset([[1] * 50] * 25 + [[0] * 50] * 25)
+    found = np.mean([len(index.probe(1, 1000)) for _ in range(200)])
+    # 1000 probes of 2500 cells hit this many distinct cells of a faction holding half of them
+    expected = 1250 * (1 - (1 - 1 / 2500) ** 1000)
+    assert abs(found - expected) < 0.02 * expected
+
+
+def test_cell_index_arrays_draw_the_same_cells():
+    grid = [[0, 1, 1, 2], [1, 0, 0, 1]]
+    draws = []
+    for arrays in (False, True):
+        index = CellIndex(random.Random(4), arrays=arrays)
+        index.reset(grid)
+        index.move(3, 2, 1)
+        draws.append((list(index.members[1]), index.sample(1, 3), index.probe(0, 20, 2)))
+    assert draws[0] == draws[1]
+
+
+def test_cell_index_leaves_empty_chunks_unindexed():
+    grid = ChunkedGrid(1000, 1000, 0, chunk=64)
+    grid[5][10] = grid[6][10] = 2
+    grid[900][700] = 3
+    index = CellIndex(random.Random(1), arrays=True)
+    index.reset(grid)
+    assert len(index.slots.arrays) == 2 and len(index.members[0]) == 0
+    assert index.count(0) == 1000 * 1000 - 3 and len(index) == 1000 * 1000
+
+    index.move(900 * 1000 + 700, 3, 0)
+    assert len(index.slots.arrays) == 1  # the chunk's last claimed cell left it
+    index.move(5 * 1000 + 10, 2, 0)
+    assert list(index.members[2]) == [6 * 1000 + 10] and index.slots[6 * 1000 + 10] == 0
+    empty = index.sample(0, 50)
+    assert len(set(empty)) == 50 and 6 * 1000 + 10 not in empty
+    assert len(index.probe(0, 100)) == 100
+
+
+def test_cell_index_samples_the_last_empty_cells():
+    index = CellIndex(random.Random(2))
+    index.reset([[1, 1, 0], [0, 1, 1]])
+    assert sorted(index.sample(0, 5)) == [2, 3]
+    assert index.choice(0) in (2, 3)
+    index.move(2, 0, 1)
+    index.move(3, 0, 1)
+    assert index.sample(0, 5) == [] and index.count(0) == 0
+
+
+def test_binomial_matches_its_moments():
+    rng = random.Random(5)
+    for n, p in ((5000, 0.3), (400, 0.002), (50, 0.97)):
+        draws = np.array([binomial(rng, n, p) for _ in range(4000)])
+        assert draws.min() >= 0 and draws.max() <= n
+        assert abs(draws.mean() - n * p) < 4 * (n * p * (1 - p) / draws.size) ** 0.5
+        assert 0.8 < draws.var() / (n * p * (1 - p)) < 1.2
+    assert binomial(rng, 10, 0) == 0 and binomial(rng, 10, 1) == 10
@@ -0,0 +1,58 @@
+import sys
+
+sys.path.insert(0, 'src')
+from colorwar.viewport import Camera, downsample_mode, level_size, levels_to_fit
+
+import numpy as np
+
+
+def test_levels_fit_the_view():
+    assert level_size(5, 3, 1) == (3, 2)
+    assert levels_to_fit(100, 50, 100, 50) == 0
+    assert levels_to_fit(4000, 4000, 1920, 1030) == 2
+    assert levels_to_fit(10, 10, 0, 0) == 4  # stops at a single pixel
+
+
+def test_downsample_keeps_most_common_value():
+    src = np.array([
+        [1, 1, 3, 4, 5],
+        [2, 1, 3, 6, 5],
+        [7, 8, 9, 9, 0],
+    ])  # indexed [x, y]: three columns of five rows
+    dst = np.zeros((2, 3), dtype=src.dtype)
+    downsample_mode(src, dst, *np.ix_(np.arange(2), np.arange(3)))
+    # Majority, a tie going to the top-left cell, all different, then the odd edges
+    assert dst.tolist() == [[1, 3, 5], [7, 9, 0]]
+
+
+def test_fit_picks_scale_or_level():
+    camera = Camera((100, 50), (400, 300))
+    camera.fit()
+    assert (camera.scale, camera.level, camera.source_rect()) == (4, 0, (0, 0, 100, 50))
+    camera = Camera((4000, 4000), (1920, 1030))
+    camera.fit()
+    assert (camera.scale, camera.level, camera.source_rect()) == (1, 2, (0, 0, 1000, 1000))
+
+
+def test_zoom_keeps_anchor_cell_in_place():
+    camera = Camera((1000, 1000), (100, 100))
+    camera.zoom(2, (50, 50))
+    assert camera.scale == 4
+    assert camera.cell_at(50, 50) == (50, 50)
+    camera.pan(400, 0)
+    assert camera.cell_at(50, 50) == (150, 50)
+    version = camera.version
+    camera.zoom(-10)
+    assert (camera.scale, camera.level) == (1, camera.max_level) == (1, 4)
+    assert camera.version > version
+    camera.zoom(-1)  # already fully out: nothing moves
+    assert camera.version == version + 1
+
+
+def test_pan_stays_on_the_grid_and_aligned():
+    camera = Camera((1000, 1000), (100, 100), level=2)
+    camera.pan(1000, -5)
+    assert (camera.x, camera.y) == (600.0, 0.0)
+    assert camera.source_rect() == (150, 0, 100, 100)
+    camera.pan(-0.5, 3)
+    assert camera.x % 4 == 0 and camera.y == 12.0